@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "events.middleware.QueryBudgetMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -79,12 +81,46 @@ WSGI_APPLICATION = "eventpass_backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# DB_PROFILE=sqlite (default), sqlite-production or postgres; see README "Database Profiles"
+DB_PROFILE = os.environ.get("DB_PROFILE", "sqlite")
+
+if DB_PROFILE == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "eventpass"),
+            "USER": os.environ.get("POSTGRES_USER", "eventpass"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            # Persistent connections, checked before reuse
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 600)),
+            "CONN_HEALTH_CHECKS": True,
+        }
+    }
+else:
+    SQLITE_PRAGMAS = {
+        "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000)),  # ms
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -20000,  # KiB
+        "temp_store": "MEMORY",
+    }
+    if DB_PROFILE == "sqlite-production":
+        # WAL is persistent: it changes the database file and adds -wal/-shm files next to it
+        SQLITE_PRAGMAS.update(journal_mode="WAL", synchronous="NORMAL")
+    DATABASES = {
+        "default": {
+            # sqlite3 plus connection pragmas, BEGIN IMMEDIATE and lock retries
+            "ENGINE": "eventpass_backend.sqlite_backend",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {
+                "pragmas": SQLITE_PRAGMAS,
+                "transaction_mode": "IMMEDIATE",
+                "lock_retries": 2,
+                "lock_retry_delay": 0.05,  # seconds, grows per attempt
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -140,22 +176,81 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # Keyset pagination, see events/pagination.py (?page_size=, ?with_count=true)
+    'DEFAULT_PAGINATION_CLASS': 'events.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
+API_MAX_PAGE_SIZE = 500
 
 # Email Configuration
 # Using Gmail SMTP - For production, use environment variables
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
-EMAIL_HOST_USER = 'your-email@gmail.com'  # Replace with your Gmail
-EMAIL_HOST_PASSWORD = 'your-app-password'  # Replace with Gmail App Password
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', 'your-email@gmail.com')  # Replace with your Gmail
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', 'your-app-password')  # Replace with Gmail App Password
 DEFAULT_FROM_EMAIL = 'EventPass Pro <your-email@gmail.com>'
 EMAIL_TIMEOUT = 30
 
 # For development/testing, you can use console backend (prints emails to console)
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Email outbox (drained by `python manage.py send_outbox`)
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_BACKOFF_SECONDS = 60
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 600  # seconds before a batch claimed by a dead worker is retried
+
+# QR Code Settings
+# Accept pre-token QR codes (JSON payloads) during the migration window
+QR_ACCEPT_LEGACY_JSON = True
+# Maximum queued scans accepted by /api/registrations/verify_qr_batch/
+SCAN_BATCH_MAX_SIZE = 500
+
+# Write-behind buffering of scan logs (see events/scan_log_buffer.py)
+SCAN_LOG_BUFFER_ENABLED = False
+SCAN_LOG_BUFFER_SIZE = 100  # Flush after this many rows...
+SCAN_LOG_BUFFER_INTERVAL = 2.0  # ...or this many seconds
+SCAN_LOG_SPOOL_DIR = BASE_DIR / 'scan_log_spool'
+
+# Bulk registration import
+BULK_IMPORT_WORKERS = None  # Defaults to os.cpu_count()
+BULK_IMPORT_CHUNK_SIZE = 500
+
+# Batch ID-card printing
+ID_CARD_WORKERS = None  # Defaults to os.cpu_count()
+
+# Dashboard totals are cached per process and dropped on every registration/scan
+DASHBOARD_STATS_TTL = 10  # seconds
+
+# Live scan feed (SSE at /api/live/scans/, needs an ASGI server)
+LIVE_FEED_BROKER = os.environ.get('LIVE_FEED_BROKER') or None  # host:port of run_live_feed_broker
+LIVE_FEED_KEEPALIVE = 15  # seconds between keepalive comments
+LIVE_FEED_MAX_AGE = 300  # seconds before a connection is closed and the client reconnects
+
+# Query instrumentation (events.middleware.QueryBudgetMiddleware)
+QUERY_STATS_HEADERS = os.environ.get('QUERY_STATS_HEADERS', str(DEBUG)) == 'True'  # X-DB-* headers
+QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'log')  # 'log' or 'fail'
+# Per URL name, or '<url name>:<METHOD>' for one method; 'queries'/'duplicates' are counts,
+# 'db_time_ms' and 'response_bytes' totals. Write budgets include BEGIN/COMMIT, and the
+# first scan or registration of a minute creates its rollup rows (+6 queries)
+QUERY_BUDGETS = {
+    '*': {'queries': 20, 'duplicates': 5},
+    'event-list': {'queries': 5, 'duplicates': 1},
+    'event-active-events': {'queries': 5, 'duplicates': 1},
+    'registration-list': {'queries': 5, 'duplicates': 1},
+    'registration-list:POST': {'queries': 18, 'duplicates': 1},  # Measured 8-16
+    'registration-verify-qr': {'queries': 18, 'duplicates': 1, 'db_time_ms': 100},  # Measured 10-16
+    'attendancelog-list': {'queries': 5, 'duplicates': 1},
+    'dashboard-statistics': {'queries': 4},
+    'admin-panel': {'queries': 5, 'duplicates': 1},
+    'admin-events': {'queries': 5, 'duplicates': 1},
+    'admin-registrations': {'queries': 5, 'duplicates': 1},
+    'admin-logs': {'queries': 5, 'duplicates': 1},
+    'attendance-pdf': {'queries': 8, 'duplicates': 1},
+}
+
 # Authentication Settings
 LOGIN_URL = '/admin-login/'
 LOGIN_REDIRECT_URL = '/admin-panel/'
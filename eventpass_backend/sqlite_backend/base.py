@@ -0,0 +1,96 @@
+"""
+SQLite backend tuned for several scanners writing at once.
+
+Every new connection applies the ``pragmas`` from ``DATABASES[...]['OPTIONS']``
+(busy timeout, mmap, cache size; WAL and synchronous=NORMAL in the
+production profile). Only the busy timeout is applied by default, since
+``journal_mode`` is stored in the database file itself. Transactions start
+with ``BEGIN IMMEDIATE``: they take the write lock up front and wait for it
+under the busy timeout. A deferred transaction that reads first and writes
+later fails at once with "database is locked" when another writer got in
+between. If the lock still cannot be had, ``BEGIN`` and autocommit statements
+are retried ``lock_retries`` times. Nothing has been applied at that point,
+so a retry cannot run anything twice. Retries are counted in
+``lock_stats()``.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.db.backends.sqlite3 import base
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+}
+
+_lock_stats = Counter()
+_lock_stats_lock = threading.Lock()
+
+
+def lock_stats():
+    """Per-process counts of lock retries: retried, recovered, failed"""
+    with _lock_stats_lock:
+        return {key: _lock_stats[key] for key in ('retried', 'recovered', 'failed')}
+
+
+def _count(key):
+    with _lock_stats_lock:
+        _lock_stats[key] += 1
+
+
+def _is_lock_error(exc):
+    return 'database is locked' in str(exc)
+
+
+class RetryingCursorWrapper(base.SQLiteCursorWrapper):
+    retries = 0
+    delay = 0.05
+
+    def execute(self, query, params=None):
+        attempt = 0
+        while True:
+            try:
+                result = super().execute(query, params)
+            except base.Database.OperationalError as exc:
+                # Inside a transaction the statement may depend on earlier ones; let it fail
+                if not _is_lock_error(exc) or self.connection.in_transaction or attempt >= self.retries:
+                    if _is_lock_error(exc):
+                        _count('failed')
+                        logger.warning('Database still locked after %d retries: %s', attempt, query[:80])
+                    raise
+                attempt += 1
+                _count('retried')
+                time.sleep(self.delay * attempt)
+                continue
+            if attempt:
+                _count('recovered')
+            return result
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = {**DEFAULT_PRAGMAS, **kwargs.pop('pragmas', {})}
+        self.transaction_mode = kwargs.pop('transaction_mode', 'IMMEDIATE')
+        retries = kwargs.pop('lock_retries', 2)
+        delay = kwargs.pop('lock_retry_delay', RetryingCursorWrapper.delay)
+        self.cursor_class = type('RetryingCursorWrapper', (RetryingCursorWrapper,), {
+            'retries': retries,
+            'delay': delay,
+        })
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(factory=self.cursor_class)
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}'.strip())
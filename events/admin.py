@@ -1,13 +1,13 @@
 from django.contrib import admin
-from .models import Event, Registration, AttendanceLog
+from .models import Event, Registration, AttendanceLog, OutboundEmail
 
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ['name', 'start_date', 'end_date', 'status', 'registered_count', 'present_count', 'venue']
+    list_display = ['name', 'start_date', 'end_date', 'status', 'registered_total', 'present_total', 'venue']
     list_filter = ['status', 'start_date']
     search_fields = ['name', 'description', 'venue']
-    readonly_fields = ['id', 'created_at', 'updated_at', 'registered_count', 'present_count', 'absent_count']
+    readonly_fields = ['id', 'created_at', 'updated_at', 'registered_total', 'present_total', 'absent_count']
     
     fieldsets = (
         ('Event Information', {
@@ -20,7 +20,7 @@ class EventAdmin(admin.ModelAdmin):
             'fields': ('max_capacity',)
         }),
         ('Statistics', {
-            'fields': ('registered_count', 'present_count', 'absent_count'),
+            'fields': ('registered_total', 'present_total', 'absent_count'),
             'classes': ('collapse',)
         }),
         ('Metadata', {
@@ -35,7 +35,7 @@ class RegistrationAdmin(admin.ModelAdmin):
     list_display = ['name', 'student_id', 'email', 'event', 'is_valid', 'has_attended', 'registered_at']
     list_filter = ['is_valid', 'has_attended', 'event', 'registered_at']
     search_fields = ['name', 'student_id', 'email']
-    readonly_fields = ['id', 'qr_code_data', 'qr_code_image', 'registered_at', 'scanned_at']
+    readonly_fields = ['id', 'qr_code_data', 'qr_code_file', 'registered_at', 'scanned_at']
     
     fieldsets = (
         ('Participant Information', {
@@ -45,7 +45,7 @@ class RegistrationAdmin(admin.ModelAdmin):
             'fields': ('event',)
         }),
         ('QR Code', {
-            'fields': ('qr_code_data', 'qr_code_image'),
+            'fields': ('qr_code_data', 'qr_code_file'),
             'classes': ('collapse',)
         }),
         ('Attendance Status', {
@@ -72,3 +72,11 @@ class AttendanceLogAdmin(admin.ModelAdmin):
     def has_change_permission(self, request, obj=None):
         # Logs should be read-only
         return False
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['registration', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['registration__name', 'registration__email']
+    readonly_fields = ['id', 'registration', 'attempts', 'last_error', 'created_at', 'sent_at']
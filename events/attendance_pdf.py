@@ -0,0 +1,153 @@
+"""
+Streaming attendance table for the attendance PDF.
+
+Rows are read with ``values_list(...).iterator()`` and turned into page-sized
+``Table`` chunks only when reportlab's layout loop asks for the next flowable,
+so the number of live rows and style commands stays bounded however large the
+event is. Chunks share one body style; per-row status colors are merged into
+runs. The finished PDF is written to a spooled temporary file that rolls over
+to disk for big reports and is streamed from there.
+"""
+import tempfile
+from itertools import chain, groupby
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+from .report_assets import attendance_closing, attendance_header
+
+# About one A4 page of 9pt rows with the report's padding
+ROWS_PER_CHUNK = 28
+DB_CHUNK_SIZE = 2000
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024
+
+HEADER_ROW = ['S.No', 'Student ID', 'Name', 'Email', 'Status']
+COL_WIDTHS = [0.5*inch, 1*inch, 2.2*inch, 2.3*inch, 1*inch]
+BORDER = 1.5
+
+BODY_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), colors.white),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (1, -1), 'CENTER'),
+    ('ALIGN', (2, 0), (3, -1), 'LEFT'),
+    ('ALIGN', (4, 0), (4, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('FONTNAME', (4, 0), (4, -1), 'Helvetica-Bold'),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    # Chunks stack into one table, so only the outer edges get the heavy border
+    ('LINEBEFORE', (0, 0), (0, -1), BORDER, colors.black),
+    ('LINEAFTER', (-1, 0), (-1, -1), BORDER, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 6),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+])
+
+HEADER_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#5b7fbf')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+    ('TOPPADDING', (0, 0), (-1, 0), 10),
+    ('LINEABOVE', (0, 0), (-1, 0), BORDER, colors.black),
+])
+
+LAST_CHUNK_STYLE = TableStyle([
+    ('LINEBELOW', (0, -1), (-1, -1), BORDER, colors.black),
+])
+
+STATUS_COLORS = {
+    'PRESENT': (colors.HexColor('#d4edda'), colors.HexColor('#155724')),
+    'ABSENT': (colors.HexColor('#f8d7da'), colors.HexColor('#721c24')),
+}
+
+
+def _status_style(statuses, first_row):
+    """Color the Status column with one command pair per run of equal statuses"""
+    commands = []
+    row = first_row
+    for status, run in groupby(statuses):
+        end = row + sum(1 for _ in run) - 1
+        background, text = STATUS_COLORS[status]
+        commands.append(('BACKGROUND', (4, row), (4, end), background))
+        commands.append(('TEXTCOLOR', (4, row), (4, end), text))
+        row = end + 1
+    return TableStyle(commands)
+
+
+def _chunk_table(rows, first, last):
+    data = [HEADER_ROW] + rows if first else rows
+    table = Table(data, colWidths=COL_WIDTHS)
+    table.setStyle(BODY_STYLE)
+    if first:
+        table.setStyle(HEADER_STYLE)
+    table.setStyle(_status_style([row[4] for row in rows], 1 if first else 0))
+    if last:
+        table.setStyle(LAST_CHUNK_STYLE)
+    return table
+
+
+def attendance_rows(registrations):
+    """Yield numbered report rows from a registration queryset, one DB chunk at a time"""
+    values = registrations.values_list('student_id', 'name', 'email', 'has_attended')
+    for idx, (student_id, name, email, has_attended) in enumerate(
+        values.iterator(chunk_size=DB_CHUNK_SIZE), start=1
+    ):
+        yield [str(idx), student_id, name, email, 'PRESENT' if has_attended else 'ABSENT']
+
+
+def attendance_tables(rows, rows_per_chunk=ROWS_PER_CHUNK):
+    """Yield the attendance table as page-sized chunks that render as one table"""
+    rows = iter(rows)
+    pending = [row for _, row in zip(range(rows_per_chunk), rows)]
+    first = True
+    while pending:
+        following = [row for _, row in zip(range(rows_per_chunk), rows)]
+        yield _chunk_table(pending, first, last=not following)
+        pending, first = following, False
+
+
+class LazyFlowables(list):
+    """
+    Flowable list for ``doc.build()`` that is filled from an iterable on demand.
+
+    reportlab consumes the list from the front and checks ``len()`` before
+    each flowable, so pulling the next item there keeps only the flowables
+    currently being laid out in memory.
+    """
+
+    def __init__(self, source):
+        super().__init__()
+        self._source = iter(source)
+
+    def __len__(self):
+        if not super().__len__():
+            for flowable in self._source:
+                self.append(flowable)
+                break
+        return super().__len__()
+
+
+def build_attendance_pdf(output, event_name, report_date, rows):
+    """Render the attendance report for numbered rows (see attendance_rows) into a file object"""
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=A4,
+        rightMargin=40,
+        leftMargin=40,
+        topMargin=15,
+        bottomMargin=40
+    )
+    flowables = chain(attendance_header(event_name, report_date), attendance_tables(rows), attendance_closing())
+    doc.build(LazyFlowables(flowables))
+
+
+def spooled_buffer():
+    """File object for the rendered PDF; spills to disk past ``SPOOL_MAX_MEMORY``"""
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
@@ -0,0 +1,106 @@
+"""
+Bulk registration import.
+
+Rows are validated in memory, duplicates are found with a single query per
+event, QR codes are rendered across a process pool and registrations are
+inserted with ``bulk_create`` in chunks. Every input row gets an entry in the
+returned report.
+"""
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+
+from . import rollups
+from .models import Event, OutboundEmail, Registration
+from .qr_images import render_qr_png, store_png
+from .qr_tokens import generate_token
+from .serializers import RegistrationImportRowSerializer
+
+# Below this many rows a process pool costs more than it saves
+POOL_THRESHOLD = 50
+
+
+def parse_rows(content, fmt='csv'):
+    """Parse CSV text (with a header row) or a JSON list into row dicts"""
+    if fmt == 'json':
+        rows = json.loads(content) if isinstance(content, (str, bytes)) else content
+        if not isinstance(rows, list):
+            raise ValueError('JSON import must be a list of objects')
+        return rows
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    return list(csv.DictReader(io.StringIO(content)))
+
+
+def _render_all(payloads, workers):
+    if workers <= 1 or len(payloads) < POOL_THRESHOLD:
+        return [render_qr_png(payload) for payload in payloads]
+    chunksize = max(1, len(payloads) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(render_qr_png, payloads, chunksize=chunksize))
+
+
+def import_registrations(event, rows, workers=None, chunk_size=None, send_emails=True):
+    """Validate, de-duplicate and insert registrations for an event"""
+    workers = workers or settings.BULK_IMPORT_WORKERS or os.cpu_count() or 1
+    chunk_size = chunk_size or settings.BULK_IMPORT_CHUNK_SIZE
+    
+    # One query for every email already registered for this event
+    existing = set(Registration.objects.filter(event=event).values_list('email', flat=True))
+    
+    results = []
+    pending = []
+    for index, row in enumerate(rows, start=1):
+        serializer = RegistrationImportRowSerializer(data=row)
+        if not serializer.is_valid():
+            results.append({'row': index, 'status': 'invalid', 'errors': serializer.errors})
+            continue
+        data = serializer.validated_data
+        if data['email'] in existing:
+            results.append({'row': index, 'email': data['email'], 'status': 'duplicate'})
+            continue
+        existing.add(data['email'])
+        result = {'row': index, 'email': data['email'], 'status': 'created'}
+        results.append(result)
+        pending.append((result, data))
+    
+    tokens = [generate_token() for _ in pending]
+    images = _render_all([token for token, _ in tokens], workers)
+    
+    registrations = []
+    for (result, data), (qr_data, qr_token), png_bytes in zip(pending, tokens, images):
+        registration = Registration(
+            event=event,
+            qr_code_data=qr_data,
+            qr_token=qr_token,
+            qr_code_file=store_png(png_bytes),
+            **data
+        )
+        result['id'] = str(registration.id)
+        registrations.append(registration)
+    
+    with transaction.atomic():
+        Registration.objects.bulk_create(registrations, batch_size=chunk_size)
+        # bulk_create sends no post_save, so count the rows here
+        Event.adjust_totals(event.id, registered=len(registrations))
+        rollups.record(event.id, registrations=len(registrations))
+        if send_emails:
+            OutboundEmail.objects.bulk_create(
+                [OutboundEmail(registration=registration) for registration in registrations],
+                batch_size=chunk_size,
+            )
+    
+    counts = {'created': 0, 'duplicate': 0, 'invalid': 0}
+    for result in results:
+        counts[result['status']] += 1
+    return {
+        'event': str(event.id),
+        'total': len(results),
+        **counts,
+        'rows': results,
+    }
@@ -0,0 +1,139 @@
+"""
+Batch check-in for scanners that sync queued scans.
+
+All scans in a batch are resolved with one indexed ``IN`` lookup, applied in
+original scan-time order (first scan wins) and logged with one
+``bulk_create``.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Q, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AttendanceLog, Event, Registration
+from .qr_tokens import lookup_for_payload
+from .rollups import record_scans
+
+MESSAGES = {
+    'success': 'Attendance marked successfully',
+    'already_used': 'QR code already used',
+    'invalid': 'Invalid QR code',
+}
+
+
+def _parse_scan_time(value, now):
+    """Parse a client timestamp; missing means now, future times are clamped to now"""
+    if not value:
+        return now
+    try:
+        parsed = parse_datetime(str(value))
+    except ValueError:
+        # Well formed but out of range, e.g. month 13
+        return None
+    if parsed is None:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return min(parsed, now)
+
+
+def _result(scan, scan_result, registration=None, message=None):
+    return {
+        'id': scan.get('id') if isinstance(scan, dict) else None,
+        'valid': scan_result == 'success',
+        'scan_result': scan_result,
+        'message': message or MESSAGES[scan_result],
+        'registration': registration,
+    }
+
+
+def verify_batch(scans, ip_address=None):
+    """Resolve a list of {'qr_data', 'scanned_at', 'id'} scans; returns results in input order"""
+    now = timezone.now()
+    results = [None] * len(scans)
+    pending = []
+    for index, scan in enumerate(scans):
+        qr_data = scan.get('qr_data') if isinstance(scan, dict) else None
+        lookup = lookup_for_payload(qr_data) if qr_data else None
+        if lookup is None:
+            results[index] = _result(scan, 'invalid', message='Invalid QR code format')
+            continue
+        scan_time = _parse_scan_time(scan.get('scanned_at'), now)
+        if scan_time is None:
+            results[index] = _result(scan, 'invalid', message='Invalid scan time')
+            continue
+        pending.append((scan_time, index, lookup))
+    
+    if not pending:
+        return results
+    
+    tokens = [value for _, _, (field, value) in pending if field == 'qr_token']
+    legacy = [value for _, _, (field, value) in pending if field == 'qr_code_data']
+    query = Q(qr_token__in=tokens)
+    if legacy:
+        query |= Q(qr_code_data__in=legacy)
+    
+    with transaction.atomic():
+        found = {}
+        for registration in Registration.objects.select_for_update().select_related('event').filter(query):
+            if registration.qr_token:
+                found[('qr_token', registration.qr_token)] = registration
+            found[('qr_code_data', registration.qr_code_data)] = registration
+        
+        # Earliest scan of each ticket wins, regardless of arrival order
+        checked_in = {}
+        logs = {}
+        for scan_time, index, lookup in sorted(pending, key=lambda item: (item[0], item[1])):
+            registration = found.get(lookup)
+            if registration is None:
+                results[index] = _result(scans[index], 'invalid')
+                continue
+            if registration.is_valid:
+                registration.is_valid = False
+                registration.has_attended = True
+                registration.scanned_at = scan_time
+                checked_in[registration.pk] = (index, registration)
+                scan_result = 'success'
+            else:
+                scan_result = 'already_used'
+            results[index] = _result(scans[index], scan_result, registration)
+            logs[index] = AttendanceLog(
+                registration=registration,
+                scan_result=scan_result,
+                scan_time=scan_time,
+                ip_address=ip_address,
+            )
+        
+        if checked_in:
+            updated = Registration.objects.filter(pk__in=checked_in, is_valid=True).update(
+                is_valid=False,
+                has_attended=True,
+                updated_at=now,
+                scanned_at=Case(
+                    *[When(pk=pk, then=Value(registration.scanned_at))
+                      for pk, (_, registration) in checked_in.items()],
+                    output_field=DateTimeField(),
+                ),
+            )
+            if updated != len(checked_in):
+                # Another gate checked some of these in after our read
+                current = dict(
+                    Registration.objects.filter(pk__in=checked_in).values_list('pk', 'scanned_at')
+                )
+                for pk, (index, registration) in list(checked_in.items()):
+                    if current.get(pk) != registration.scanned_at:
+                        registration.scanned_at = current.get(pk)
+                        results[index] = _result(scans[index], 'already_used', registration)
+                        logs[index].scan_result = 'already_used'
+                        del checked_in[pk]
+            
+            per_event = Counter(registration.event_id for _, registration in checked_in.values())
+            for event_id, count in per_event.items():
+                Event.adjust_totals(event_id, present=count)
+        
+        AttendanceLog.objects.bulk_create(logs.values())
+        record_scans(logs.values())
+    
+    return results
@@ -0,0 +1,165 @@
+"""
+DOCX attendance report from the department template.
+
+``docx_templates/CSE_AIML_Attendance_Template_Updated.docx`` is written for
+docxtpl: a ``{%tr for student in students %}`` table row plus ``{{ ... }}``
+placeholders. docxtpl is not a dependency, so the template is parsed once per
+worker with python-docx. The loop row is reduced to a prototype with one text
+node per cell and detached. Each report deep-copies the parsed document,
+fills the placeholders, and appends one copy of the prototype row per
+registration straight to the table XML. python-docx's ``add_row()`` and
+``cell.text`` re-walk the table for every row, which is what makes naive
+filling quadratic.
+"""
+import copy
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from docx import Document
+from docx.oxml.ns import qn
+
+TEMPLATE_PATH = Path(__file__).resolve().parent / 'docx_templates' / 'CSE_AIML_Attendance_Template_Updated.docx'
+PLACEHOLDER = re.compile(r'\{\{\s*([\w.]+)\s*\}\}')
+TEMPLATE_TAG = re.compile(r'\{%.*?%\}')
+LOOP_TAG = '{%tr for'
+
+
+class _Template:
+    """Parsed template with the loop row detached as a prototype"""
+
+    def __init__(self, path):
+        self.document = Document(str(path))
+        # Work on the XML only: python-docx proxies cached on the template (e.g.
+        # document.tables) would still point into the original tree after deepcopy
+        body = self.document.element.body
+        for table_index, tbl in enumerate(body.iterchildren(qn('w:tbl'))):
+            for tr in tbl.iterchildren(qn('w:tr')):
+                if LOOP_TAG in ''.join(t.text or '' for t in tr.iter(qn('w:t'))):
+                    self.table_index = table_index
+                    self.fields = self._make_prototype(tr)
+                    tbl.remove(tr)
+                    self.row = tr
+                    return
+        raise ValueError(f'{path} has no {LOOP_TAG} row')
+
+    @staticmethod
+    def _make_prototype(tr):
+        """Keep one run per cell and return the field name shown in each cell"""
+        # The template row is drawn tall; let filled rows size to their text
+        for height in tr.iter(qn('w:trHeight')):
+            height.getparent().remove(height)
+
+        fields = []
+        for tc in tr.iter(qn('w:tc')):
+            text = TEMPLATE_TAG.sub('', ''.join(t.text or '' for t in tc.iter(qn('w:t'))))
+            match = PLACEHOLDER.search(text)
+            fields.append(match.group(1).split('.')[-1] if match else None)
+
+            paragraphs = tc.findall(qn('w:p'))
+            for extra in paragraphs[1:]:
+                tc.remove(extra)
+            paragraph = paragraphs[0]
+            runs = [r for r in paragraph.findall(qn('w:r')) if r.find(qn('w:t')) is not None]
+            for child in list(paragraph):
+                if child.tag != qn('w:pPr') and (not runs or child is not runs[0]):
+                    paragraph.remove(child)
+            if runs:
+                for child in list(runs[0]):
+                    if child.tag not in (qn('w:rPr'), qn('w:t')):
+                        runs[0].remove(child)
+                text_node = runs[0].find(qn('w:t'))
+            else:
+                text_node = paragraph.makeelement(qn('w:t'), {})
+                run = paragraph.makeelement(qn('w:r'), {})
+                run.append(text_node)
+                paragraph.append(run)
+            text_node.text = ''
+            text_node.set('{http://www.w3.org/XML/1998/namespace}space', 'preserve')
+        return fields
+
+
+@lru_cache(maxsize=1)
+def _template():
+    return _Template(TEMPLATE_PATH)
+
+
+def _fill_paragraph(paragraph, context):
+    """Replace placeholders that may be split across runs, keeping each run's formatting"""
+    runs = paragraph.runs
+    texts = [run.text for run in runs]
+    full = ''.join(texts)
+    if '{{' not in full:
+        return
+    starts = []
+    offset = 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text)
+
+    def locate(position):
+        index = max(i for i, start in enumerate(starts) if start <= position)
+        return index, position - starts[index]
+
+    for match in reversed(list(PLACEHOLDER.finditer(full))):
+        value = str(context.get(match.group(1).split('.')[-1], ''))
+        first, first_offset = locate(match.start())
+        last, last_offset = locate(match.end() - 1)
+        if first == last:
+            texts[first] = texts[first][:first_offset] + value + texts[first][last_offset + 1:]
+        else:
+            texts[first] = texts[first][:first_offset] + value
+            for i in range(first + 1, last):
+                texts[i] = ''
+            texts[last] = texts[last][last_offset + 1:]
+    for run, text in zip(runs, texts):
+        if run.text != text:
+            run.text = text
+
+
+def _paragraphs(document):
+    yield from document.paragraphs
+    for section in document.sections:
+        # Reading a linked header/footer would add an empty definition to the copy
+        for part in (section.header, section.footer):
+            if not part.is_linked_to_previous:
+                yield from part.paragraphs
+
+
+def build_attendance_docx(rows, context, output):
+    """
+    Write the attendance DOCX to ``output``.
+
+    ``rows`` yields dicts keyed by the template's field names (``sno``,
+    ``student_id``, ``name``, ``email``, ``reg_id``); ``context`` fills the
+    document placeholders such as ``event_name`` and ``date``.
+    """
+    template = _template()
+    document = copy.deepcopy(template.document)
+    for paragraph in _paragraphs(document):
+        _fill_paragraph(paragraph, context)
+
+    tbl = document.tables[template.table_index]._tbl
+    prototype, fields = template.row, template.fields
+    text_tag = qn('w:t')
+    for row in rows:
+        tr = copy.deepcopy(prototype)
+        for node, field in zip(tr.iter(text_tag), fields):
+            node.text = '' if field is None else str(row.get(field, ''))
+        tbl.append(tr)
+
+    document.save(output)
+
+
+def docx_rows(registrations):
+    """Template rows for a registration queryset, read with values_list().iterator()"""
+    values = registrations.values_list('id', 'student_id', 'name', 'email', 'has_attended')
+    for sno, (pk, student_id, name, email, has_attended) in enumerate(values.iterator(chunk_size=2000), start=1):
+        yield {
+            'sno': sno,
+            'student_id': student_id,
+            'name': name,
+            'email': email,
+            'reg_id': str(pk)[:8].upper(),
+            'status': 'PRESENT' if has_attended else 'ABSENT',
+        }
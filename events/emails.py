@@ -0,0 +1,167 @@
+"""
+Registration emails and the persistent outbox.
+
+``RegistrationViewSet.create`` only writes an ``OutboundEmail`` row; the
+``send_outbox`` management command drains the queue in batches over a single
+SMTP connection, retrying failures with exponential backoff.
+
+A worker first claims its batch (``pending`` -> ``sending``) with one
+conditional ``UPDATE``, so overlapping workers never send the same email.
+Rows left in ``sending`` by a worker that died are released again after
+``EMAIL_OUTBOX_CLAIM_TIMEOUT`` seconds.
+"""
+import os
+import uuid
+from datetime import timedelta
+from functools import lru_cache
+from email.mime.image import MIMEImage
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import OutboundEmail
+from .qr_images import qr_png_for
+
+
+@lru_cache(maxsize=1)
+def _college_logo():
+    """College logo bytes, read once per worker"""
+    logo_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'cmrtc.png')
+    if not os.path.exists(logo_path):
+        return None
+    with open(logo_path, 'rb') as f:
+        return f.read()
+
+
+def build_registration_email(registration, qr_code_bytes, connection=None):
+    """Build the registration confirmation email with QR code"""
+    event = registration.event
+    
+    # Prepare email context
+    context = {
+        'name': registration.name,
+        'event_name': event.name,
+        'event_venue': event.venue,
+        'event_date': event.start_date.strftime('%B %d, %Y at %I:%M %p'),
+        'student_id': registration.student_id,
+        'registration_id': str(registration.id)[:8].upper(),
+    }
+    
+    # Render HTML email
+    html_content = render_to_string('emails/registration_email.html', context)
+    
+    subject = f'Event Registration Confirmation - {event.name}'
+    msg = EmailMultiAlternatives(
+        subject, '', settings.DEFAULT_FROM_EMAIL, [registration.email], connection=connection
+    )
+    msg.attach_alternative(html_content, "text/html")
+    
+    # Attach college logo
+    logo_bytes = _college_logo()
+    if logo_bytes:
+        logo_img = MIMEImage(logo_bytes)
+        logo_img.add_header('Content-ID', '<college_logo>')
+        logo_img.add_header('Content-Disposition', 'inline', filename='logo.png')
+        msg.attach(logo_img)
+    
+    # Attach QR code
+    qr_img = MIMEImage(qr_code_bytes)
+    qr_img.add_header('Content-ID', '<qr_code>')
+    qr_img.add_header('Content-Disposition', 'inline', filename='qr_code.png')
+    msg.attach(qr_img)
+    
+    return msg
+
+
+def enqueue_registration_email(registration):
+    """Queue a confirmation email for the outbox worker"""
+    return OutboundEmail.objects.create(registration=registration)
+
+
+def _schedule_retry(item, error, now):
+    item.status = 'pending'
+    item.attempts += 1
+    item.last_error = str(error)[:1000]
+    if item.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        item.status = 'failed'
+    else:
+        delay = settings.EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** (item.attempts - 1)
+        item.next_attempt_at = now + timedelta(seconds=delay)
+
+
+def release_stale_claims(now=None):
+    """Put emails claimed longer than EMAIL_OUTBOX_CLAIM_TIMEOUT ago back in the queue"""
+    now = now or timezone.now()
+    return OutboundEmail.objects.filter(
+        status='sending',
+        claimed_at__lt=now - timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT),
+    ).update(status='pending', claim=None, claimed_at=None)
+
+
+def claim_batch(batch_size, now):
+    """Move up to batch_size due emails to 'sending' for this worker and return them"""
+    due = OutboundEmail.objects.filter(status='pending', next_attempt_at__lte=now)
+    ids = list(due.values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    claim = uuid.uuid4()
+    # Rows another worker claimed since our read no longer match status='pending'
+    OutboundEmail.objects.filter(id__in=ids, status='pending').update(
+        status='sending', claim=claim, claimed_at=now
+    )
+    return list(
+        OutboundEmail.objects
+        .select_related('registration__event')
+        .filter(id__in=ids, claim=claim)
+    )
+
+
+def drain_outbox(batch_size=None, connection=None):
+    """
+    Send one batch of due emails over a single SMTP connection.
+    Returns a (sent, failed) tuple.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    now = timezone.now()
+    release_stale_claims(now)
+    batch = claim_batch(batch_size, now)
+    if not batch:
+        return 0, 0
+    claim = batch[0].claim
+    
+    connection = connection or get_connection(fail_silently=False)
+    sent = failed = 0
+    try:
+        connection.open()
+    except Exception as e:
+        # Server unreachable: the whole batch backs off together
+        for item in batch:
+            _schedule_retry(item, e, now)
+        failed = len(batch)
+    else:
+        try:
+            for item in batch:
+                try:
+                    qr_code_bytes = qr_png_for(item.registration)
+                    build_registration_email(item.registration, qr_code_bytes, connection).send()
+                except Exception as e:
+                    _schedule_retry(item, e, now)
+                    failed += 1
+                else:
+                    item.attempts += 1
+                    item.status = 'sent'
+                    item.sent_at = timezone.now()
+                    item.last_error = ''
+                    sent += 1
+        finally:
+            connection.close()
+    
+    for item in batch:
+        item.claim = item.claimed_at = None
+    # Skip rows whose claim timed out and went to another worker meanwhile
+    OutboundEmail.objects.filter(claim=claim).bulk_update(
+        batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at', 'claim', 'claimed_at']
+    )
+    return sent, failed
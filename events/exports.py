@@ -0,0 +1,155 @@
+"""
+CSV/XLSX exports of registrations and attendance logs.
+
+Rows are read with ``values_list(...).iterator()`` and CSV is written to the
+response in blocks as it is produced, so memory stays flat and the first
+bytes go out immediately. XLSX needs the optional ``openpyxl`` package; the
+workbook is written in openpyxl's write-only mode to a spooled temporary
+file and streamed from there.
+"""
+import csv
+import io
+import tempfile
+import uuid
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import AttendanceLog, Registration
+
+try:
+    import openpyxl
+except ImportError:  # XLSX export is optional
+    openpyxl = None
+
+XLSX_AVAILABLE = openpyxl is not None
+
+DB_CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024
+
+REGISTRATION_COLUMNS = [
+    ('id', 'Registration ID'),
+    ('event__name', 'Event'),
+    ('name', 'Name'),
+    ('student_id', 'Student ID'),
+    ('email', 'Email'),
+    ('has_attended', 'Attended'),
+    ('registered_at', 'Registered At'),
+    ('scanned_at', 'Scanned At'),
+]
+
+LOG_COLUMNS = [
+    ('id', 'Log ID'),
+    ('registration__event__name', 'Event'),
+    ('registration__student_id', 'Student ID'),
+    ('registration__name', 'Name'),
+    ('scan_result', 'Result'),
+    ('scan_time', 'Scan Time'),
+    ('ip_address', 'IP Address'),
+]
+
+
+class ExportError(ValueError):
+    """Invalid export filter"""
+
+
+def parse_bound(value, name, end=False):
+    """Parse a date or datetime filter; a plain ``to`` date includes that whole day"""
+    try:
+        day = parse_date(value)
+        parsed = None if day else parse_datetime(value)
+    except ValueError:
+        day = parsed = None
+    if day is not None:
+        parsed = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    elif parsed is None:
+        raise ExportError(f"'{name}' must be a date or datetime")
+    elif end:
+        parsed += timedelta(microseconds=1)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _apply_common_filters(queryset, params, event_field, time_field):
+    event = params.get('event')
+    if event:
+        try:
+            uuid.UUID(event)
+        except ValueError:
+            raise ExportError("'event' must be an event id")
+        queryset = queryset.filter(**{event_field: event})
+    if params.get('from'):
+        queryset = queryset.filter(**{f'{time_field}__gte': parse_bound(params['from'], 'from')})
+    if params.get('to'):
+        queryset = queryset.filter(**{f'{time_field}__lt': parse_bound(params['to'], 'to', end=True)})
+    return queryset
+
+
+def registration_export(params):
+    """Registrations filtered by event, registration date range and attendance"""
+    queryset = _apply_common_filters(Registration.objects.all(), params, 'event_id', 'registered_at')
+    attended = params.get('attended')
+    if attended:
+        if attended not in ('true', 'false'):
+            raise ExportError("'attended' must be true or false")
+        queryset = queryset.filter(has_attended=attended == 'true')
+    return queryset.order_by('registered_at', 'id'), REGISTRATION_COLUMNS
+
+
+def log_export(params):
+    """Attendance logs filtered by event, scan time range and scan result"""
+    queryset = _apply_common_filters(
+        AttendanceLog.objects.all(), params, 'registration__event_id', 'scan_time'
+    )
+    scan_result = params.get('scan_result')
+    if scan_result:
+        valid = {choice for choice, _ in AttendanceLog._meta.get_field('scan_result').choices}
+        if scan_result not in valid:
+            raise ExportError(f"'scan_result' must be one of: {', '.join(sorted(valid))}")
+        queryset = queryset.filter(scan_result=scan_result)
+    return queryset.order_by('scan_time', 'id'), LOG_COLUMNS
+
+
+def _rows(queryset, columns):
+    values = queryset.values_list(*[field for field, _ in columns])
+    for row in values.iterator(chunk_size=DB_CHUNK_SIZE):
+        yield [value.isoformat() if isinstance(value, datetime) else value for value in row]
+
+
+def stream_csv(queryset, columns):
+    """Yield CSV text in blocks of ``ROWS_PER_WRITE`` rows, header first"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([label for _, label in columns])
+    yield buffer.getvalue()
+
+    pending = 0
+    buffer.seek(0)
+    buffer.truncate()
+    for row in _rows(queryset, columns):
+        writer.writerow(row)
+        pending += 1
+        if pending == ROWS_PER_WRITE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue()
+
+
+def write_xlsx(queryset, columns, title):
+    """Write the rows to a spooled XLSX file and return it rewound"""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append([label for _, label in columns])
+    for row in _rows(queryset, columns):
+        sheet.append([str(value) if isinstance(value, uuid.UUID) else value for value in row])
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    workbook.save(output)
+    output.seek(0)
+    return output
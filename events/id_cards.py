@@ -0,0 +1,285 @@
+"""
+Event ID cards.
+
+``draw_id_card`` lays out one A7 card at the canvas origin; callers translate
+the canvas to place it. Batch printing imposes every card of an event 8-up on
+landscape A4 sheets with crop marks. Worker processes encode each card's QR
+payload into runs of dark modules (the slow part), and the sheets are written
+in order by the parent as vector rectangles, which avoids embedding a
+full-size bitmap per card and stays sharp at any print size.
+
+Single cards are cached under ``MEDIA_ROOT/id_cards/<registration id>/``,
+keyed by everything printed on them.
+"""
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from reportlab.lib.pagesizes import A4, A7, landscape
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+from .qr_images import qr_matrix
+from .report_assets import COLLEGE_LOGO, image_reader
+
+logger = logging.getLogger(__name__)
+
+CARD_WIDTH, CARD_HEIGHT = A7
+SHEET_SIZE = landscape(A4)
+COLUMNS, ROWS = 4, 2
+CARDS_PER_SHEET = COLUMNS * ROWS
+# Eight A7 cards fill A4 exactly; leave room for printer margins and crop marks
+SHEET_MARGIN = 10 * mm
+CROP_MARK_LENGTH = 5 * mm
+CROP_MARK_GAP = 1 * mm
+POOL_THRESHOLD = 50
+ID_CARD_DIRECTORY = 'id_cards'
+# Bump when the card layout changes so cached cards are re-rendered
+LAYOUT_VERSION = 1
+
+
+def _wrap(c, text, font, size, max_chars, max_width):
+    """Split text into centered lines once it is longer than max_chars"""
+    if len(text) <= max_chars:
+        return [text]
+    lines = []
+    line = ""
+    for word in text.split():
+        test_line = line + word + " "
+        if c.stringWidth(test_line, font, size) < max_width:
+            line = test_line
+        else:
+            lines.append(line.strip())
+            line = word + " "
+    if line:
+        lines.append(line.strip())
+    return lines
+
+
+def card_cache_key(registration):
+    """Cache key (and ETag) of a single card; changes with anything printed on it"""
+    parts = [
+        LAYOUT_VERSION, registration.id, registration.name, registration.student_id,
+        registration.event.name, registration.qr_code_data,
+    ]
+    return hashlib.sha256('\x1f'.join(map(str, parts)).encode()).hexdigest()[:32]
+
+
+def card_directory(registration_id):
+    """Storage directory holding the cached card of a registration"""
+    return f'{ID_CARD_DIRECTORY}/{registration_id}'
+
+
+def delete_cached_card(registration_id):
+    """Remove every cached version of a registration's card"""
+    directory = card_directory(registration_id)
+    try:
+        _, files = default_storage.listdir(directory)
+    except OSError:
+        return
+    for name in files:
+        default_storage.delete(f'{directory}/{name}')
+
+
+def draw_id_card(c, registration_id, name, student_id, event_name, draw_qr):
+    """Draw one A7 card with its lower-left corner at the canvas origin"""
+    width, height = CARD_WIDTH, CARD_HEIGHT
+
+    # Draw card border (5mm margin)
+    margin = 5 * mm
+    c.setStrokeColorRGB(0.2, 0.3, 0.5)  # Dark blue
+    c.setLineWidth(2)
+    c.rect(margin, margin, width - 2*margin, height - 2*margin, stroke=1, fill=0)
+
+    # Current Y position (starting from top)
+    y_pos = height - 15 * mm
+
+    # Add College Logo at top
+    try:
+        logo = image_reader(COLLEGE_LOGO)
+        if logo:
+            logo_size = 20 * mm
+            logo_x = (width - logo_size) / 2
+            c.drawImage(logo, logo_x, y_pos - logo_size, width=logo_size, height=logo_size, preserveAspectRatio=True, mask='auto')
+            y_pos -= logo_size + 5 * mm
+    except Exception as e:
+        logger.warning('ID card logo could not be drawn: %s', e)
+        y_pos -= 5 * mm
+
+    # Title "EVENT ID CARD"
+    c.setFont("Helvetica-Bold", 8)
+    c.setFillColorRGB(0.2, 0.3, 0.5)
+    title_text = "EVENT ID CARD"
+    title_width = c.stringWidth(title_text, "Helvetica-Bold", 8)
+    c.drawString((width - title_width) / 2, y_pos, title_text)
+    y_pos -= 8 * mm
+
+    # Student Name (Bold)
+    c.setFont("Helvetica-Bold", 10)
+    c.setFillColorRGB(0, 0, 0)
+    for name_line in _wrap(c, name, "Helvetica-Bold", 10, 20, width - 2*margin - 10*mm):
+        name_width = c.stringWidth(name_line, "Helvetica-Bold", 10)
+        c.drawString((width - name_width) / 2, y_pos, name_line)
+        y_pos -= 5 * mm
+
+    y_pos -= 2 * mm
+
+    # Student ID
+    c.setFont("Helvetica", 8)
+    c.setFillColorRGB(0.3, 0.3, 0.3)
+    student_id_text = f"ID: {student_id}"
+    student_id_width = c.stringWidth(student_id_text, "Helvetica", 8)
+    c.drawString((width - student_id_width) / 2, y_pos, student_id_text)
+    y_pos -= 6 * mm
+
+    # Event Name
+    c.setFont("Helvetica-Bold", 7)
+    c.setFillColorRGB(0.2, 0.3, 0.5)
+    for event_line in _wrap(c, event_name, "Helvetica-Bold", 7, 25, width - 2*margin - 10*mm):
+        event_width = c.stringWidth(event_line, "Helvetica-Bold", 7)
+        c.drawString((width - event_width) / 2, y_pos, event_line)
+        y_pos -= 4 * mm
+
+    y_pos -= 2 * mm
+
+    # QR code (centered)
+    try:
+        qr_size = 25 * mm
+        qr_x = (width - qr_size) / 2
+        draw_qr(c, qr_x, y_pos - qr_size, qr_size)
+        y_pos -= qr_size + 3 * mm
+    except Exception as e:
+        logger.warning('ID card QR code for %s could not be drawn: %s', registration_id, e)
+        c.setFont("Helvetica", 6)
+        c.setFillColorRGB(1, 0, 0)
+        error_text = "QR Code Error"
+        error_width = c.stringWidth(error_text, "Helvetica", 6)
+        c.drawString((width - error_width) / 2, y_pos, error_text)
+        y_pos -= 10 * mm
+
+    # Registration ID (small text at bottom)
+    c.setFont("Helvetica", 5)
+    c.setFillColorRGB(0.5, 0.5, 0.5)
+    reg_id_text = f"Reg ID: {str(registration_id)[:8].upper()}"
+    reg_id_width = c.stringWidth(reg_id_text, "Helvetica", 5)
+    c.drawString((width - reg_id_width) / 2, 8 * mm, reg_id_text)
+
+
+def qr_modules(payload):
+    """
+    Encode a QR payload into (size, runs) in module units, quiet zone included.
+
+    Uses the same QR settings as the emailed PNG. Each run is
+    (row, column, length) of consecutive dark modules.
+    """
+    matrix = qr_matrix(payload)
+    runs = []
+    for row, modules in enumerate(matrix):
+        column = 0
+        for dark, group in groupby(modules):
+            length = len(list(group))
+            if dark:
+                runs.append((row, column, length))
+            column += length
+    return len(matrix), runs
+
+
+def qr_vector(modules):
+    """QR drawer that fills the dark module runs as rectangles"""
+    size_in_modules, runs = modules
+    # Integer rectangles in a module grid with a top-left origin
+    operators = ' '.join(f'{column} {row} {length} 1 re' for row, column, length in runs) + ' f'
+
+    def draw(c, x, y, size):
+        unit = size / size_in_modules
+        c.saveState()
+        c.setFillColorRGB(0, 0, 0)
+        c.transform(unit, 0, 0, -unit, x, y + size)
+        c.addLiteral(operators)
+        c.restoreState()
+    return draw
+
+
+def _unencodable_qr(c, x, y, size):
+    raise ValueError('QR code could not be encoded')
+
+
+def _card_modules(payload):
+    """Pool worker: QR module runs of a payload, or None"""
+    try:
+        return qr_modules(payload)
+    except Exception:
+        return None
+
+
+def _modules_for(payloads, workers):
+    if workers <= 1 or len(payloads) < POOL_THRESHOLD:
+        return [_card_modules(payload) for payload in payloads]
+    chunksize = max(1, len(payloads) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_card_modules, payloads, chunksize=chunksize))
+
+
+def _sheet_layout():
+    """Card scale and lower-left corner of the card grid on a sheet"""
+    sheet_width, sheet_height = SHEET_SIZE
+    scale = min(
+        1,
+        (sheet_width - 2 * SHEET_MARGIN) / (COLUMNS * CARD_WIDTH),
+        (sheet_height - 2 * SHEET_MARGIN) / (ROWS * CARD_HEIGHT),
+    )
+    left = (sheet_width - COLUMNS * CARD_WIDTH * scale) / 2
+    bottom = (sheet_height - ROWS * CARD_HEIGHT * scale) / 2
+    return scale, left, bottom
+
+
+def _draw_crop_marks(c, scale, left, bottom):
+    """Marks at every cut line, outside the card grid"""
+    card_width, card_height = CARD_WIDTH * scale, CARD_HEIGHT * scale
+    right, top = left + COLUMNS * card_width, bottom + ROWS * card_height
+    c.saveState()
+    c.setStrokeColorRGB(0, 0, 0)
+    c.setLineWidth(0.25)
+    for column in range(COLUMNS + 1):
+        x = left + column * card_width
+        c.line(x, bottom - CROP_MARK_GAP, x, bottom - CROP_MARK_GAP - CROP_MARK_LENGTH)
+        c.line(x, top + CROP_MARK_GAP, x, top + CROP_MARK_GAP + CROP_MARK_LENGTH)
+    for row in range(ROWS + 1):
+        y = bottom + row * card_height
+        c.line(left - CROP_MARK_GAP, y, left - CROP_MARK_GAP - CROP_MARK_LENGTH, y)
+        c.line(right + CROP_MARK_GAP, y, right + CROP_MARK_GAP + CROP_MARK_LENGTH, y)
+    c.restoreState()
+
+
+def render_event_cards(event, output, workers=None):
+    """Write every card of an event, 8-up on A4 sheets, to a file object; returns the card count"""
+    workers = workers or settings.ID_CARD_WORKERS or os.cpu_count() or 1
+    cards = list(
+        event.registrations.order_by('student_id', 'id')
+        .values_list('id', 'name', 'student_id', 'qr_code_data')
+    )
+    modules = _modules_for([card[3] for card in cards], workers)
+
+    scale, left, bottom = _sheet_layout()
+    c = canvas.Canvas(output, pagesize=SHEET_SIZE)
+    c.setTitle(f'ID cards - {event.name}')
+    for index, ((registration_id, name, student_id, _), card_modules) in enumerate(zip(cards, modules)):
+        slot = index % CARDS_PER_SHEET
+        if slot == 0:
+            if index:
+                c.showPage()
+            _draw_crop_marks(c, scale, left, bottom)
+        column, row = slot % COLUMNS, slot // COLUMNS
+        c.saveState()
+        c.translate(left + column * CARD_WIDTH * scale, bottom + (ROWS - 1 - row) * CARD_HEIGHT * scale)
+        c.scale(scale, scale)
+        draw_qr = qr_vector(card_modules) if card_modules else _unencodable_qr
+        draw_id_card(c, registration_id, name, student_id, event.name, draw_qr)
+        c.restoreState()
+    c.showPage()
+    c.save()
+    return len(cards)
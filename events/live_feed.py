@@ -0,0 +1,289 @@
+"""
+Live scan feed served as Server-Sent Events.
+
+``verify_qr`` publishes every scan result together with the event's current
+counters. ``LiveFeed`` fans each message out from memory to the SSE
+connections of this process, so open dashboards and gate displays cost no
+database queries. The only query is the publisher's counter read, one per
+scan or batch, and only while somebody can be listening.
+
+A process only sees its own scans. With several workers, set
+``LIVE_FEED_BROKER`` to the ``host:port`` of ``manage.py run_live_feed_broker``.
+Workers then publish to the broker, and one connection per worker relays
+every message back into that worker's fan-out. Messages for the broker go
+into a bounded queue that a background thread sends, once the scan's
+transaction has committed, so a slow or unreachable broker never holds up a
+check-in; while it is down, reconnects back off and messages are dropped.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100  # Per connection; the oldest message is dropped when a client falls behind
+REPLAY_SIZE = 200  # Recent messages kept for clients reconnecting with Last-Event-ID
+BROKER_TIMEOUT = 1.0
+RECONNECT_DELAY = 2.0
+PUBLISH_QUEUE_SIZE = 1000  # Messages waiting for the broker; newer ones are dropped when full
+
+
+def broker_address():
+    """(host, port) from LIVE_FEED_BROKER, or None for an in-process feed"""
+    address = getattr(settings, 'LIVE_FEED_BROKER', None)
+    if not address:
+        return None
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+class _Subscriber:
+    def __init__(self, loop, event_id):
+        self.loop = loop
+        self.event_id = event_id
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def wants(self, message):
+        return self.event_id is None or message.get('event_id') == self.event_id
+
+    def put(self, item):
+        # Runs on the subscriber's loop
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(item)
+
+
+class LiveFeed:
+    """In-process fan-out of feed messages to SSE connections"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._recent = deque(maxlen=REPLAY_SIZE)
+        self._sequence = itertools.count(1)
+        # Message ids are only meaningful to the process that issued them
+        self.boot_id = uuid.uuid4().hex[:8]
+        self._relay = None
+
+    @property
+    def active(self):
+        return bool(self._subscribers)
+
+    def subscribe(self, event_id=None, last_event_id=None):
+        """Register a connection on the running loop; returns (subscriber, messages to replay)"""
+        loop = asyncio.get_running_loop()
+        subscriber = _Subscriber(loop, event_id)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            replay = [
+                (message_id, message) for message_id, message in self._recent
+                if self._after(message_id, last_event_id) and subscriber.wants(message)
+            ] if last_event_id else []
+        if broker_address() and (self._relay is None or self._relay.done()):
+            self._relay = loop.create_task(self._relay_from_broker())
+        return subscriber, replay
+
+    def _after(self, message_id, last_event_id):
+        boot_id, _, sequence = last_event_id.partition('-')
+        if boot_id != self.boot_id or not sequence.isdigit():
+            return False
+        return int(message_id.partition('-')[2]) > int(sequence)
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def dispatch(self, message):
+        """Hand a message to every matching subscriber; safe to call from any thread"""
+        with self._lock:
+            message_id = f'{self.boot_id}-{next(self._sequence)}'
+            self._recent.append((message_id, message))
+            subscribers = [s for s in self._subscribers if s.wants(message)]
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.put, (message_id, message))
+            except RuntimeError:
+                # The connection's loop has shut down
+                self.unsubscribe(subscriber)
+
+    async def _relay_from_broker(self):
+        """Feed messages from the broker into this process while anyone is subscribed"""
+        host, port = broker_address()
+        while self.active:
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+            except OSError as exc:
+                logger.warning('Live feed broker %s:%s unreachable: %s', host, port, exc)
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            writer.write(b'SUB\n')
+            try:
+                while self.active:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    try:
+                        self.dispatch(json.loads(line))
+                    except ValueError:
+                        logger.warning('Dropped malformed live feed message')
+            finally:
+                writer.close()
+
+
+class _BrokerPublisher:
+    """Sends messages to the broker from a background thread, so publishers never block"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+        self._socket = None
+        self._retry_at = 0.0
+
+    def send(self, message):
+        """Queue a message for the broker; returns False if it had to be dropped"""
+        line = (json.dumps(message, separators=(',', ':')) + '\n').encode()
+        with self._lock:
+            if self._pid != os.getpid():
+                # Threads do not survive a fork; each worker starts its own
+                self._queue = queue.Queue(maxsize=PUBLISH_QUEUE_SIZE)
+                self._pid = os.getpid()
+                self._socket = None
+                threading.Thread(target=self._run, args=[self._queue], name='live-feed-publisher', daemon=True).start()
+        try:
+            self._queue.put_nowait(line)
+            return True
+        except queue.Full:
+            return False
+
+    def _run(self, lines):
+        while True:
+            line = lines.get()
+            if time.monotonic() < self._retry_at:
+                # The broker was unreachable moments ago; the feed is best effort
+                continue
+            try:
+                if self._socket is None:
+                    self._socket = socket.create_connection(broker_address(), timeout=BROKER_TIMEOUT)
+                    self._socket.sendall(b'PUB\n')
+                self._socket.sendall(line)
+            except OSError as exc:
+                self._close()
+                self._retry_at = time.monotonic() + RECONNECT_DELAY
+                logger.warning('Could not publish to live feed broker: %s', exc)
+
+    def _close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+feed = LiveFeed()
+_publisher = _BrokerPublisher()
+
+
+def listening():
+    """Whether a published message can reach anyone"""
+    return feed.active or broker_address() is not None
+
+
+def _counters(event_ids):
+    """Current registered/present/absent totals for the given events, in one query"""
+    rows = Event.objects.filter(pk__in=set(event_ids)).values_list('pk', 'registered_total', 'present_total')
+    return {
+        str(pk): {'registered': registered, 'present': present, 'absent': registered - present}
+        for pk, registered, present in rows
+    }
+
+
+def scan_message(scan_result, message, registration=None, counters=None):
+    """Feed message for one verify_qr result, with the event's counters after the scan"""
+    data = {
+        'type': 'scan',
+        'scan_result': scan_result,
+        'valid': scan_result == 'success',
+        'message': message,
+        'event_id': None,
+        'event_name': None,
+        'registration': None,
+        'counters': None,
+        'time': timezone.now().isoformat(),
+    }
+    if registration is not None:
+        data['event_id'] = str(registration.event_id)
+        data['event_name'] = registration.event.name
+        data['registration'] = {
+            'id': str(registration.id),
+            'name': registration.name,
+            'student_id': registration.student_id,
+        }
+        data['counters'] = (counters or {}).get(data['event_id'])
+    return data
+
+
+def _send(data):
+    # Listeners only hear about scans that were committed
+    if broker_address() is not None:
+        transaction.on_commit(lambda: _publisher.send(data))
+    else:
+        transaction.on_commit(lambda: feed.dispatch(data))
+
+
+def publish_scan(scan_result, message, registration=None):
+    """Publish a verify_qr result to the live feed if anyone can be listening"""
+    if not listening():
+        return
+    counters = _counters([registration.event_id]) if registration is not None else None
+    _send(scan_message(scan_result, message, registration, counters))
+
+
+def publish_batch(results):
+    """Publish verify_batch results, reading the counters of all their events once"""
+    if not listening():
+        return
+    counters = _counters(r['registration'].event_id for r in results if r['registration'] is not None)
+    for result in results:
+        _send(scan_message(result['scan_result'], result['message'], result['registration'], counters))
+
+
+def sse_frame(message_id, message):
+    return f'id: {message_id}\nevent: {message["type"]}\ndata: {json.dumps(message)}\n\n'
+
+
+async def sse_stream(event_id=None, last_event_id=None):
+    """Yield SSE frames until the connection has been open for LIVE_FEED_MAX_AGE seconds"""
+    subscriber, replay = feed.subscribe(event_id, last_event_id)
+    keepalive = settings.LIVE_FEED_KEEPALIVE
+    loop = asyncio.get_running_loop()
+    # Ending the stream makes EventSource reconnect (and replay via Last-Event-ID),
+    # which also releases connections whose client went away unnoticed
+    deadline = loop.time() + settings.LIVE_FEED_MAX_AGE
+    try:
+        yield f'retry: {int(RECONNECT_DELAY * 1000)}\n\n'
+        for message_id, message in replay:
+            yield sse_frame(message_id, message)
+        while loop.time() < deadline:
+            try:
+                message_id, message = await asyncio.wait_for(
+                    subscriber.queue.get(), min(keepalive, max(deadline - loop.time(), 0))
+                )
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield sse_frame(message_id, message)
+    finally:
+        feed.unsubscribe(subscriber)
@@ -0,0 +1,67 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from docx import Document
+
+from events.attendance_pdf import build_attendance_pdf
+from events.docx_report import TEMPLATE_PATH, _template, build_attendance_docx
+
+CONTEXT = {'event_name': 'Benchmark', 'date': 'January 01, 2025'}
+
+
+def _rows(count):
+    for sno in range(1, count + 1):
+        yield {
+            'sno': sno,
+            'student_id': f'22R01A{sno:04d}',
+            'name': f'Student {sno}',
+            'email': f'student{sno}@example.com',
+            'reg_id': f'{sno:08X}',
+            'status': 'PRESENT' if sno % 3 else 'ABSENT',
+        }
+
+
+def _docx(count):
+    build_attendance_docx(_rows(count), CONTEXT, io.BytesIO())
+
+
+def _pdf(count):
+    rows = ([str(row['sno']), row['student_id'], row['name'], row['email'], row['status']] for row in _rows(count))
+    build_attendance_pdf(io.BytesIO(), CONTEXT['event_name'], CONTEXT['date'], rows)
+
+
+def _naive_docx(count):
+    """Per-row add_row()/cell.text, as a straightforward python-docx fill would do it"""
+    document = Document(str(TEMPLATE_PATH))
+    table = document.tables[_template().table_index]
+    table._tbl.remove(table.rows[-1]._tr)
+    for row in _rows(count):
+        cells = table.add_row().cells
+        for cell, field in zip(cells, ('sno', 'student_id', 'name', 'email', 'reg_id')):
+            cell.text = str(row[field])
+    document.save(io.BytesIO())
+
+
+class Command(BaseCommand):
+    help = 'Time the bulk DOCX attendance export against the PDF report and a naive add_row() fill'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[500, 2000, 10000], help='Row counts to measure')
+        parser.add_argument(
+            '--naive-max', type=int, default=500,
+            help='Largest row count to run the naive add_row() fill for (it is quadratic)'
+        )
+
+    def handle(self, *args, **options):
+        _template()
+        renders = [('docx', _docx), ('pdf', _pdf), ('docx add_row', _naive_docx)]
+        for count in options['rows']:
+            timings = []
+            for label, render in renders:
+                if render is _naive_docx and count > options['naive_max']:
+                    continue
+                start = time.perf_counter()
+                render(count)
+                timings.append(f'{label} {(time.perf_counter() - start) * 1000:.0f} ms')
+            self.stdout.write(f'{count} rows: ' + ', '.join(timings))
@@ -0,0 +1,53 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from reportlab.lib.pagesizes import A4, A7
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+from reportlab.platypus import SimpleDocTemplate
+
+from events import report_assets
+
+
+def _report_frame():
+    """Attendance report without the table: header, logos, styles and footer"""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=40, leftMargin=40, topMargin=15, bottomMargin=40)
+    doc.build(report_assets.attendance_header('Benchmark', 'January 01, 2025') + report_assets.attendance_closing())
+
+
+def _id_card_logo():
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A7)
+    logo = report_assets.image_reader(report_assets.COLLEGE_LOGO)
+    if logo:
+        c.drawImage(logo, 27 * mm, 70 * mm, width=20 * mm, height=20 * mm, preserveAspectRatio=True, mask='auto')
+    c.save()
+
+
+class Command(BaseCommand):
+    help = 'Time the per-request PDF asset work with cold (reloaded every time) and preloaded assets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Renders per measurement')
+
+    def _measure(self, render, iterations, cold):
+        report_assets.reset()
+        render()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            if cold:
+                report_assets.reset()
+            render()
+        return (time.perf_counter() - start) / iterations * 1000
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        for label, render in (('attendance header/footer', _report_frame), ('id card logo', _id_card_logo)):
+            cold = self._measure(render, iterations, cold=True)
+            warm = self._measure(render, iterations, cold=False)
+            self.stdout.write(
+                f'{label}: cold {cold:.2f} ms, preloaded {warm:.2f} ms, '
+                f'saved {cold - warm:.2f} ms per request ({(1 - warm / cold) * 100:.0f}%)'
+            )
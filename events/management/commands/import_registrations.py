@@ -0,0 +1,65 @@
+import json
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from events.bulk_import import import_registrations, parse_rows
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Bulk import registrations for an event from a CSV (name,student_id,email) or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', help='UUID of the event')
+        parser.add_argument('path', help='CSV or JSON file to import')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'json'],
+            help='Input format (defaults to the file extension)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Processes used for QR generation (defaults to BULK_IMPORT_WORKERS)',
+        )
+        parser.add_argument(
+            '--no-email',
+            action='store_true',
+            help='Do not queue confirmation emails',
+        )
+        parser.add_argument(
+            '--report',
+            help='Write the per-row JSON report to this file',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(id=options['event_id'])
+        except (Event.DoesNotExist, ValidationError):
+            raise CommandError(f"Event {options['event_id']} not found")
+
+        path = Path(options['path'])
+        fmt = options['format'] or ('json' if path.suffix.lower() == '.json' else 'csv')
+        try:
+            rows = parse_rows(path.read_bytes(), fmt)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read {path}: {e}')
+
+        report = import_registrations(
+            event,
+            rows,
+            workers=options['workers'],
+            send_emails=not options['no_email'],
+        )
+
+        if options['report']:
+            Path(options['report']).write_text(json.dumps(report, indent=2))
+        for result in report['rows']:
+            if result['status'] == 'invalid':
+                self.stdout.write(f"Row {result['row']}: {result['errors']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} of {report['total']} rows "
+            f"({report['duplicate']} duplicates, {report['invalid']} invalid)"
+        ))
@@ -0,0 +1,36 @@
+import time
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from events.id_cards import CARDS_PER_SHEET, render_event_cards
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Render every ID card of an event, 8-up on A4 sheets with crop marks, into one PDF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', help='UUID of the event')
+        parser.add_argument('output', help='PDF file to write')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Processes used for QR encoding (defaults to ID_CARD_WORKERS)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(id=options['event_id'])
+        except (Event.DoesNotExist, ValidationError):
+            raise CommandError(f"Event {options['event_id']} not found")
+
+        start = time.perf_counter()
+        output = Path(options['output'])
+        with output.open('wb') as f:
+            count = render_event_cards(event, f, workers=options['workers'])
+
+        sheets = -(-count // CARDS_PER_SHEET)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {count} cards on {sheets} sheets to {output} in {time.perf_counter() - start:.1f}s'
+        ))
@@ -0,0 +1,21 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from events.models import Event
+from events.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-minute/per-hour attendance rollups from registrations and scan logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', help='Only rebuild this event (id)')
+
+    def handle(self, *args, **options):
+        event_id = options['event']
+        if event_id:
+            try:
+                event_id = Event.objects.get(id=event_id).id
+            except (Event.DoesNotExist, ValidationError):
+                raise CommandError(f"Event {options['event']} not found")
+        buckets = rebuild(event_id)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {buckets} minute buckets'))
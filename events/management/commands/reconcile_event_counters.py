@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Reconcile Event.registered_total/present_total against the real registration counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report drift, do not write corrected values',
+        )
+
+    def handle(self, *args, **options):
+        drifted = []
+        for event in Event.objects.with_counts():
+            if (event.registered_total, event.present_total) == (event.num_registered, event.num_present):
+                continue
+            self.stdout.write(
+                f'{event.name}: registered {event.registered_total} -> {event.num_registered}, '
+                f'present {event.present_total} -> {event.num_present}'
+            )
+            event.registered_total = event.num_registered
+            event.present_total = event.num_present
+            drifted.append(event)
+
+        if drifted and not options['dry_run']:
+            with transaction.atomic():
+                Event.objects.bulk_update(drifted, ['registered_total', 'present_total'], batch_size=500)
+                # Cached attendance reports and dashboard totals were built from the drifted numbers
+                Event.objects.filter(pk__in=[event.pk for event in drifted]).update(
+                    attendance_version=F('attendance_version') + 1,
+                    attendance_changed_at=timezone.now(),
+                )
+                Event.invalidate_statistics()
+
+        verb = 'Found' if options['dry_run'] else 'Reconciled'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} event(s) with drifted counters'))
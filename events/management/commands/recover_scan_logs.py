@@ -0,0 +1,45 @@
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from events.scan_log_buffer import SPOOL_PATTERN, replay_spool_file
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Replay AttendanceLog rows left in spool files by workers that exited before flushing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Also replay spool files of processes that are still running',
+        )
+
+    def handle(self, *args, **options):
+        spool_dir = Path(settings.SCAN_LOG_SPOOL_DIR)
+        inserted = skipped = files = 0
+        for path in sorted(spool_dir.glob(SPOOL_PATTERN)):
+            pid = int(path.name.split('-')[1])
+            if not options['all'] and _pid_alive(pid):
+                continue
+            file_inserted, file_skipped = replay_spool_file(path)
+            path.unlink()
+            inserted += file_inserted
+            skipped += file_skipped
+            files += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Replayed {files} spool file(s): {inserted} log rows, '
+            f'{skipped} skipped for deleted registrations'
+        ))
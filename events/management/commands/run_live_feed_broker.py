@@ -0,0 +1,62 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+from events.live_feed import broker_address
+
+# A subscriber this far behind is disconnected; its worker reconnects and carries on
+MAX_PENDING_BYTES = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Relay live scan feed messages between worker processes. '
+        'Set LIVE_FEED_BROKER=host:port for every worker to use it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bind',
+            help='host:port to listen on (defaults to LIVE_FEED_BROKER, else 127.0.0.1:8765)',
+        )
+
+    def handle(self, *args, **options):
+        if options['bind']:
+            host, _, port = options['bind'].rpartition(':')
+            address = (host or '127.0.0.1', int(port))
+        else:
+            address = broker_address() or ('127.0.0.1', 8765)
+        try:
+            asyncio.run(self._serve(*address))
+        except OSError as exc:
+            raise CommandError(f'Cannot listen on {address[0]}:{address[1]}: {exc}')
+        except KeyboardInterrupt:
+            pass
+
+    async def _serve(self, host, port):
+        subscribers = set()
+
+        async def handle_connection(reader, writer):
+            role = await reader.readline()
+            try:
+                if role == b'SUB\n':
+                    subscribers.add(writer)
+                    # Subscribers never send; wait until they disconnect
+                    await reader.read()
+                elif role == b'PUB\n':
+                    while line := await reader.readline():
+                        for subscriber in list(subscribers):
+                            if subscriber.transport.get_write_buffer_size() > MAX_PENDING_BYTES:
+                                subscribers.discard(subscriber)
+                                subscriber.close()
+                            else:
+                                subscriber.write(line)
+            except ConnectionError:
+                pass
+            finally:
+                subscribers.discard(writer)
+                writer.close()
+
+        server = await asyncio.start_server(handle_connection, host, port)
+        self.stdout.write(f'Live feed broker listening on {host}:{port}')
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,60 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from events.emails import drain_outbox
+from events.models import OutboundEmail
+
+
+class Command(BaseCommand):
+    help = (
+        'Send queued registration emails in batches. '
+        'Point EMAIL_HOST/EMAIL_PORT at a local SMTP stand-in '
+        '(e.g. "python -m aiosmtpd -n -l localhost:1025") for testing.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help='Emails sent per SMTP connection',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the outbox instead of exiting when it is empty',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to sleep between polls in --loop mode',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Only print the queue depth',
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            depth = OutboundEmail.queue_depth()
+            self.stdout.write(
+                f"pending={depth['pending']} due={depth['due']} "
+                f"sending={depth['sending']} failed={depth['failed']}"
+            )
+            return
+
+        while True:
+            sent, failed = drain_outbox(batch_size=options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f'Sent {sent}, failed {failed}')
+            # Keep draining while full batches are coming back
+            if sent + failed >= options['batch_size']:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Outbox drained'))
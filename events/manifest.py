@@ -0,0 +1,44 @@
+"""
+Offline scanner manifests.
+
+A manifest lists a fingerprint (truncated SHA-256 of the QR payload) and the
+attendance state of every ticket for an event, so gate devices can validate
+scans locally. Passing the previous ``version`` back as ``since`` returns only
+registrations changed after it. Deleted registrations are dropped on the next
+full download.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Registration
+
+FINGERPRINT_LENGTH = 16
+# Re-send rows touched shortly before the cursor, in case their transaction
+# committed after the previous manifest was read
+CURSOR_OVERLAP = timedelta(seconds=5)
+
+
+def ticket_fingerprint(qr_data):
+    """Fingerprint of a scanned payload, as computed by scanner.js"""
+    return hashlib.sha256(qr_data.encode()).hexdigest()[:FINGERPRINT_LENGTH]
+
+
+def build_manifest(event, since=None):
+    """Return the full manifest for an event, or the delta since a previous version"""
+    version = timezone.now()
+    rows = Registration.objects.filter(event=event).order_by()
+    if since is not None:
+        rows = rows.filter(updated_at__gte=since - CURSOR_OVERLAP)
+    
+    tickets = [
+        [ticket_fingerprint(qr_data), str(pk), has_attended]
+        for pk, qr_data, has_attended in rows.values_list('id', 'qr_code_data', 'has_attended').iterator(chunk_size=2000)
+    ]
+    return {
+        'event': str(event.id),
+        'version': version.isoformat(),
+        'full': since is None,
+        'tickets': tickets,
+    }
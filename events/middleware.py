@@ -0,0 +1,166 @@
+"""
+Per-request database instrumentation with query budgets.
+
+``QueryBudgetMiddleware`` wraps every query run while a request is handled
+(``connection.execute_wrapper``, so it works with ``DEBUG = False``) and
+records the query count, total DB time, repeated query shapes and the
+response size under the request's URL name (``event-list``,
+``registration-verify-qr``, ``attendance-pdf``...).
+
+- ``QUERY_STATS_HEADERS``: add ``X-DB-*`` headers to every response.
+- ``QUERY_BUDGETS``: per URL name limits (``queries``, ``db_time_ms``,
+  ``duplicates``, ``response_bytes``); ``'*'`` applies to every other endpoint.
+  A ``'<url name>:<METHOD>'`` entry (``'registration-list:POST'``) takes
+  precedence for that method, so writes and reads of one URL get their own limits.
+- ``QUERY_BUDGET_MODE``: ``'log'`` a warning or ``'fail'`` the request with
+  ``QueryBudgetExceeded`` (for tests and CI).
+
+A query shape is its SQL with the parameters left out and ``IN`` lists
+collapsed, so the same lookup repeated per row (N+1) shows up as one shape
+with a high count. Transaction control (``BEGIN``, ``SAVEPOINT``...) counts
+towards ``queries`` but has no shape. Queries run while a streaming response is being sent are
+not included.
+
+The middleware is sync-only. Under ASGI, Django runs it in a worker thread
+and adapts async views such as ``live_scans`` to it; their ``sync_to_async``
+ORM calls run on that same thread, so they are counted, while the SSE stream
+itself is a streaming response and is not.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r'\((?:%s, )*%s\)')
+# Every atomic block runs these, so they are counted but never reported as repeated
+TRANSACTION_CONTROL = re.compile(r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b', re.IGNORECASE)
+UNNAMED = '<unresolved>'
+
+
+class QueryBudgetExceeded(Exception):
+    """A request went over its QUERY_BUDGETS entry in 'fail' mode"""
+
+
+class _QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            if not TRANSACTION_CONTROL.match(sql):
+                self.shapes[IN_LIST.sub('(...)', sql)] += 1
+
+    def duplicates(self):
+        return {shape: count for shape, count in self.shapes.items() if count > 1}
+
+
+class _EndpointStats:
+    """Running per-URL-name totals for this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {
+            'requests': 0, 'queries': 0, 'max_queries': 0, 'db_time_ms': 0.0, 'over_budget': 0,
+        })
+
+    def add(self, name, queries, db_time_ms, over_budget):
+        with self._lock:
+            stats = self._stats[name]
+            stats['requests'] += 1
+            stats['queries'] += queries
+            stats['max_queries'] = max(stats['max_queries'], queries)
+            stats['db_time_ms'] += db_time_ms
+            stats['over_budget'] += bool(over_budget)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(stats, db_time_ms=round(stats['db_time_ms'], 2)) for name, stats in self._stats.items()}
+
+
+endpoint_stats = _EndpointStats()
+
+
+def _response_size(response):
+    if response.streaming:
+        length = response.get('Content-Length')
+        return int(length) if length else None
+    return len(response.content)
+
+
+def check_budget(budget, measured):
+    """Return the 'name measured > limit' violations of a budget"""
+    return [
+        f'{name} {measured[name]} > {limit}'
+        for name, limit in budget.items()
+        if measured.get(name) is not None and measured[name] > limit
+    ]
+
+
+class QueryBudgetMiddleware:
+    # execute_wrapper() is per thread; see the module docstring for async views
+    sync_capable = True
+    async_capable = False
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.headers = getattr(settings, 'QUERY_STATS_HEADERS', False)
+        self.budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        self.fail = getattr(settings, 'QUERY_BUDGET_MODE', 'log') == 'fail'
+        if not (self.headers or self.budgets):
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        recorder = _QueryRecorder()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        name = match.view_name if match else UNNAMED
+        duplicates = recorder.duplicates()
+        measured = {
+            'queries': recorder.count,
+            'db_time_ms': round(recorder.duration * 1000, 2),
+            'duplicates': max(duplicates.values(), default=0),
+            'response_bytes': _response_size(response),
+        }
+        budget = self.budgets.get(f'{name}:{request.method}') or self.budgets.get(name, self.budgets.get('*'))
+        violations = check_budget(budget, measured) if budget else []
+        endpoint_stats.add(name, measured['queries'], measured['db_time_ms'], violations)
+
+        if violations:
+            repeated = '; '.join(
+                f'{count}x {shape[:120]}' for shape, count in Counter(duplicates).most_common(3)
+            )
+            message = f'{name} over query budget: {", ".join(violations)}'
+            if repeated:
+                message += f' (repeated: {repeated})'
+            if self.fail:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        if self.headers:
+            response['X-URL-Name'] = name
+            response['X-DB-Queries'] = str(measured['queries'])
+            response['X-DB-Time-Ms'] = str(measured['db_time_ms'])
+            response['X-DB-Duplicate-Queries'] = str(sum(duplicates.values()) - len(duplicates))
+            if measured['response_bytes'] is not None:
+                response['X-Response-Bytes'] = str(measured['response_bytes'])
+        return response
+
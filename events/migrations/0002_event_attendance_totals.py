@@ -0,0 +1,37 @@
+# Generated by Django 4.2.23 on 2026-10-17 02:47
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_totals(apps, schema_editor):
+    Event = apps.get_model("events", "Event")
+    events = Event.objects.annotate(
+        num_registered=Count("registrations"),
+        num_present=Count("registrations", filter=Q(registrations__has_attended=True)),
+    )
+    for event in events:
+        event.registered_total = event.num_registered
+        event.present_total = event.num_present
+    Event.objects.bulk_update(events, ["registered_total", "present_total"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="present_total",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="registered_total",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.23 on 2026-10-17 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0002_event_attendance_totals"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="registration",
+            name="qr_token",
+            field=models.CharField(
+                blank=True, editable=False, max_length=22, null=True, unique=True
+            ),
+        ),
+    ]
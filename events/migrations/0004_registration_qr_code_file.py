@@ -0,0 +1,57 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:05
+
+import base64
+import hashlib
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def move_images_to_storage(apps, schema_editor):
+    """Write inline base64 PNGs to content-addressed files under MEDIA_ROOT"""
+    Registration = apps.get_model("events", "Registration")
+    rows = Registration.objects.exclude(qr_code_image="").only("id", "qr_code_image")
+    for registration in rows.iterator(chunk_size=500):
+        encoded = registration.qr_code_image.split(",")[-1]
+        png_bytes = base64.b64decode(encoded)
+        digest = hashlib.sha256(png_bytes).hexdigest()
+        name = f"qr_codes/{digest[:2]}/{digest}.png"
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(png_bytes))
+        Registration.objects.filter(pk=registration.pk).update(qr_code_file=name)
+
+
+def restore_inline_images(apps, schema_editor):
+    """Reverse: embed stored PNGs back into the row as data URIs"""
+    Registration = apps.get_model("events", "Registration")
+    rows = Registration.objects.exclude(qr_code_file="").only("id", "qr_code_file")
+    for registration in rows.iterator(chunk_size=500):
+        try:
+            with default_storage.open(registration.qr_code_file.name, "rb") as f:
+                encoded = base64.b64encode(f.read()).decode()
+        except OSError:
+            continue
+        Registration.objects.filter(pk=registration.pk).update(
+            qr_code_image=f"data:image/png;base64,{encoded}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0003_registration_qr_token"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="registration",
+            name="qr_code_file",
+            field=models.FileField(blank=True, upload_to="qr_codes/"),
+        ),
+        migrations.RunPython(move_images_to_storage, restore_inline_images),
+        migrations.RemoveField(
+            model_name="registration",
+            name="qr_code_image",
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.23 on 2026-10-17 02:55
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0005_outboundemail"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="attendancelog",
+            name="scan_time",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.23 on 2026-10-17 02:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0006_attendancelog_scan_time_default"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="registration",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="registration",
+            index=models.Index(
+                fields=["event", "updated_at"], name="events_regi_event_i_ba0965_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0007_registration_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="attendance_changed_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="attendance_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
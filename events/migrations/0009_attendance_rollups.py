@@ -0,0 +1,78 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0008_event_attendance_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MinuteRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("registrations", models.PositiveIntegerField(default=0)),
+                ("success", models.PositiveIntegerField(default=0)),
+                ("already_used", models.PositiveIntegerField(default=0)),
+                ("invalid", models.PositiveIntegerField(default=0)),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="events.event",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["bucket"],
+                "abstract": False,
+                "unique_together": {("event", "bucket")},
+            },
+        ),
+        migrations.CreateModel(
+            name="HourRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("registrations", models.PositiveIntegerField(default=0)),
+                ("success", models.PositiveIntegerField(default=0)),
+                ("already_used", models.PositiveIntegerField(default=0)),
+                ("invalid", models.PositiveIntegerField(default=0)),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="events.event",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["bucket"],
+                "abstract": False,
+                "unique_together": {("event", "bucket")},
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0009_attendance_rollups"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="attendancelog",
+            index=models.Index(
+                fields=["registration", "scan_time"],
+                name="events_atte_registr_c4b07f_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="attendancelog",
+            index=models.Index(
+                fields=["scan_result", "scan_time"],
+                name="events_atte_scan_re_ae4883_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="attendancelog",
+            index=models.Index(
+                fields=["scan_time", "id"], name="events_atte_scan_ti_80c8ad_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["status", "start_date", "end_date"],
+                name="events_even_status_a4e5aa_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["start_date", "id"], name="events_even_start_d_8ea970_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="registration",
+            index=models.Index(
+                fields=["event", "has_attended"], name="events_regi_event_i_fd4dc1_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="registration",
+            index=models.Index(
+                fields=["event", "registered_at"], name="events_regi_event_i_f82c7e_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="registration",
+            index=models.Index(
+                fields=["registered_at", "id"], name="events_regi_registe_76668c_idx"
+            ),
+        ),
+    ]
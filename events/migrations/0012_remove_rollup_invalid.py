@@ -0,0 +1,21 @@
+# Generated by Django 4.2.23 on 2026-10-17 04:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0011_outboundemail_claim"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="hourrollup",
+            name="invalid",
+        ),
+        migrations.RemoveField(
+            model_name="minuterollup",
+            name="invalid",
+        ),
+    ]
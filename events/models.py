@@ -1,8 +1,25 @@
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 import uuid
 from django.utils import timezone
 
+STATISTICS_CACHE_KEY = 'events:dashboard-statistics'
+
+
+class EventQuerySet(models.QuerySet):
+    """QuerySet helpers for events"""
+
+    def with_counts(self):
+        """Annotate registered/present counts in the same query"""
+        return self.annotate(
+            num_registered=Count('registrations'),
+            num_present=Count('registrations', filter=Q(registrations__has_attended=True)),
+        )
+
 
 class Event(models.Model):
     """Model for managing events"""
@@ -24,9 +41,21 @@ class Event(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='events_created')
+    # Denormalized counters, kept in sync with F() updates (see reconcile_event_counters)
+    registered_total = models.IntegerField(default=0, editable=False)
+    present_total = models.IntegerField(default=0, editable=False)
+    # Bumped with the counters; identifies a cached attendance report (see report_cache)
+    attendance_version = models.PositiveIntegerField(default=0, editable=False)
+    attendance_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    objects = EventQuerySet.as_manager()
     
     class Meta:
         ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['status', 'start_date', 'end_date']),  # Active events
+            models.Index(fields=['start_date', 'id']),  # List ordering / cursor pages
+        ]
     
     def __str__(self):
         return self.name
@@ -40,17 +69,64 @@ class Event(models.Model):
     @property
     def registered_count(self):
         """Count of registered participants"""
+        # Use the value annotated by EventQuerySet.with_counts() when available
+        if getattr(self, 'num_registered', None) is not None:
+            return self.num_registered
         return self.registrations.count()
     
     @property
     def present_count(self):
         """Count of participants who attended"""
+        if getattr(self, 'num_present', None) is not None:
+            return self.num_present
         return self.registrations.filter(has_attended=True).count()
     
     @property
     def absent_count(self):
         """Count of registered but not attended"""
         return self.registered_count - self.present_count
+    
+    @classmethod
+    def adjust_totals(cls, event_id, registered=0, present=0):
+        """Atomically add deltas to the stored attendance counters and bump the attendance version"""
+        changes = {}
+        if registered:
+            changes['registered_total'] = F('registered_total') + registered
+        if present:
+            changes['present_total'] = F('present_total') + present
+        if changes:
+            changes['attendance_version'] = F('attendance_version') + 1
+            changes['attendance_changed_at'] = timezone.now()
+            cls.objects.filter(pk=event_id).update(**changes)
+            cls.invalidate_statistics()
+
+    @classmethod
+    def touch_attendance(cls, event_id):
+        """Bump the attendance version for a change that moves no counter (an edited registration)"""
+        cls.objects.filter(pk=event_id).update(
+            attendance_version=F('attendance_version') + 1,
+            attendance_changed_at=timezone.now(),
+        )
+
+    @classmethod
+    def statistics(cls):
+        """Event and attendance totals in one query, cached for DASHBOARD_STATS_TTL seconds"""
+        stats = cache.get(STATISTICS_CACHE_KEY)
+        if stats is None:
+            now = timezone.now()
+            stats = cls.objects.aggregate(
+                total_events=Count('id'),
+                active_events=Count('id', filter=Q(start_date__lte=now, end_date__gte=now, status='ongoing')),
+                total_registrations=Coalesce(Sum('registered_total'), 0),
+                total_present=Coalesce(Sum('present_total'), 0),
+            )
+            cache.set(STATISTICS_CACHE_KEY, stats, settings.DASHBOARD_STATS_TTL)
+        return stats
+
+    @staticmethod
+    def invalidate_statistics():
+        """Drop the cached dashboard totals once the current transaction commits"""
+        transaction.on_commit(lambda: cache.delete(STATISTICS_CACHE_KEY))
 
 
 class Registration(models.Model):
@@ -60,27 +136,47 @@ class Registration(models.Model):
     name = models.CharField(max_length=200)
     student_id = models.CharField(max_length=50)
     email = models.EmailField()
-    qr_code_data = models.TextField(unique=True)  # Encrypted QR data
-    qr_code_image = models.TextField(blank=True)  # Base64 encoded QR image
+    qr_code_data = models.TextField(unique=True)  # QR payload (signed token, or legacy JSON)
+    qr_token = models.CharField(max_length=22, unique=True, null=True, blank=True, editable=False)  # Indexed token id
+    qr_code_file = models.FileField(upload_to='qr_codes/', blank=True)  # Content-addressed QR PNG (see qr_images)
     is_valid = models.BooleanField(default=True)  # Single-use validation
     has_attended = models.BooleanField(default=False)
     registered_at = models.DateTimeField(auto_now_add=True)
     scanned_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Change cursor for scanner manifests
     
     class Meta:
         ordering = ['-registered_at']
         unique_together = ['event', 'email']
+        indexes = [
+            models.Index(fields=['event', 'updated_at']),
+            models.Index(fields=['event', 'has_attended']),  # Present/absent counts and filters
+            models.Index(fields=['event', 'registered_at']),  # Exports by event and date range
+            models.Index(fields=['registered_at', 'id']),  # List ordering / cursor pages
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.event.name}"
     
     def mark_as_scanned(self):
         """Mark QR code as used (invalid after first scan)"""
-        if self.is_valid:
+        # Single conditional UPDATE: only one concurrent scanner can flip is_valid
+        now = timezone.now()
+        with transaction.atomic():
+            updated = Registration.objects.filter(pk=self.pk, is_valid=True).update(
+                is_valid=False,
+                has_attended=True,
+                scanned_at=now,
+                updated_at=now,
+            )
+            if updated:
+                Event.adjust_totals(self.event_id, present=1)
+        
+        if updated:
             self.is_valid = False
             self.has_attended = True
-            self.scanned_at = timezone.now()
-            self.save()
+            self.scanned_at = now
+            self.updated_at = now
             return True
         return False
 
@@ -89,7 +185,7 @@ class AttendanceLog(models.Model):
     """Model for tracking all scan attempts"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     registration = models.ForeignKey(Registration, on_delete=models.CASCADE, related_name='scan_logs')
-    scan_time = models.DateTimeField(auto_now_add=True)
+    scan_time = models.DateTimeField(default=timezone.now)  # Batched scans keep their original time
     scan_result = models.CharField(max_length=20, choices=[
         ('success', 'Success'),
         ('already_used', 'Already Used'),
@@ -99,6 +195,77 @@ class AttendanceLog(models.Model):
     
     class Meta:
         ordering = ['-scan_time']
+        indexes = [
+            models.Index(fields=['registration', 'scan_time']),  # Scan history of a ticket
+            models.Index(fields=['scan_result', 'scan_time']),  # Log filters and exports by result
+            models.Index(fields=['scan_time', 'id']),  # List ordering / cursor pages, date ranges
+        ]
     
     def __str__(self):
         return f"{self.registration.name} - {self.scan_result} at {self.scan_time}"
+
+
+class AttendanceRollup(models.Model):
+    """Registrations and scan outcomes of one event in one time bucket (see rollups)"""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='+')
+    bucket = models.DateTimeField()  # Start of the minute/hour, in the current time zone
+    registrations = models.PositiveIntegerField(default=0)
+    success = models.PositiveIntegerField(default=0)
+    already_used = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+        ordering = ['bucket']
+        unique_together = ['event', 'bucket']
+    
+    def __str__(self):
+        return f"{self.event_id} @ {self.bucket}"
+
+
+class MinuteRollup(AttendanceRollup):
+    """Per-minute attendance rollup"""
+
+
+class HourRollup(AttendanceRollup):
+    """Per-hour attendance rollup"""
+
+
+class OutboundEmail(models.Model):
+    """Persistent outbox for registration emails, drained by the send_outbox command"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    registration = models.ForeignKey(Registration, on_delete=models.CASCADE, related_name='outbound_emails')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    # Set by the worker that moved the row to 'sending'
+    claim = models.UUIDField(null=True, blank=True, editable=False)
+    claimed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.registration.email} - {self.status}"
+    
+    @classmethod
+    def queue_depth(cls):
+        """Counts of pending, due, sending and failed emails in one query"""
+        return cls.objects.aggregate(
+            pending=Count('id', filter=Q(status='pending')),
+            sending=Count('id', filter=Q(status='sending')),
+            due=Count('id', filter=Q(status='pending', next_attempt_at__lte=timezone.now())),
+            failed=Count('id', filter=Q(status='failed')),
+        )
@@ -0,0 +1,79 @@
+"""
+Content-addressed storage for QR code PNGs.
+
+Images live under ``MEDIA_ROOT/qr_codes/`` keyed by their SHA-256, so the
+Registration table only keeps a short file name. Stored files never change,
+which makes it safe to keep recently used ones in a small in-process cache.
+"""
+import base64
+import hashlib
+import io
+from functools import lru_cache
+
+import qrcode
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+QR_DIRECTORY = 'qr_codes'
+CACHE_SIZE = 256
+
+
+def _qr_code(payload):
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr
+
+
+def qr_matrix(payload):
+    """Dark (True) and light modules of a payload's QR code, quiet zone included"""
+    return _qr_code(payload).get_matrix()
+
+
+def render_qr_png(payload):
+    """Render a QR payload to PNG bytes"""
+    img = _qr_code(payload).make_image(fill_color="black", back_color="white")
+
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def storage_name(png_bytes):
+    """Content-addressed storage name for PNG bytes"""
+    digest = hashlib.sha256(png_bytes).hexdigest()
+    return f'{QR_DIRECTORY}/{digest[:2]}/{digest}.png'
+
+
+def store_png(png_bytes):
+    """Store PNG bytes under their content hash and return the storage name"""
+    name = storage_name(png_bytes)
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, ContentFile(png_bytes))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _read_stored(name):
+    with default_storage.open(name, 'rb') as f:
+        return f.read()
+
+
+def qr_png_for(registration):
+    """Return the QR PNG for a registration, regenerating it if the file is missing"""
+    name = registration.qr_code_file.name
+    if name:
+        try:
+            return _read_stored(name)
+        except OSError:
+            pass
+
+    png_bytes = render_qr_png(registration.qr_code_data)
+    registration.qr_code_file.name = store_png(png_bytes)
+    type(registration).objects.filter(pk=registration.pk).update(qr_code_file=registration.qr_code_file.name)
+    return png_bytes
+
+
+def data_uri(png_bytes):
+    """Encode PNG bytes as a data URI for the frontend"""
+    return f"data:image/png;base64,{base64.b64encode(png_bytes).decode()}"
@@ -0,0 +1,71 @@
+"""
+Compact signed QR tokens.
+
+A token looks like ``EP1.<id>.<sig>``: a random 22 character id (stored in
+``Registration.qr_token``) and a truncated HMAC of that id. Signatures are
+checked before touching the database, so forged or garbled scans are
+rejected on the CPU alone.
+"""
+import base64
+import json
+import secrets
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+TOKEN_PREFIX = 'EP1'
+TOKEN_ID_LENGTH = 22
+SIGNATURE_BYTES = 12
+HMAC_SALT = 'events.qr_tokens'
+
+
+def _sign(token_id):
+    digest = salted_hmac(HMAC_SALT, token_id, algorithm='sha256').digest()
+    return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).decode().rstrip('=')
+
+
+def generate_token():
+    """Return a new (token, token_id) pair"""
+    token_id = secrets.token_urlsafe(16)
+    return f'{TOKEN_PREFIX}.{token_id}.{_sign(token_id)}', token_id
+
+
+def verify_token(token):
+    """Return the token id if the signature is valid, otherwise None"""
+    parts = token.strip().split('.')
+    if len(parts) != 3 or parts[0] != TOKEN_PREFIX:
+        return None
+    token_id, signature = parts[1], parts[2]
+    if len(token_id) != TOKEN_ID_LENGTH:
+        return None
+    if not constant_time_compare(signature, _sign(token_id)):
+        return None
+    return token_id
+
+
+def is_legacy_payload(qr_data):
+    """Legacy QR codes carry a JSON object instead of a token"""
+    return qr_data.lstrip().startswith('{')
+
+
+def lookup_for_payload(qr_data):
+    """
+    Map a scanned payload to a (field, value) pair for the Registration lookup.
+    Returns None when the payload can be rejected without a database query.
+    """
+    if not isinstance(qr_data, str):
+        # Any other JSON value in the request body
+        return None
+    if is_legacy_payload(qr_data):
+        if not getattr(settings, 'QR_ACCEPT_LEGACY_JSON', True):
+            return None
+        try:
+            json.loads(qr_data)
+        except json.JSONDecodeError:
+            return None
+        return 'qr_code_data', qr_data
+
+    token_id = verify_token(qr_data)
+    if token_id is None:
+        return None
+    return 'qr_token', token_id
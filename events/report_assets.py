@@ -0,0 +1,268 @@
+"""
+Shared assets for the PDF reports.
+
+Logos are read and decoded once per worker and handed out as ``ImageReader``s;
+a file is re-read when its size or mtime changes (checked at most every
+``RECHECK_INTERVAL`` seconds). Paragraph and table styles are built once.
+Flowables keep layout state, so the header and footer are created per
+document from these shared pieces.
+"""
+import io
+import os
+import threading
+import time
+
+from django.conf import settings
+from PIL import Image
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Flowable, HRFlowable, Paragraph, Spacer, Table, TableStyle
+
+COLLEGE_LOGO = 'cmrtc.png'
+NAAC_LOGO = 'NAAC.jpg'
+RECHECK_INTERVAL = 2.0
+
+
+class _ImageAsset:
+    """An image under static/images, reloaded when the file changes"""
+
+    def __init__(self, filename):
+        self.path = os.path.join(settings.BASE_DIR, 'static', 'images', filename)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked_at = 0.0
+        self._jpeg = None
+        self._reader = None
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        image = Image.open(io.BytesIO(data))
+        if image.format == 'JPEG':
+            # reportlab embeds JPEGs as-is; a reader per use only parses the header
+            return data, None
+        image.load()
+        reader = ImageReader(image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB'))
+        reader.getRGBData()  # Decode now so concurrent renders only read the cache
+        return None, reader
+
+    def reader(self):
+        """Return an ImageReader for the current file, or None if it is missing or unreadable"""
+        now = time.monotonic()
+        if now - self._checked_at >= RECHECK_INTERVAL:
+            with self._lock:
+                signature = self._stat_signature()
+                if signature != self._signature:
+                    try:
+                        self._jpeg, self._reader = self._load() if signature else (None, None)
+                    except (OSError, ValueError):
+                        self._jpeg, self._reader = None, None
+                    self._signature = signature
+                self._checked_at = now
+        if self._jpeg is not None:
+            return ImageReader(io.BytesIO(self._jpeg))
+        return self._reader
+
+
+_images = {}
+_images_lock = threading.Lock()
+
+
+def image_reader(filename):
+    """Shared ImageReader for a file in static/images, or None"""
+    asset = _images.get(filename)
+    if asset is None:
+        with _images_lock:
+            asset = _images.setdefault(filename, _ImageAsset(filename))
+    return asset.reader()
+
+
+def reset():
+    """Drop all loaded images and styles"""
+    with _images_lock:
+        _images.clear()
+    global _styles
+    _styles = None
+
+
+class ReaderImage(Flowable):
+    """Draw a shared ImageReader at a fixed size"""
+
+    def __init__(self, reader, width, height):
+        super().__init__()
+        self.reader = reader
+        self.drawWidth = width
+        self.drawHeight = height
+
+    def wrap(self, availWidth, availHeight):
+        return self.drawWidth, self.drawHeight
+
+    def draw(self):
+        self.canv.drawImage(self.reader, 0, 0, self.drawWidth, self.drawHeight, mask='auto')
+
+
+def _build_styles():
+    base = getSampleStyleSheet()['Normal']
+    return {
+        'estd': ParagraphStyle(
+            'ESTD', parent=base, fontSize=10, textColor=colors.black,
+            alignment=TA_RIGHT, fontName='Helvetica-Bold'
+        ),
+        'title': ParagraphStyle(
+            'Title', parent=base, fontSize=18, textColor=colors.HexColor('#1a237e'),
+            alignment=TA_CENTER, fontName='Helvetica-Bold', spaceAfter=3, spaceBefore=0, leading=20
+        ),
+        'subtitle': ParagraphStyle(
+            'Subtitle', parent=base, fontSize=11, textColor=colors.HexColor('#d32f2f'),
+            alignment=TA_CENTER, fontName='Helvetica-Bold', spaceAfter=3, leading=13
+        ),
+        'accredited': ParagraphStyle(
+            'Accredited', parent=base, fontSize=9, textColor=colors.HexColor('#006400'),
+            alignment=TA_CENTER, fontName='Helvetica', spaceAfter=2, leading=11
+        ),
+        'approved': ParagraphStyle(
+            'Approved', parent=base, fontSize=8, textColor=colors.HexColor('#006400'),
+            alignment=TA_CENTER, fontName='Helvetica', spaceAfter=8, leading=10
+        ),
+        'dept': ParagraphStyle(
+            'Department', parent=base, fontSize=11, textColor=colors.black,
+            alignment=TA_CENTER, fontName='Helvetica-Bold', spaceAfter=0, spaceBefore=0
+        ),
+        'event': ParagraphStyle(
+            'Event', parent=base, fontSize=10, textColor=colors.black,
+            alignment=TA_LEFT, fontName='Helvetica'
+        ),
+        'heading': ParagraphStyle(
+            'Heading', parent=base, fontSize=13, textColor=colors.black,
+            alignment=TA_CENTER, fontName='Helvetica-Bold', spaceAfter=12, spaceBefore=8
+        ),
+        'footer': ParagraphStyle(
+            'Footer', parent=base, fontSize=10, textColor=colors.black, fontName='Helvetica-Bold'
+        ),
+        'address': ParagraphStyle(
+            'Address', parent=base, fontSize=8, textColor=colors.black,
+            alignment=TA_CENTER, fontName='Helvetica'
+        ),
+        'phone': ParagraphStyle(
+            'Phone', parent=base, fontSize=8, textColor=colors.HexColor('#d32f2f'),
+            alignment=TA_CENTER, fontName='Helvetica'
+        ),
+    }
+
+
+_styles = None
+
+
+def styles():
+    """Paragraph styles used by the attendance report"""
+    global _styles
+    if _styles is None:
+        _styles = _build_styles()
+    return _styles
+
+
+NAAC_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
+    ('ALIGN', (0, 1), (0, 1), 'RIGHT'),
+    ('VALIGN', (0, 0), (0, 0), 'TOP'),
+    ('VALIGN', (0, 1), (0, 1), 'MIDDLE'),
+])
+
+HEADER_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+    ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+    ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
+    ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),
+    ('VALIGN', (1, 0), (1, 0), 'MIDDLE'),
+    ('VALIGN', (2, 0), (2, 0), 'TOP'),
+])
+
+EVENT_DATE_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+    ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+SIGNATURE_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+    ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+
+def attendance_header(event_name, report_date):
+    """Flowables above the attendance table: college header, event line and heading"""
+    style = styles()
+    elements = []
+
+    # Logo | Title | (ESTD + NAAC badge)
+    logo = image_reader(COLLEGE_LOGO)
+    header_left = ReaderImage(logo, 1*inch, 1*inch) if logo else ''
+    header_center = Paragraph("<b>CMR TECHNICAL CAMPUS</b>", style['title'])
+    estd_text = Paragraph("<b>ESTD: 2009</b>", style['estd'])
+    naac = image_reader(NAAC_LOGO)
+    if naac:
+        header_right = Table(
+            [[estd_text], [ReaderImage(naac, 0.7*inch, 0.7*inch)]],
+            colWidths=[1.3*inch], rowHeights=[0.3*inch, 0.7*inch]
+        )
+        header_right.setStyle(NAAC_TABLE_STYLE)
+    else:
+        header_right = estd_text
+
+    header_table = Table(
+        [[header_left, header_center, header_right]],
+        colWidths=[1.2*inch, 5*inch, 1.3*inch]
+    )
+    header_table.setStyle(HEADER_TABLE_STYLE)
+    elements.append(header_table)
+    elements.append(Spacer(1, 3))
+
+    elements.append(Paragraph("<b>UGC AUTONOMOUS</b>", style['subtitle']))
+    elements.append(Paragraph("<b>Accredited by <font color='#d32f2f'>NBA</font> & NAAC with 'A' Grade</b>", style['accredited']))
+    elements.append(Paragraph("Approved by <b>AICTE, New Delhi</b> and <b>JNTU Hyderabad</b>", style['approved']))
+
+    elements.append(HRFlowable(width="100%", thickness=1, color=colors.black, spaceBefore=0, spaceAfter=5))
+    elements.append(Paragraph("<b>Department of CSE [Artificial Intelligence & Machine Learning]</b>", style['dept']))
+    elements.append(HRFlowable(width="100%", thickness=1, color=colors.black, spaceBefore=5, spaceAfter=10))
+
+    event_date_table = Table(
+        [[Paragraph(f"<b>Event Name:</b> {event_name}", style['event']),
+          Paragraph(f"<b>Date:</b> {report_date}", style['event'])]],
+        colWidths=[4.2*inch, 3.3*inch]
+    )
+    event_date_table.setStyle(EVENT_DATE_TABLE_STYLE)
+    elements.append(event_date_table)
+    elements.append(Spacer(1, 12))
+
+    elements.append(Paragraph("ATTENDANCE REPORT", style['heading']))
+    elements.append(Spacer(1, 8))
+    return elements
+
+
+def attendance_closing():
+    """Flowables below the attendance table: signatures and address"""
+    style = styles()
+    signature_table = Table(
+        [[Paragraph("HOD", style['footer']), '', Paragraph("COORDINATOR", style['footer'])]],
+        colWidths=[2*inch, 3.5*inch, 2*inch]
+    )
+    signature_table.setStyle(SIGNATURE_TABLE_STYLE)
+    return [
+        Spacer(1, 30),
+        signature_table,
+        Spacer(1, 30),
+        HRFlowable(width="100%", thickness=1, color=colors.black, spaceBefore=1, spaceAfter=8),
+        Paragraph("Kandlakoya (V), Medchal Road, Hyderabad, Telangana – 501401", style['address']),
+        Paragraph("Ph.No: 9247033440/41: www.cmrtc.ac.in", style['phone']),
+    ]
@@ -0,0 +1,89 @@
+"""
+Cache of rendered PDF reports.
+
+A report is identified by its scope (one event, or all events) and the
+attendance version of the events in it. ``Event.adjust_totals`` bumps the
+version on every registration, deletion and scan, saving an existing
+registration bumps it through ``Event.touch_attendance``, and editing an
+event changes its ``updated_at``. The report header carries the current date, so
+the date is part of the key as well. Rendered PDFs are kept in
+``MEDIA_ROOT/reports/attendance/``, one file per scope. The same key is sent
+as the ``ETag`` so repeat downloads can be answered with ``304``. ID cards
+use the same storage helpers with their own directory and key (see id_cards).
+"""
+import hashlib
+from datetime import datetime, time
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import Event
+
+REPORT_DIRECTORY = 'reports/attendance'
+
+
+def report_validators(event=None):
+    """Return (scope, etag, last_modified) for an event's report, or the all-events report"""
+    today = datetime.now().date()
+    if event is not None:
+        scope = str(event.id)
+        version = f'{event.attendance_version}:{event.updated_at.isoformat()}'
+        changed = [event.attendance_changed_at, event.updated_at]
+    else:
+        scope = 'all'
+        totals = Event.objects.aggregate(
+            version=Sum('attendance_version'),
+            events=Count('id'),
+            changed=Max('attendance_changed_at'),
+            updated=Max('updated_at'),
+        )
+        version = f"{totals['version']}:{totals['events']}:{totals['updated']}"
+        changed = [totals['changed'], totals['updated']]
+
+    digest = hashlib.sha256(f'{scope}:{version}:{today.isoformat()}'.encode()).hexdigest()[:32]
+    # The rendered date changes at midnight even if attendance does not
+    changed.append(timezone.make_aware(datetime.combine(today, time.min)))
+    last_modified = max(value for value in changed if value is not None)
+    return scope, digest, last_modified
+
+
+def set_validators(response, etag, last_modified=None):
+    """Add ETag/Last-Modified and make clients revalidate before reusing the report"""
+    response.headers['ETag'] = quote_etag(etag)
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _report_name(directory, scope, etag):
+    return f'{directory}/{scope}-{etag}.pdf'
+
+
+def open_cached_report(scope, etag, directory=REPORT_DIRECTORY):
+    """Open the stored report for this version, or return None"""
+    try:
+        return default_storage.open(_report_name(directory, scope, etag), 'rb')
+    except OSError:
+        return None
+
+
+def store_report(scope, etag, fileobj, directory=REPORT_DIRECTORY):
+    """Store a rendered report, drop older versions of the same scope and reopen it"""
+    name = _report_name(directory, scope, etag)
+    if not default_storage.exists(name):
+        fileobj.seek(0)
+        name = default_storage.save(name, File(fileobj))
+
+    try:
+        _, files = default_storage.listdir(directory)
+    except OSError:
+        files = []
+    for stale in files:
+        if stale.startswith(f'{scope}-') and f'{directory}/{stale}' != name:
+            default_storage.delete(f'{directory}/{stale}')
+    return default_storage.open(name, 'rb')
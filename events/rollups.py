@@ -0,0 +1,168 @@
+"""
+Per-minute and per-hour attendance rollups.
+
+Registrations and scan outcomes are counted per event in ``MinuteRollup`` and
+``HourRollup`` as they happen: ``record()`` adds to the current bucket with a
+conditional ``UPDATE`` and inserts the bucket the first time it is hit.
+Callers count in the same transaction that writes the registration or scan
+log, so the rollups never drift from the raw rows.
+Buckets start on the minute/hour in the current time zone. ``rebuild()``
+recomputes them from ``Registration.registered_at`` and
+``AttendanceLog.scan_time`` (``manage.py rebuild_rollups``), and
+``event_analytics()`` serves the analytics endpoint from the rollups alone.
+Invalid scans are not counted: an unreadable or unknown QR code has no
+registration, so there is no event to attribute it to.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMinute
+from django.utils import timezone
+
+from .models import AttendanceLog, HourRollup, MinuteRollup, Registration
+
+COUNTERS = ('registrations', 'success', 'already_used')
+GRANULARITIES = {'minute': MinuteRollup, 'hour': HourRollup}
+BULK_BATCH_SIZE = 1000
+
+
+def minute_of(when):
+    return timezone.localtime(when).replace(second=0, microsecond=0)
+
+
+def hour_of(when):
+    return timezone.localtime(when).replace(minute=0, second=0, microsecond=0)
+
+
+def _add(model, event_id, bucket, counts):
+    changes = {name: F(name) + value for name, value in counts.items()}
+    if model.objects.filter(event_id=event_id, bucket=bucket).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(event_id=event_id, bucket=bucket, **counts)
+    except IntegrityError:
+        # Another request created the bucket first
+        model.objects.filter(event_id=event_id, bucket=bucket).update(**changes)
+
+
+def record(event_id, when=None, **counts):
+    """Add counts (registrations=, success=, already_used=) to the event's buckets; invalid= is ignored"""
+    counts = {name: value for name, value in counts.items() if value and name in COUNTERS}
+    if not counts:
+        return
+    when = when or timezone.now()
+    _add(MinuteRollup, event_id, minute_of(when), counts)
+    _add(HourRollup, event_id, hour_of(when), counts)
+
+
+def record_scans(logs, event_ids=None):
+    """
+    Count AttendanceLog rows (saved or about to be) into the rollups, one update per bucket.
+    event_ids maps registration ids to event ids when the rows' registrations are not loaded.
+    """
+    buckets = defaultdict(lambda: defaultdict(int))
+    for log in logs:
+        event_id = event_ids[str(log.registration_id)] if event_ids is not None else log.registration.event_id
+        buckets[(event_id, minute_of(log.scan_time))][log.scan_result] += 1
+    for (event_id, minute), counts in buckets.items():
+        record(event_id, minute, **counts)
+
+
+def record_registration(registration):
+    """Count a new registration into its event's registration buckets"""
+    record(registration.event_id, registration.registered_at, registrations=1)
+
+
+def unrecord_registration(registration, event_id=None):
+    """Take a deleted registration (or one moved away from event_id) out of its registration buckets"""
+    for model, bucket in ((MinuteRollup, minute_of(registration.registered_at)),
+                          (HourRollup, hour_of(registration.registered_at))):
+        model.objects.filter(
+            event_id=event_id or registration.event_id, bucket=bucket, registrations__gt=0
+        ).update(registrations=F('registrations') - 1)
+
+
+def rebuild(event_id=None):
+    """Recompute the rollups (of one event, or all) from the raw tables; returns the minute bucket count"""
+    registrations = Registration.objects.all()
+    logs = AttendanceLog.objects.all()
+    if event_id:
+        registrations = registrations.filter(event_id=event_id)
+        logs = logs.filter(registration__event_id=event_id)
+
+    minutes = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    per_minute = registrations.annotate(minute=TruncMinute('registered_at')).values_list('event_id', 'minute')
+    for event, minute, count in per_minute.annotate(count=Count('id')).order_by().iterator():
+        minutes[(event, minute)]['registrations'] = count
+    per_minute = logs.annotate(minute=TruncMinute('scan_time')).values_list('registration__event_id', 'minute')
+    per_minute = per_minute.annotate(
+        success=Count('id', filter=Q(scan_result='success')),
+        already_used=Count('id', filter=Q(scan_result='already_used')),
+    ).order_by()
+    for event, minute, success, already_used in per_minute.iterator():
+        minutes[(event, minute)].update(success=success, already_used=already_used)
+
+    hours = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for (event, minute), counts in minutes.items():
+        hour = hours[(event, hour_of(minute))]
+        for name in COUNTERS:
+            hour[name] += counts[name]
+
+    with transaction.atomic():
+        for model, buckets in ((MinuteRollup, minutes), (HourRollup, hours)):
+            stale = model.objects.all()
+            if event_id:
+                stale = stale.filter(event_id=event_id)
+            stale.delete()
+            model.objects.bulk_create(
+                [model(event_id=event, bucket=bucket, **counts) for (event, bucket), counts in buckets.items()],
+                batch_size=BULK_BATCH_SIZE,
+            )
+    return len(minutes)
+
+
+def _peak(rollups, field):
+    peak = rollups.annotate(scans=F('success') + F('already_used')).order_by(f'-{field}', 'bucket')
+    peak = peak.values('bucket', 'scans', 'success').first()
+    if not peak or not peak[field]:
+        return None
+    return {'time': peak['bucket'].isoformat(), 'scans': peak['scans'], 'success': peak['success']}
+
+
+def event_analytics(event_id, granularity='hour', start=None, end=None):
+    """Arrival curve, registration trend and peak gate throughput of an event from the rollups"""
+    model = GRANULARITIES[granularity]
+    rollups = model.objects.filter(event_id=event_id)
+    before = {'registrations': 0, 'success': 0}
+    if start:
+        earlier = rollups.filter(bucket__lt=start).aggregate(
+            registrations=Sum('registrations'), success=Sum('success')
+        )
+        before = {name: value or 0 for name, value in earlier.items()}
+        rollups = rollups.filter(bucket__gte=start)
+    if end:
+        rollups = rollups.filter(bucket__lt=end)
+
+    series = []
+    registered, arrived = before['registrations'], before['success']
+    for bucket, *counts in rollups.values_list('bucket', *COUNTERS).iterator():
+        row = dict(zip(COUNTERS, counts))
+        registered += row['registrations']
+        arrived += row['success']
+        series.append({'time': bucket.isoformat(), **row, 'registered': registered, 'arrived': arrived})
+
+    minutes = MinuteRollup.objects.filter(event_id=event_id)
+    hours = HourRollup.objects.filter(event_id=event_id)
+    if start:
+        minutes, hours = minutes.filter(bucket__gte=start), hours.filter(bucket__gte=start)
+    if end:
+        minutes, hours = minutes.filter(bucket__lt=end), hours.filter(bucket__lt=end)
+    return {
+        'event': str(event_id),
+        'granularity': granularity,
+        'series': series,
+        'peak_minute': _peak(minutes, 'scans'),
+        'peak_hour': _peak(hours, 'scans'),
+    }
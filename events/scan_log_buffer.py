@@ -0,0 +1,251 @@
+"""
+Write-behind buffering for AttendanceLog rows.
+
+When ``SCAN_LOG_BUFFER_ENABLED`` is on, scan logs are appended to a per-process
+spool file and kept in memory, then written with one ``bulk_create`` once
+``SCAN_LOG_BUFFER_SIZE`` rows are pending or ``SCAN_LOG_BUFFER_INTERVAL``
+seconds have passed. Spool files are deleted only after their rows are in the
+database; anything left behind by a crashed worker is replayed by the
+``recover_scan_logs`` command. Rows carry their UUID primary key, so replays
+skip rows that are already in the database.
+
+Scans are counted into the attendance rollups in the transaction that
+inserts their rows. Rows whose registration was deleted before the flush are
+dropped. If a batch still fails with a non-transient error, it is split to
+find the failing rows, which are written to a ``dead_letter-<pid>.jsonl``
+file in the spool directory instead of blocking every later flush.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, InterfaceError, OperationalError, connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import rollups
+from .models import AttendanceLog, Registration
+
+logger = logging.getLogger(__name__)
+
+SPOOL_PATTERN = 'scan_logs-*.jsonl'
+QUERY_BATCH_SIZE = 500
+DEAD_LETTER_PATTERN = 'dead_letter-*.jsonl'
+# Worth retrying later (lost connection, locked database) rather than dead-lettering
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+
+def _serialize(log):
+    return json.dumps({
+        'id': str(log.id),
+        'registration_id': str(log.registration_id),
+        'scan_result': log.scan_result,
+        'scan_time': log.scan_time.isoformat() if log.scan_time else None,
+        'ip_address': log.ip_address,
+    })
+
+
+def _batches(values):
+    values = list(values)
+    for start in range(0, len(values), QUERY_BATCH_SIZE):
+        yield values[start:start + QUERY_BATCH_SIZE]
+
+
+def _existing_rows(rows):
+    """
+    Rows whose registration still exists (deleted ones can no longer be referenced),
+    with a map of registration id to event id.
+    """
+    event_ids = {}
+    for batch in _batches({row.registration_id for row in rows}):
+        for pk, event_id in Registration.objects.filter(pk__in=batch).values_list('pk', 'event_id'):
+            event_ids[str(pk)] = event_id
+    return [row for row in rows if str(row.registration_id) in event_ids], event_ids
+
+
+def _insert(rows, event_ids):
+    """Insert rows and count them into the rollups, splitting failed batches; returns the rows that fail on their own"""
+    try:
+        with transaction.atomic():
+            AttendanceLog.objects.bulk_create(rows, batch_size=QUERY_BATCH_SIZE)
+            rollups.record_scans(rows, event_ids)
+        return []
+    except TRANSIENT_ERRORS:
+        raise
+    except DatabaseError:
+        if len(rows) == 1:
+            logger.exception('Scan log %s rejected', rows[0].id)
+            return rows
+        middle = len(rows) // 2
+        return _insert(rows[:middle], event_ids) + _insert(rows[middle:], event_ids)
+
+
+class AttendanceLogBuffer:
+    """Batches AttendanceLog inserts, backed by an append-only spool file"""
+
+    def __init__(self, max_size, interval, spool_dir):
+        self.max_size = max_size
+        self.interval = interval
+        self.spool_dir = Path(spool_dir)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._spool = None
+        self._spool_path = None
+        self._closed_paths = []
+        self._sequence = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _open_spool(self):
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._spool_path = self.spool_dir / f'scan_logs-{os.getpid()}-{self._sequence}.jsonl'
+        self._sequence += 1
+        self._spool = open(self._spool_path, 'a', encoding='utf-8')
+
+    def _start_timer(self):
+        self._thread = threading.Thread(target=self._run, name='scan-log-flush', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.flush()
+            finally:
+                # Background threads do not get Django's request-end cleanup
+                connection.close()
+
+    def add(self, **fields):
+        """Buffer one scan log; returns the unsaved AttendanceLog instance"""
+        log = AttendanceLog(**fields)
+        line = _serialize(log)
+        with self._lock:
+            if self._spool is None:
+                self._open_spool()
+            self._spool.write(line + '\n')
+            self._spool.flush()
+            self._pending.append(log)
+            full = len(self._pending) >= self.max_size
+            if self._thread is None:
+                self._start_timer()
+        if full:
+            self.flush()
+        return log
+
+    def flush(self):
+        """Write all pending rows; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                rows, self._pending = self._pending, []
+                if self._spool is not None:
+                    self._spool.close()
+                    self._closed_paths.append(self._spool_path)
+                    self._spool = None
+                paths, self._closed_paths = self._closed_paths, []
+
+            try:
+                kept, event_ids = _existing_rows(rows)
+                failed = _insert(kept, event_ids)
+            except DatabaseError:
+                logger.exception('Scan log flush failed, %d rows kept for retry', len(rows))
+                with self._lock:
+                    self._pending[:0] = rows
+                    self._closed_paths[:0] = paths
+                return 0
+            if len(kept) < len(rows):
+                logger.warning('Dropped %d scan logs of deleted registrations', len(rows) - len(kept))
+            if failed:
+                self._dead_letter(failed)
+
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            return len(kept) - len(failed)
+
+    def _dead_letter(self, rows):
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spool_dir / f'dead_letter-{os.getpid()}.jsonl'
+        with open(path, 'a', encoding='utf-8') as f:
+            f.writelines(_serialize(row) + '\n' for row in rows)
+        logger.error('Moved %d rejected scan logs to %s', len(rows), path)
+
+    def close(self):
+        """Stop the timer thread and flush what is left"""
+        self._stopped.set()
+        self.flush()
+
+
+_buffer = None
+_buffer_pid = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Per-process buffer (recreated after fork)"""
+    global _buffer, _buffer_pid
+    with _buffer_lock:
+        if _buffer is None or _buffer_pid != os.getpid():
+            _buffer = AttendanceLogBuffer(
+                max_size=settings.SCAN_LOG_BUFFER_SIZE,
+                interval=settings.SCAN_LOG_BUFFER_INTERVAL,
+                spool_dir=settings.SCAN_LOG_SPOOL_DIR,
+            )
+            _buffer_pid = os.getpid()
+            atexit.register(_buffer.close)
+        return _buffer
+
+
+def record_scan(registration, scan_result, ip_address=None):
+    """Record a scan attempt, buffered when SCAN_LOG_BUFFER_ENABLED is set"""
+    if getattr(settings, 'SCAN_LOG_BUFFER_ENABLED', False):
+        # Counted into the rollups when the buffer is flushed
+        return get_buffer().add(
+            registration=registration,
+            scan_result=scan_result,
+            ip_address=ip_address,
+        )
+    with transaction.atomic():
+        log = AttendanceLog.objects.create(
+            registration=registration,
+            scan_result=scan_result,
+            ip_address=ip_address,
+        )
+        rollups.record(registration.event_id, log.scan_time, **{scan_result: 1})
+    return log
+
+
+def replay_spool_file(path):
+    """Insert the rows of one spool file; returns (inserted, skipped)"""
+    rows = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn final line from a crash mid-write
+                continue
+            rows.append(AttendanceLog(
+                id=data['id'],
+                registration_id=data['registration_id'],
+                scan_result=data['scan_result'],
+                scan_time=parse_datetime(data['scan_time']),
+                ip_address=data['ip_address'],
+            ))
+
+    kept, event_ids = _existing_rows(rows)
+    # Rows flushed before the crash are already in the database and the rollups
+    inserted = set()
+    for batch in _batches(row.id for row in kept):
+        inserted.update(str(pk) for pk in AttendanceLog.objects.filter(pk__in=batch).values_list('pk', flat=True))
+    new = [row for row in kept if str(row.id) not in inserted]
+    with transaction.atomic():
+        AttendanceLog.objects.bulk_create(new, batch_size=QUERY_BATCH_SIZE)
+        rollups.record_scans(new, event_ids)
+    return len(new), len(rows) - len(kept)
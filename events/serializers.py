@@ -1,8 +1,53 @@
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework import serializers
 from .models import Event, Registration, AttendanceLog
 
 
-class EventSerializer(serializers.ModelSerializer):
+def requested_fields(request):
+    """Field names from a ?fields=a,b query parameter (None when absent)"""
+    if request is None or request.method != 'GET':
+        return None
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class SparseFieldsetMixin:
+    """
+    Limits output to ``?fields=a,b`` and reports which model columns the
+    remaining fields read, so views can load them with ``.only()``.
+    ``Meta.sparse_columns`` maps computed fields to the columns they need.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            fields = requested_fields(self.context.get('request'))
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+    
+    def model_columns(self):
+        """Columns (in .only() syntax) needed to render the selected fields"""
+        model = self.Meta.model
+        sparse_columns = getattr(self.Meta, 'sparse_columns', {})
+        columns = {'pk'}
+        for name, field in self.fields.items():
+            if name in sparse_columns:
+                columns.update(sparse_columns[name])
+                continue
+            if field.source == '*':
+                continue
+            try:
+                model._meta.get_field(field.source.split('.')[0])
+            except FieldDoesNotExist:
+                continue
+            columns.add(field.source.replace('.', '__'))
+        return columns
+
+
+class EventSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     registered_count = serializers.IntegerField(read_only=True)
     present_count = serializers.IntegerField(read_only=True)
     absent_count = serializers.IntegerField(read_only=True)
@@ -16,18 +61,33 @@ class EventSerializer(serializers.ModelSerializer):
             'registered_count', 'present_count', 'absent_count', 'is_active'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        # Counts come from EventQuerySet.with_counts() annotations
+        sparse_columns = {
+            'registered_count': [],
+            'present_count': [],
+            'absent_count': [],
+            'is_active': ['start_date', 'end_date', 'status'],
+        }
 
 
-class RegistrationSerializer(serializers.ModelSerializer):
+class RegistrationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     event_name = serializers.CharField(source='event.name', read_only=True)
+    qr_code_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Registration
         fields = [
             'id', 'event', 'event_name', 'name', 'student_id', 'email',
-            'is_valid', 'has_attended', 'registered_at', 'scanned_at'
+            'is_valid', 'has_attended', 'registered_at', 'scanned_at', 'qr_code_url'
         ]
         read_only_fields = ['id', 'is_valid', 'has_attended', 'registered_at', 'scanned_at']
+        sparse_columns = {
+            'qr_code_url': ['qr_code_file'],
+        }
+
+
+    def get_qr_code_url(self, obj):
+        return obj.qr_code_file.url if obj.qr_code_file else None
 
 
 class RegistrationCreateSerializer(serializers.ModelSerializer):
@@ -37,6 +97,13 @@ class RegistrationCreateSerializer(serializers.ModelSerializer):
         fields = ['event', 'name', 'student_id', 'email']
 
 
+class RegistrationImportRowSerializer(serializers.Serializer):
+    """Validates one row of a bulk import (no per-row database checks)"""
+    name = serializers.CharField(max_length=200)
+    student_id = serializers.CharField(max_length=50)
+    email = serializers.EmailField()
+
+
 class AttendanceLogSerializer(serializers.ModelSerializer):
     registration_name = serializers.CharField(source='registration.name', read_only=True)
     registration_email = serializers.CharField(source='registration.email', read_only=True)
@@ -0,0 +1,74 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .id_cards import delete_cached_card
+from .models import Event, Registration
+from .rollups import record_registration, unrecord_registration
+
+COUNTED_FIELDS = {'event', 'event_id', 'has_attended'}
+
+
+@receiver(pre_save, sender=Registration)
+def remember_counted_state(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Read the event and attendance the stored row is counted under before an edit overwrites them"""
+    instance._counted_as = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not COUNTED_FIELDS & set(update_fields):
+        return
+    instance._counted_as = Registration.objects.filter(pk=instance.pk).values_list('event_id', 'has_attended').first()
+
+
+@receiver(post_save, sender=Registration)
+def count_event_totals(sender, instance, created, raw=False, **kwargs):
+    """Count new registrations (from the API, admin or shell) and move edited ones between events"""
+    # Fixtures carry their events' totals; run reconcile_event_counters after loading partial data
+    if raw:
+        return
+    present = 1 if instance.has_attended else 0
+    if created:
+        Event.adjust_totals(instance.event_id, registered=1, present=present)
+        record_registration(instance)
+        return
+    counted_as = getattr(instance, '_counted_as', None)
+    if counted_as is None:
+        # Edited names, emails and student IDs still appear in the cached attendance reports
+        Event.touch_attendance(instance.event_id)
+        return
+    event_id, has_attended = counted_as
+    was_present = 1 if has_attended else 0
+    if str(event_id) != str(instance.event_id):
+        Event.adjust_totals(event_id, registered=-1, present=-was_present)
+        Event.adjust_totals(instance.event_id, registered=1, present=present)
+        unrecord_registration(instance, event_id=event_id)
+        record_registration(instance)
+    elif present != was_present:
+        Event.adjust_totals(instance.event_id, present=present - was_present)
+    else:
+        Event.touch_attendance(instance.event_id)
+
+
+@receiver(post_delete, sender=Registration)
+def decrement_event_totals(sender, instance, origin=None, **kwargs):
+    """Keep Event counters and rollups in sync when registrations are deleted"""
+    # Nothing to update when the event itself is being deleted
+    if isinstance(origin, Event) or getattr(origin, 'model', None) is Event:
+        return
+    Event.adjust_totals(
+        instance.event_id,
+        registered=-1,
+        present=-1 if instance.has_attended else 0,
+    )
+    unrecord_registration(instance)
+
+
+@receiver(post_delete, sender=Registration)
+def remove_cached_id_card(sender, instance, **kwargs):
+    """Drop the rendered ID card of a deleted registration"""
+    delete_cached_card(instance.pk)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event_statistics(sender, **kwargs):
+    """Event counts and active status feed the dashboard totals"""
+    Event.invalidate_statistics()
@@ -1,3 +1,1604 @@
-from django.test import TestCase
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from smtplib import SMTPException
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from docx import Document
+from eventpass_backend.sqlite_backend.base import DatabaseWrapper, lock_stats
+from PIL import Image
+
+from . import id_cards, live_feed, report_assets, rollups
+from .attendance_pdf import LazyFlowables, attendance_rows, attendance_tables, build_attendance_pdf
+from .bulk_import import import_registrations, parse_rows
+from .checkin import verify_batch
+from .docx_report import build_attendance_docx
+from .emails import drain_outbox, enqueue_registration_email
+from .exports import XLSX_AVAILABLE, log_export, registration_export
+from .manifest import CURSOR_OVERLAP, FINGERPRINT_LENGTH, build_manifest, ticket_fingerprint
+from .middleware import QueryBudgetExceeded
+from .models import AttendanceLog, Event, HourRollup, MinuteRollup, OutboundEmail, Registration
+from .qr_images import qr_png_for, render_qr_png, store_png
+from .qr_tokens import generate_token, lookup_for_payload, verify_token
+from .scan_log_buffer import AttendanceLogBuffer, replay_spool_file
+
+FULL_SCAN = re.compile(r'^SCAN (\S+)$')
+SORTED_IN_MEMORY = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def make_event(name='Event', **fields):
+    now = timezone.now()
+    fields.setdefault('start_date', now)
+    fields.setdefault('end_date', now + timedelta(days=1))
+    return Event.objects.create(name=name, description='d', venue='v', **fields)
+
+
+def make_registration(event, number=1, **fields):
+    """Registration with a signed QR token (counted in the event totals on save)"""
+    if 'qr_code_data' not in fields:
+        fields['qr_code_data'], fields['qr_token'] = generate_token()
+    return Registration.objects.create(
+        event=event, name=f'Student {number}', student_id=f'S{number}', email=f'{number}@example.com', **fields
+    )
+
+
+def rollup_rows(event):
+    return {
+        model.__name__: sorted(model.objects.filter(event=event).values_list(
+            'bucket', 'registrations', 'success', 'already_used'
+        ))
+        for model in rollups.GRANULARITIES.values()
+    }
+
+
+class TempMediaMixin:
+    """Write QR images, cached reports and ID cards to a throwaway MEDIA_ROOT"""
+
+    @classmethod
+    def setUpClass(cls):
+        media = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(media.cleanup)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media.name))
+        super().setUpClass()
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite')
+class QueryPlanTests(TestCase):
+    """EXPLAIN QUERY PLAN on the hot queries: none may fall back to a full table scan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            name='Plan', description='d', venue='v',
+            start_date=now, end_date=now + timedelta(days=1),
+        )
+        cls.registration = Registration.objects.create(
+            event=cls.event, name='A', student_id='S1', email='a@example.com', qr_code_data='plan'
+        )
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndexes(self, queryset, ordered=False):
+        plan = self.query_plan(queryset)
+        scans = [detail for detail in plan if FULL_SCAN.match(detail)]
+        self.assertFalse(scans, f'Full table scan in {plan}')
+        if ordered:
+            self.assertNotIn(SORTED_IN_MEMORY, plan)
+
+    def test_active_events(self):
+        now = timezone.now()
+        self.assertUsesIndexes(Event.objects.filter(status='ongoing', start_date__lte=now, end_date__gte=now))
+
+    def test_event_list_page(self):
+        self.assertUsesIndexes(Event.objects.order_by('-start_date', '-id')[:20], ordered=True)
+
+    def test_registration_list_page(self):
+        self.assertUsesIndexes(Registration.objects.order_by('-registered_at', '-id')[:20], ordered=True)
+
+    def test_present_count(self):
+        self.assertUsesIndexes(Registration.objects.filter(event=self.event, has_attended=True))
+
+    def test_registration_export_by_event_and_date(self):
+        queryset, _ = registration_export({'event': str(self.event.id), 'from': '2025-01-01'})
+        self.assertUsesIndexes(queryset)
+
+    def test_registration_export_by_date(self):
+        queryset, _ = registration_export({'from': '2025-01-01', 'to': '2025-01-31'})
+        self.assertUsesIndexes(queryset, ordered=True)
+
+    def test_manifest_delta(self):
+        self.assertUsesIndexes(Registration.objects.filter(event=self.event, updated_at__gte=timezone.now()))
+
+    def test_qr_token_lookup(self):
+        self.assertUsesIndexes(Registration.objects.filter(qr_token='x'))
+
+    def test_log_list_page(self):
+        self.assertUsesIndexes(AttendanceLog.objects.order_by('-scan_time', '-id')[:20], ordered=True)
+
+    def test_ticket_scan_history(self):
+        self.assertUsesIndexes(
+            AttendanceLog.objects.filter(registration=self.registration).order_by('-scan_time'), ordered=True
+        )
+
+    def test_log_export_by_result(self):
+        queryset, _ = log_export({'scan_result': 'invalid'})
+        self.assertUsesIndexes(queryset)
+
+    def test_log_export_by_date(self):
+        queryset, _ = log_export({'from': '2025-01-01', 'to': '2025-01-31'})
+        self.assertUsesIndexes(queryset, ordered=True)
+
+    def test_log_export_by_event(self):
+        queryset, _ = log_export({'event': str(self.event.id)})
+        self.assertUsesIndexes(queryset)
+
+    def test_rollup_range(self):
+        self.assertUsesIndexes(MinuteRollup.objects.filter(event=self.event, bucket__gte=timezone.now()))
+
+
+@override_settings(QUERY_BUDGET_MODE='fail')
+class QueryBudgetTests(TempMediaMixin, TestCase):
+    """Hot endpoints stay within QUERY_BUDGETS with many rows (catches N+1 regressions)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.user = User.objects.create_user('staff', password='x', is_staff=True)
+        events = Event.objects.bulk_create([
+            Event(name=f'Event {i}', description='d', venue='v', status='ongoing',
+                  start_date=now, end_date=now + timedelta(days=1))
+            for i in range(15)
+        ])
+        registrations = Registration.objects.bulk_create([
+            Registration(event=event, name=f'N{i}', student_id=str(i), email=f'{i}@example.com',
+                         qr_code_data=f'{event.id}-{i}')
+            for event in events for i in range(3)
+        ])
+        AttendanceLog.objects.bulk_create([
+            AttendanceLog(registration=registration, scan_result='success') for registration in registrations
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_endpoints_within_budget(self):
+        for url in ['/api/events/', '/api/events/active_events/', '/api/registrations/', '/api/logs/',
+                    '/api/dashboard/statistics/', '/admin-panel/', '/admin-panel/events/',
+                    '/admin-panel/registrations/', '/admin-panel/logs/']:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def register(self):
+        return self.client.post('/api/registrations/', {
+            'event': str(Event.objects.first().id), 'name': 'New', 'student_id': 'new', 'email': 'new@example.com',
+        }, content_type='application/json')
+
+    def test_writes_within_budget(self):
+        # The first write of a minute also creates its rollup rows
+        self.assertEqual(self.register().status_code, 201)
+        registration = make_registration(Event.objects.first(), 99)
+        url = '/api/registrations/verify_qr/'
+        for expected in [200, 400]:
+            response = self.client.post(url, {'qr_data': registration.qr_code_data}, content_type='application/json')
+            self.assertEqual(response.status_code, expected)
+
+    @override_settings(QUERY_BUDGETS={'event-list': {'queries': 1}})
+    def test_over_budget_fails(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/api/events/')
+
+    @override_settings(QUERY_BUDGETS={'registration-list': {'queries': 100}, 'registration-list:POST': {'queries': 1}})
+    def test_method_budget(self):
+        self.assertEqual(self.client.get('/api/registrations/').status_code, 200)
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'registration-list over query budget'):
+            self.register()
+
+    @override_settings(QUERY_STATS_HEADERS=True)
+    def test_stats_headers(self):
+        response = self.client.get('/api/events/')
+        self.assertEqual(response['X-URL-Name'], 'event-list')
+        self.assertEqual(response['X-DB-Duplicate-Queries'], '0')
+        self.assertEqual(int(response['X-Response-Bytes']), len(response.content))
+
+
+@override_settings(QUERY_BUDGET_MODE='fail', QUERY_STATS_HEADERS=True)
+class TransactionQueryBudgetTests(TempMediaMixin, TransactionTestCase):
+    """Writes that run several transactions stay within budget (TestCase hides BEGIN/COMMIT)"""
+
+    def setUp(self):
+        self.event = make_event()
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+
+    def test_verify_qr(self):
+        registration = make_registration(self.event)
+        url = '/api/registrations/verify_qr/'
+        for expected in [200, 400]:
+            response = self.client.post(url, {'qr_data': registration.qr_code_data}, content_type='application/json')
+            self.assertEqual(response.status_code, expected)
+            self.assertEqual(response['X-DB-Duplicate-Queries'], '0')
+
+    def test_create(self):
+        for number in range(2):
+            response = self.client.post('/api/registrations/', {
+                'event': str(self.event.id), 'name': 'N', 'student_id': str(number), 'email': f'{number}@example.com',
+            }, content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+
+
+class QrTokenTests(TestCase):
+    """Signed QR tokens and the legacy JSON payload fallback"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('gate', password='x')
+
+    def test_sign_and_verify(self):
+        token, token_id = generate_token()
+        self.assertEqual(verify_token(token), token_id)
+        self.assertEqual(lookup_for_payload(f'  {token}\n'), ('qr_token', token_id))
+
+    def test_forged_and_truncated_tokens(self):
+        token, token_id = generate_token()
+        prefix, _, signature = token.split('.')
+        forged_id = ('A' if token_id[0] != 'A' else 'B') + token_id[1:]
+        for payload in [
+            f'{prefix}.{forged_id}.{signature}',
+            f'{prefix}.{token_id}.{signature[:-1]}',
+            f'{prefix}.{token_id[:-1]}.{signature}',
+            f'EP2.{token_id}.{signature}',
+            token[:-5],
+            '',
+        ]:
+            with self.subTest(payload=payload):
+                self.assertIsNone(verify_token(payload))
+                self.assertIsNone(lookup_for_payload(payload))
+
+    def test_legacy_payload(self):
+        payload = '{"registration_id": "1", "event_id": "2"}'
+        self.assertEqual(lookup_for_payload(payload), ('qr_code_data', payload))
+        self.assertIsNone(lookup_for_payload('{"registration_id": '))
+        with override_settings(QR_ACCEPT_LEGACY_JSON=False):
+            self.assertIsNone(lookup_for_payload(payload))
+
+    def test_non_string_payloads(self):
+        for payload in [123, {}, {'a': 1}, [], None, True]:
+            with self.subTest(payload=payload):
+                self.assertIsNone(lookup_for_payload(payload))
+
+    def test_verify_qr_payloads(self):
+        registration = make_registration(make_event())
+        legacy = make_registration(registration.event, 2, qr_code_data='{"registration_id": "legacy"}')
+        self.client.force_login(self.user)
+        url = '/api/registrations/verify_qr/'
+        for qr_data, expected in [
+            (registration.qr_code_data, 200),
+            (legacy.qr_code_data, 200),
+            (generate_token()[0], 404),
+            (registration.qr_code_data[:-2], 400),
+            (123, 400),
+            ({'a': 1}, 400),
+        ]:
+            with self.subTest(qr_data=qr_data):
+                response = self.client.post(url, {'qr_data': qr_data}, content_type='application/json')
+                self.assertEqual(response.status_code, expected)
+                self.assertEqual(response.json()['valid'], expected == 200)
+
+
+class _RejectingBackend(locmem.EmailBackend):
+    def send_messages(self, messages):
+        raise SMTPException('550 mailbox unavailable')
+
+
+class _UnreachableBackend(locmem.EmailBackend):
+    def open(self):
+        raise OSError('Connection refused')
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_OUTBOX_MAX_ATTEMPTS=3,
+    EMAIL_OUTBOX_BACKOFF_SECONDS=60,
+)
+class EmailOutboxTests(TempMediaMixin, TestCase):
+    """drain_outbox against the locmem backend standing in for SMTP"""
+
+    def setUp(self):
+        event = make_event()
+        self.items = [enqueue_registration_email(make_registration(event, i)) for i in range(3)]
+
+    def make_due(self):
+        OutboundEmail.objects.filter(status='pending').update(next_attempt_at=timezone.now())
+
+    def test_sends_each_email_once(self):
+        self.assertEqual(drain_outbox(), (3, 0))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['0@example.com', '1@example.com', '2@example.com'])
+        self.assertEqual(drain_outbox(), (0, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutboundEmail.objects.exclude(status='sent').exists())
+        self.assertFalse(OutboundEmail.objects.filter(claim__isnull=False).exists())
+
+    def test_overlapping_workers_do_not_resend(self):
+        nested = []
+
+        class OverlappingBackend(locmem.EmailBackend):
+            def send_messages(self, messages):
+                # A second worker starts while the first one is mid-batch
+                nested.append(drain_outbox())
+                return super().send_messages(messages)
+
+        self.assertEqual(drain_outbox(connection=OverlappingBackend()), (3, 0))
+        self.assertEqual(nested, [(0, 0)] * 3)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_failures_back_off_exponentially(self):
+        start = timezone.now()
+        self.assertEqual(drain_outbox(connection=_RejectingBackend()), (0, 3))
+        item = OutboundEmail.objects.get(pk=self.items[0].pk)
+        self.assertEqual((item.status, item.attempts), ('pending', 1))
+        self.assertIn('550', item.last_error)
+        self.assertGreaterEqual(item.next_attempt_at, start + timedelta(seconds=60))
+        # Not due yet
+        self.assertEqual(drain_outbox(), (0, 0))
+
+        self.make_due()
+        start = timezone.now()
+        self.assertEqual(drain_outbox(connection=_UnreachableBackend()), (0, 3))
+        item.refresh_from_db()
+        self.assertEqual(item.attempts, 2)
+        self.assertGreaterEqual(item.next_attempt_at, start + timedelta(seconds=120))
+
+        self.make_due()
+        self.assertEqual(drain_outbox(), (3, 0))
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.attempts, item.last_error), ('sent', 3, ''))
+
+    def test_permanent_failure(self):
+        for _ in range(3):
+            self.make_due()
+            drain_outbox(connection=_RejectingBackend())
+        self.assertEqual(OutboundEmail.objects.filter(status='failed', attempts=3).count(), 3)
+        self.make_due()
+        self.assertEqual(drain_outbox(), (0, 0))
+        self.assertEqual(OutboundEmail.queue_depth(), {'pending': 0, 'sending': 0, 'due': 0, 'failed': 3})
+
+    @override_settings(EMAIL_OUTBOX_CLAIM_TIMEOUT=600)
+    def test_stale_claims_are_released(self):
+        now = timezone.now()
+        OutboundEmail.objects.filter(pk=self.items[0].pk).update(status='sending', claimed_at=now - timedelta(hours=1))
+        OutboundEmail.objects.filter(pk=self.items[1].pk).update(status='sending', claimed_at=now)
+        self.assertEqual(drain_outbox(), (2, 0))
+        self.assertEqual(OutboundEmail.objects.get(pk=self.items[1].pk).status, 'sending')
+
+
+@override_settings(BULK_IMPORT_WORKERS=1)
+class BulkImportTests(TempMediaMixin, TestCase):
+    """import_registrations reports every row and inserts in chunks"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='x', is_staff=True)
+
+    def setUp(self):
+        self.event = make_event()
+
+    def test_per_row_report(self):
+        make_registration(self.event, 1)
+        rows = [
+            {'name': 'A', 'student_id': 'A1', 'email': 'a@example.com'},
+            {'name': 'B', 'student_id': 'B1', 'email': 'not-an-email'},
+            {'name': 'Dup', 'student_id': 'S1', 'email': '1@example.com'},
+            {'name': 'A again', 'student_id': 'A2', 'email': 'a@example.com'},
+            {'name': 'C', 'student_id': 'C1', 'email': 'c@example.com'},
+        ]
+        report = import_registrations(self.event, rows, send_emails=False)
+        self.assertEqual(
+            (report['total'], report['created'], report['duplicate'], report['invalid']), (5, 2, 2, 1)
+        )
+        self.assertEqual([row['status'] for row in report['rows']],
+                         ['created', 'invalid', 'duplicate', 'duplicate', 'created'])
+        self.assertIn('email', report['rows'][1]['errors'])
+        created = Registration.objects.get(pk=report['rows'][0]['id'])
+        self.assertEqual(created.name, 'A')
+        self.assertEqual(lookup_for_payload(created.qr_code_data), ('qr_token', created.qr_token))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registered_total, 3)
+
+    def test_chunked_insert(self):
+        rows = [{'name': f'N{i}', 'student_id': str(i), 'email': f'n{i}@example.com'} for i in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            report = import_registrations(self.event, rows, chunk_size=2)
+        inserts = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "events_registration"')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(report['created'], 5)
+        self.assertEqual(Registration.objects.filter(event=self.event).count(), 5)
+        self.assertEqual(OutboundEmail.objects.filter(registration__event=self.event).count(), 5)
+
+    def test_parse_csv(self):
+        rows = parse_rows('\ufeffname,student_id,email\nA,A1,a@example.com\n'.encode())
+        self.assertEqual(rows, [{'name': 'A', 'student_id': 'A1', 'email': 'a@example.com'}])
+        with self.assertRaises(ValueError):
+            parse_rows('{"name": "A"}', 'json')
+
+    def test_endpoint(self):
+        self.client.force_login(self.user)
+        url = '/api/registrations/bulk-import/'
+        upload = SimpleUploadedFile('students.csv', b'name,student_id,email\nA,A1,a@example.com\n')
+        response = self.client.post(url, {'event': str(self.event.id), 'file': upload, 'send_emails': 'false'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+
+        for event, expected in [('not-a-uuid', 400), (None, 400), (str(uuid.uuid4()), 404)]:
+            with self.subTest(event=event):
+                data = {'rows': []} if event is None else {'event': event, 'rows': []}
+                response = self.client.post(url, data, content_type='application/json')
+                self.assertEqual(response.status_code, expected)
+
+
+class VerifyBatchTests(TestCase):
+    """verify_qr_batch: per-item results, first scan wins, bad items never fail the batch"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('gate', password='x')
+        cls.event = make_event()
+        cls.first = make_registration(cls.event, 1)
+        cls.second = make_registration(cls.event, 2)
+
+    def test_earliest_scan_wins(self):
+        now = timezone.now()
+        early, late = now - timedelta(minutes=10), now - timedelta(minutes=5)
+        results = verify_batch([
+            {'id': 'late', 'qr_data': self.first.qr_code_data, 'scanned_at': late.isoformat()},
+            {'id': 'early', 'qr_data': self.first.qr_code_data, 'scanned_at': early.isoformat()},
+            {'id': 'other', 'qr_data': self.second.qr_code_data},
+        ])
+        self.assertEqual([(r['id'], r['scan_result']) for r in results],
+                         [('late', 'already_used'), ('early', 'success'), ('other', 'success')])
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.scanned_at, early)
+        self.assertFalse(self.first.is_valid)
+        self.assertEqual(
+            list(AttendanceLog.objects.filter(registration=self.first).order_by('scan_time')
+                 .values_list('scan_result', flat=True)),
+            ['success', 'already_used'],
+        )
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.present_total, 2)
+
+    def test_invalid_items(self):
+        future = timezone.now() + timedelta(days=1)
+        scans = [
+            {'id': 1, 'qr_data': self.first.qr_code_data, 'scanned_at': '2026-13-45T00:00:00'},
+            {'id': 2, 'qr_data': self.first.qr_code_data, 'scanned_at': 'yesterday'},
+            {'id': 3, 'qr_data': self.first.qr_code_data, 'scanned_at': 12345},
+            {'id': 4, 'qr_data': 123},
+            {'id': 5, 'qr_data': generate_token()[0]},
+            'not a scan',
+            {'id': 7, 'qr_data': self.second.qr_code_data, 'scanned_at': future.isoformat()},
+        ]
+        self.client.force_login(self.user)
+        response = self.client.post(
+            '/api/registrations/verify_qr_batch/', {'scans': scans}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['processed'], data['success'], data['invalid']), (7, 1, 6))
+        self.assertEqual([r['message'] for r in data['results'][:3]], ['Invalid scan time'] * 3)
+        self.assertTrue(Registration.objects.get(pk=self.first.pk).is_valid)
+        # Future timestamps are clamped to the server's clock
+        self.assertLessEqual(Registration.objects.get(pk=self.second.pk).scanned_at, timezone.now())
+
+
+class ScanManifestTests(TestCase):
+    """Offline scanner manifests: full download, deltas with an overlap window, fingerprints"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('gate', password='x')
+        cls.event = make_event()
+        cls.registrations = [make_registration(cls.event, i) for i in range(3)]
+        make_registration(make_event('Other'), 9)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = f'/api/events/{self.event.id}/scan_manifest/'
+
+    def tickets(self, manifest):
+        return {registration_id: (fingerprint, attended) for fingerprint, registration_id, attended in manifest['tickets']}
+
+    def test_full(self):
+        self.registrations[0].mark_as_scanned()
+        manifest = self.client.get(self.url).json()
+        self.assertTrue(manifest['full'])
+        self.assertEqual(manifest['event'], str(self.event.id))
+        self.assertEqual(self.tickets(manifest), {
+            str(r.id): (ticket_fingerprint(r.qr_code_data), r is self.registrations[0]) for r in self.registrations
+        })
+
+    def test_delta(self):
+        Registration.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        version = self.client.get(self.url).json()['version']
+        self.registrations[1].mark_as_scanned()
+        manifest = self.client.get(self.url, {'since': version}).json()
+        self.assertFalse(manifest['full'])
+        self.assertEqual(self.tickets(manifest), {
+            str(self.registrations[1].id): (ticket_fingerprint(self.registrations[1].qr_code_data), True),
+        })
+
+    def test_overlap_window(self):
+        since = timezone.now()
+        Registration.objects.filter(pk=self.registrations[0].pk).update(updated_at=since - CURSOR_OVERLAP / 2)
+        Registration.objects.exclude(pk=self.registrations[0].pk).update(updated_at=since - CURSOR_OVERLAP * 2)
+        # Committed after the previous manifest was read, but stamped just before its version
+        self.assertEqual(list(self.tickets(build_manifest(self.event, since))), [str(self.registrations[0].id)])
+
+    def test_invalid_since(self):
+        self.assertEqual(self.client.get(self.url, {'since': 'yesterday'}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_fingerprint_matches_scanner(self):
+        payload = self.registrations[0].qr_code_data
+        self.assertEqual(ticket_fingerprint(payload), hashlib.sha256(payload.encode()).hexdigest()[:FINGERPRINT_LENGTH])
+        # scanner.js hex-encodes the first bytes of the SHA-256 digest
+        script = (Path(__file__).resolve().parent.parent / 'static' / 'js' / 'scanner.js').read_text()
+        digest_bytes = int(re.search(r'new Uint8Array\(digest\)\.slice\(0, (\d+)\)', script).group(1))
+        self.assertEqual(digest_bytes * 2, FINGERPRINT_LENGTH)
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages stay stable under inserts and break ordering ties by id"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='x', is_staff=True)
+        cls.event = make_event()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def walk(self, url, between_pages=None):
+        ids = []
+        while url:
+            page = self.client.get(url).json()
+            ids += [row['id'] for row in page['results']]
+            url = page['next']
+            if between_pages:
+                between_pages()
+        return ids
+
+    def registrations(self, registered_at, count, start=0):
+        created = [make_registration(self.event, start + i) for i in range(count)]
+        for registration, when in zip(created, registered_at):
+            Registration.objects.filter(pk=registration.pk).update(registered_at=when)
+        return created
+
+    def test_inserts_between_pages(self):
+        now = timezone.now()
+        original = self.registrations([now - timedelta(minutes=i) for i in range(7)], 7)
+        inserted = iter(range(100, 110))
+
+        def register_more():
+            # Newer rows land before the cursor, on pages already read
+            make_registration(self.event, next(inserted))
+
+        ids = self.walk('/api/registrations/?page_size=2&fields=id', register_more)
+        self.assertEqual(ids, [str(r.id) for r in original])
+
+    def test_registered_at_ties_broken_by_id(self):
+        now = timezone.now()
+        original = self.registrations([now] * 5, 5)
+        ids = self.walk('/api/registrations/?page_size=2&fields=id')
+        self.assertEqual(ids, sorted((str(r.id) for r in original), key=uuid.UUID, reverse=True))
+
+    @mock.patch('events.pagination.KeysetPagination.max_page_size', 3)
+    @mock.patch('events.pagination.KeysetPagination.page_size', 2)
+    def test_page_size(self):
+        self.registrations([], 5)
+        for query, expected in [('', 2), ('?page_size=1', 1), ('?page_size=100', 3)]:
+            with self.subTest(query=query):
+                self.assertEqual(len(self.client.get(f'/api/registrations/{query}').json()['results']), expected)
+
+    def test_count_only_on_request(self):
+        self.registrations([], 3)
+        for url in ['/api/registrations/', '/api/logs/', '/api/events/']:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as queries:
+                self.assertNotIn('count', self.client.get(url).json())
+            self.assertEqual(len(queries), 3)  # Session, user, page
+        page = self.client.get('/api/registrations/?with_count=true&page_size=1').json()
+        self.assertEqual((page['count'], len(page['results'])), (3, 1))
+
+    def test_start_date_ties_broken_by_id(self):
+        now = timezone.now()
+        events = [make_event(f'Tie {i}', start_date=now, end_date=now) for i in range(5)]
+        events.append(self.event)
+        expected = sorted(events, key=lambda e: (e.start_date, e.id), reverse=True)
+        ids = self.walk('/api/events/?page_size=2&fields=id')
+        self.assertEqual(ids, [str(e.id) for e in expected])
+
+
+class AttendanceLogBufferTests(TransactionTestCase):
+    """A bad row must not keep later scan logs out of the database"""
+
+    def setUp(self):
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        self.spool_dir = spool.name
+        self.buffer = AttendanceLogBuffer(max_size=100, interval=3600, spool_dir=self.spool_dir)
+        self.addCleanup(self.buffer._stopped.set)
+        event = make_event()
+        self.kept = make_registration(event, 1)
+        self.deleted = make_registration(event, 2)
+
+    def test_deleted_registration_is_dropped(self):
+        self.buffer.add(registration=self.deleted, scan_result='success')
+        self.deleted.delete()
+        self.buffer.add(registration=self.kept, scan_result='success')
+        with self.assertLogs('events.scan_log_buffer', 'WARNING'):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(list(AttendanceLog.objects.values_list('registration_id', flat=True)), [self.kept.pk])
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertFalse(self.buffer._pending)
+        self.assertEqual(list(Path(self.spool_dir).iterdir()), [])
+
+    def test_rejected_rows_are_dead_lettered(self):
+        for _ in range(3):
+            self.buffer.add(registration=self.kept, scan_result='success')
+        self.buffer.add(registration_id=uuid.uuid4(), scan_result='success')
+        # The registration disappears between the existence check and the insert
+        every_row = lambda rows: (rows, {str(row.registration_id): self.kept.event_id for row in rows})
+        with mock.patch('events.scan_log_buffer._existing_rows', side_effect=every_row), \
+                self.assertLogs('events.scan_log_buffer', 'ERROR') as logs:
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertIn('Moved 1 rejected scan logs', logs.output[-1])
+        self.assertEqual(AttendanceLog.objects.count(), 3)
+        self.assertFalse(self.buffer._pending)
+        dead, = Path(self.spool_dir).glob('dead_letter-*.jsonl')
+        self.assertEqual(len(dead.read_text().splitlines()), 1)
+
+        self.buffer.add(registration=self.kept, scan_result='already_used')
+        self.assertEqual(self.buffer.flush(), 1)
+
+    def test_flush_counts_rollups(self):
+        self.buffer.add(registration=self.kept, scan_result='success')
+        self.buffer.add(registration=self.kept, scan_result='already_used')
+        self.assertFalse(MinuteRollup.objects.filter(success__gt=0).exists())
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(
+            list(HourRollup.objects.values_list('success', 'already_used')), [(1, 1)]
+        )
+
+    def test_replay_skips_flushed_rows(self):
+        self.buffer.add(registration=self.kept, scan_result='success')
+        spool, = Path(self.spool_dir).glob('scan_logs-*.jsonl')
+        content = spool.read_text()
+        self.buffer.flush()
+        # A crash after the flush committed but before the spool file was removed
+        unflushed = dict(json.loads(content), id=str(uuid.uuid4()), scan_result='already_used')
+        spool.write_text(content + json.dumps(unflushed) + '\n')
+        self.assertEqual(replay_spool_file(spool), (1, 0))
+        self.assertEqual(AttendanceLog.objects.count(), 2)
+        self.assertEqual(list(HourRollup.objects.values_list('success', 'already_used')), [(1, 1)])
+
+
+class AttendanceReportCacheTests(TempMediaMixin, TestCase):
+    """Report ETags follow the attendance version, and repeat downloads get 304"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='x', is_staff=True)
+        cls.event = make_event()
+        cls.registrations = [make_registration(cls.event, i) for i in range(3)]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = f'/attendance/download/?event_id={self.event.id}'
+
+    def download(self, **headers):
+        response = self.client.get(self.url, **headers)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def assertETagChanges(self, change):
+        etag = self.download()['ETag']
+        change()
+        response = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_conditional_get(self):
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        response = self.download(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_repeat_download_is_not_rendered(self):
+        first = self.download()
+        with mock.patch('events.views.build_attendance_pdf') as build:
+            second = self.download()
+        build.assert_not_called()
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_scan_changes_etag(self):
+        self.assertETagChanges(self.registrations[0].mark_as_scanned)
+
+    def test_delete_changes_etag(self):
+        self.assertETagChanges(self.registrations[1].delete)
+
+    def test_registration_edit_changes_etag(self):
+        def rename():
+            registration = Registration.objects.get(pk=self.registrations[2].pk)
+            registration.name = 'Renamed'
+            registration.save()
+        self.assertETagChanges(rename)
+
+    def test_other_event_keeps_etag(self):
+        etag = self.download()['ETag']
+        make_registration(make_event('Other'), 9).mark_as_scanned()
+        self.assertEqual(self.download(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_if_modified_since(self):
+        response = self.download()
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(self.download(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        Event.adjust_totals(self.event.id, present=1)
+        Event.objects.filter(pk=self.event.pk).update(attendance_changed_at=timezone.now() + timedelta(seconds=2))
+        self.assertEqual(self.download(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 200)
+
+    def test_one_stored_version_per_scope(self):
+        self.download()
+        self.registrations[0].mark_as_scanned()
+        self.download()
+        stored = [name for name in default_storage.listdir('reports/attendance')[1] if name.startswith(str(self.event.id))]
+        self.assertEqual(len(stored), 1)
+
+    def test_all_events_report(self):
+        self.url = '/attendance/download/'
+        etag = self.download()['ETag']
+        self.assertEqual(self.download(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        make_registration(make_event('Other'), 9)
+        self.assertNotEqual(self.download(HTTP_IF_NONE_MATCH=etag)['ETag'], etag)
+
+
+class EventIdCardTests(TempMediaMixin, TestCase):
+    """Batch ID cards: QR modules match the emailed PNG, sheets come out in order"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='x', is_staff=True)
+        cls.event = make_event()
+        cls.registrations = [make_registration(cls.event, i) for i in range(10)]
+
+    def test_modules_match_png(self):
+        payload = self.registrations[0].qr_code_data
+        size, runs = id_cards.qr_modules(payload)
+        dark = {(row, column + i) for row, column, length in runs for i in range(length)}
+        image = Image.open(io.BytesIO(render_qr_png(payload))).convert('L')
+        box = image.size[0] // size
+        self.assertEqual(image.size, (size * box, size * box))
+        png_dark = {
+            (row, column) for row in range(size) for column in range(size)
+            if image.getpixel((column * box + box // 2, row * box + box // 2)) < 128
+        }
+        self.assertEqual(dark, png_dark)
+
+    def test_pool_matches_serial(self):
+        payloads = [registration.qr_code_data for registration in self.registrations]
+        with mock.patch.object(id_cards, 'POOL_THRESHOLD', 1):
+            self.assertEqual(id_cards._modules_for(payloads, 2), id_cards._modules_for(payloads, 1))
+
+    def test_sheets_in_order(self):
+        output = io.BytesIO()
+        self.assertEqual(id_cards.render_event_cards(self.event, output, workers=1), 10)
+        pdf = output.getvalue()
+        self.assertEqual(len(re.findall(rb'/Type /Page\b', pdf)), 2)
+
+    def test_endpoint(self):
+        url = f'/id-cards/{self.event.id}/download/'
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+
+class IdCardCacheTests(TempMediaMixin, TestCase):
+    """Single ID cards are rendered once per printed details and revalidated by ETag"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = make_event('Hackathon')
+        cls.registration = make_registration(cls.event)
+
+    def setUp(self):
+        self.url = f'/id-card/{self.registration.id}/download/'
+
+    def download(self, **headers):
+        response = self.client.get(self.url, **headers)
+        if response.streaming:
+            response.body = b''.join(response.streaming_content)
+        return response
+
+    def cached_files(self):
+        try:
+            return default_storage.listdir(id_cards.card_directory(self.registration.id))[1]
+        except OSError:
+            return []
+
+    def test_conditional_get_and_cache_hit(self):
+        first = self.download()
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.body.startswith(b'%PDF'))
+        self.assertEqual(len(self.cached_files()), 1)
+        self.assertEqual(self.download(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        with mock.patch('events.views.draw_id_card') as draw:
+            second = self.download()
+        draw.assert_not_called()
+        self.assertEqual(second.body, first.body)
+
+    def test_printed_details_invalidate(self):
+        etag = self.download()['ETag']
+        Registration.objects.filter(pk=self.registration.pk).update(name='Renamed')
+        renamed = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(renamed.status_code, 200)
+        self.assertNotEqual(renamed['ETag'], etag)
+        # Only the current version stays on disk
+        self.assertEqual(len(self.cached_files()), 1)
+
+        Event.objects.filter(pk=self.event.pk).update(name='Hackathon 2')
+        self.assertNotEqual(self.download(HTTP_IF_NONE_MATCH=renamed['ETag'])['ETag'], renamed['ETag'])
+
+    def test_delete_removes_cached_card(self):
+        self.download()
+        Registration.objects.get(pk=self.registration.pk).delete()
+        self.assertEqual(self.cached_files(), [])
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+@override_settings(BULK_IMPORT_WORKERS=1)
+class RollupTests(TempMediaMixin, TestCase):
+    """Rollups counted as registrations and scans happen equal a rebuild from the raw rows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='x', is_staff=True)
+        cls.event = make_event()
+
+    def register(self, number):
+        response = self.client.post('/api/registrations/', {
+            'event': str(self.event.id), 'name': f'N{number}', 'student_id': str(number),
+            'email': f'{number}@example.com',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return Registration.objects.get(pk=response.json()['id'])
+
+    def verify(self, registration):
+        return self.client.post(
+            '/api/registrations/verify_qr/', {'qr_data': registration.qr_code_data}, content_type='application/json'
+        )
+
+    def test_incremental_matches_rebuild(self):
+        registrations = [self.register(i) for i in range(4)]
+        import_registrations(self.event, [{'name': 'B', 'student_id': 'B', 'email': 'b@example.com'}])
+        self.client.force_login(self.user)
+        self.verify(registrations[0])
+        self.verify(registrations[0])
+        self.client.post('/api/registrations/verify_qr_batch/', {'scans': [
+            {'qr_data': registrations[1].qr_code_data},
+            {'qr_data': registrations[2].qr_code_data},
+        ]}, content_type='application/json')
+        registrations[3].delete()
+        # Invalid scans are not rolled up, whether live or from (legacy) logs
+        self.client.post('/api/registrations/verify_qr/', {'qr_data': 'garbage'}, content_type='application/json')
+        AttendanceLog.objects.create(registration=registrations[1], scan_result='invalid')
+
+        incremental = rollup_rows(self.event)
+        analytics = rollups.event_analytics(self.event.id, 'minute')
+        self.assertEqual(sum(row[1] for row in incremental['HourRollup']), 4)
+        self.assertEqual(sum(row[2] for row in incremental['MinuteRollup']), 3)
+        rollups.rebuild(self.event.id)
+        self.assertEqual(rollup_rows(self.event), incremental)
+        self.assertEqual(rollups.event_analytics(self.event.id, 'minute'), analytics)
+
+    def test_scan_rolled_up_with_its_log(self):
+        registration = make_registration(self.event)
+        self.client.force_login(self.user)
+        with mock.patch.object(AttendanceLog.objects, 'create', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            self.verify(registration)
+        # No rollup for a scan whose log was never written
+        self.assertFalse(MinuteRollup.objects.filter(success__gt=0).exists())
+
+    def test_analytics_endpoint(self):
+        registration = self.register(1)
+        self.client.force_login(self.user)
+        self.verify(registration)
+        url = f'/api/analytics/events/{self.event.id}/'
+        data = self.client.get(url, {'granularity': 'minute'}).json()
+        self.assertEqual(data['series'][-1]['registered'], 1)
+        self.assertEqual(data['series'][-1]['arrived'], 1)
+        self.assertEqual(data['peak_minute']['success'], 1)
+        self.assertEqual(self.client.get(url, {'granularity': 'day'}).status_code, 400)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Tests the SQLite backend')
+class SqliteBackendTests(SimpleTestCase):
+    """Connection pragmas, BEGIN IMMEDIATE and lock retries, on a throwaway database file"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = str(Path(directory.name) / 'db.sqlite3')
+        setup = sqlite3.connect(self.path)
+        setup.execute('CREATE TABLE scans (id INTEGER PRIMARY KEY, n INTEGER)')
+        setup.close()
+
+    def open(self, **options):
+        """A backend connection to the throwaway file; OPTIONS default to the configured profile"""
+        options = {**connection.settings_dict['OPTIONS'], **options}
+        wrapper = DatabaseWrapper(dict(connection.settings_dict, NAME=self.path, OPTIONS=options), alias='lock-test')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def begin(self, wrapper):
+        """Start a transaction the way atomic() does"""
+        wrapper.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+
+    def commit(self, wrapper):
+        wrapper.commit()
+        wrapper.set_autocommit(True)
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_default_profile_keeps_journal_mode(self):
+        wrapper = self.open()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), connection.settings_dict['OPTIONS']['pragmas']['busy_timeout'])
+
+    def test_production_pragmas(self):
+        wrapper = self.open(pragmas={'journal_mode': 'WAL', 'synchronous': 'NORMAL'})
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+
+    def test_begin_immediate_takes_write_lock(self):
+        holder = self.open()
+        self.begin(holder)
+        writer = self.open(pragmas={'busy_timeout': 0}, lock_retries=1, lock_retry_delay=0)
+        before = lock_stats()
+        with self.assertRaisesMessage(OperationalError, 'database is locked'), \
+                self.assertLogs('eventpass_backend.sqlite_backend.base', 'WARNING'):
+            with writer.cursor() as cursor:
+                cursor.execute('INSERT INTO scans (n) VALUES (1)')
+        after = lock_stats()
+        self.assertEqual(after['retried'] - before['retried'], 1)
+        self.assertEqual(after['failed'] - before['failed'], 1)
+        self.commit(holder)
+
+    def test_retry_recovers_once_lock_is_released(self):
+        holder = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.addCleanup(holder.close)
+        holder.execute('BEGIN IMMEDIATE')
+        release = threading.Timer(0.1, holder.execute, ['COMMIT'])
+        self.addCleanup(release.cancel)
+        writer = self.open(pragmas={'busy_timeout': 0}, lock_retries=5, lock_retry_delay=0.1)
+        before = lock_stats()
+        release.start()
+        with writer.cursor() as cursor:
+            cursor.execute('INSERT INTO scans (n) VALUES (1)')
+        after = lock_stats()
+        self.assertGreaterEqual(after['retried'] - before['retried'], 1)
+        self.assertEqual(after['recovered'] - before['recovered'], 1)
+        self.assertEqual(after['failed'], before['failed'])
+
+    def test_concurrent_read_then_write_transactions(self):
+        errors = []
+
+        def scan():
+            # Deferred transactions would fail here when two threads read before either writes
+            wrapper = DatabaseWrapper(dict(connection.settings_dict, NAME=self.path), alias='lock-test')
+            try:
+                self.begin(wrapper)
+                with wrapper.cursor() as cursor:
+                    cursor.execute('SELECT COUNT(*) FROM scans')
+                    count = cursor.fetchone()[0]
+                    cursor.execute('INSERT INTO scans (n) VALUES (%s)', [count + 1])
+                self.commit(wrapper)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                wrapper.close()
+
+        before = lock_stats()
+        threads = [threading.Thread(target=scan) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(lock_stats()['failed'], before['failed'])
+        with sqlite3.connect(self.path) as check:
+            self.assertEqual(sorted(n for (n,) in check.execute('SELECT n FROM scans')), list(range(1, 9)))
+
+
+class EventCountTests(TestCase):
+    """Event list, retrieve and statistics read counts without a query per event"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = make_event('Counted')
+        for number in range(3):
+            make_registration(cls.event, number)
+        Registration.objects.filter(event=cls.event, student_id='S0').update(has_attended=True)
+        Event.objects.filter(pk=cls.event.pk).update(present_total=1)
+
+    def test_list_and_retrieve_counts(self):
+        expected = {'registered_count': 3, 'present_count': 1, 'absent_count': 2}
+        listed = next(row for row in self.client.get('/api/events/').json()['results'] if row['name'] == 'Counted')
+        retrieved = self.client.get(f'/api/events/{self.event.id}/').json()
+        for data in [listed, retrieved]:
+            self.assertEqual({key: data[key] for key in expected}, expected)
+
+    def test_list_queries_constant(self):
+        with CaptureQueriesContext(connection) as few:
+            self.client.get('/api/events/')
+        for number in range(5):
+            make_registration(make_event(f'More {number}'), 100 + number)
+        with self.assertNumQueries(len(few)):
+            self.assertEqual(len(self.client.get('/api/events/').json()['results']), 6)
+
+    def test_statistics(self):
+        self.client.force_login(User.objects.create_user('staff', password='x'))
+        with self.assertNumQueries(3):  # Session, user, event
+            data = self.client.get(f'/api/events/{self.event.id}/statistics/').json()
+        self.assertEqual(data['registered'], 3)
+        self.assertEqual(data['absent'], 2)
+        self.assertAlmostEqual(data['attendance_rate'], 100 / 3)
+
+
+class EventCounterTests(TestCase):
+    """Stored registered/present totals follow registrations, check-ins and deletes"""
+
+    def setUp(self):
+        self.event = make_event()
+        self.first = make_registration(self.event, 1)
+        self.second = make_registration(self.event, 2)
+        self.first.mark_as_scanned()
+
+    def totals(self):
+        self.event.refresh_from_db()
+        return self.event.registered_total, self.event.present_total
+
+    def test_check_in_counted_once(self):
+        self.assertFalse(Registration.objects.get(pk=self.first.pk).mark_as_scanned())
+        self.assertEqual(self.totals(), (2, 1))
+
+    def test_deletes(self):
+        version = Event.objects.get(pk=self.event.pk).attendance_version
+        self.first.delete()
+        self.assertEqual(self.totals(), (1, 0))
+        self.assertGreater(self.event.attendance_version, version)
+        Registration.objects.filter(event=self.event).delete()
+        self.assertEqual(self.totals(), (0, 0))
+
+    def test_counted_however_created(self):
+        Registration.objects.create(
+            event=self.event, name='Shell', student_id='X', email='x@example.com',
+            qr_code_data='shell', has_attended=True,
+        )
+        self.assertEqual(self.totals(), (3, 2))
+        Registration.objects.filter(event=self.event).delete()
+        self.assertEqual(self.totals(), (0, 0))
+
+    def test_moved_to_other_event(self):
+        other = make_event('Other')
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        response = self.client.patch(
+            f'/api/registrations/{self.first.id}/', {'event': str(other.id)}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(), (1, 0))
+        other.refresh_from_db()
+        self.assertEqual((other.registered_total, other.present_total), (1, 1))
+        self.assertEqual(rollup_rows(other)['HourRollup'][0][1], 1)
+        self.assertEqual(rollup_rows(self.event)['HourRollup'][0][1], 1)
+
+    def test_attendance_edited(self):
+        registration = Registration.objects.get(pk=self.second.pk)
+        registration.has_attended = True
+        registration.save()
+        self.assertEqual(self.totals(), (2, 2))
+        registration.has_attended = False
+        registration.save(update_fields=['has_attended'])
+        self.assertEqual(self.totals(), (2, 1))
+        registration.name = 'Renamed'
+        with self.assertNumQueries(2):
+            # No counted field: no read of the stored row, only the attendance version moves
+            registration.save(update_fields=['name'])
+        self.assertEqual(self.totals(), (2, 1))
+
+    def test_event_delete_skips_counters(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.event.delete()
+        self.assertFalse(Registration.objects.exists())
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE "events_event"')])
+
+    def test_reconcile(self):
+        Event.objects.filter(pk=self.event.pk).update(registered_total=7, present_total=0)
+        out = io.StringIO()
+        call_command('reconcile_event_counters', '--dry-run', stdout=out)
+        self.assertIn('registered 7 -> 2, present 0 -> 1', out.getvalue())
+        self.assertEqual(self.totals(), (7, 0))
+        version = self.event.attendance_version
+        with mock.patch.object(Event, 'invalidate_statistics') as invalidate:
+            call_command('reconcile_event_counters', stdout=io.StringIO())
+        invalidate.assert_called_once_with()
+        self.assertEqual(self.totals(), (2, 1))
+        self.assertEqual(self.event.attendance_version, version + 1)
+
+
+class QrImageStorageTests(TempMediaMixin, TestCase):
+    """QR PNGs are stored once per content hash and regenerated when missing"""
+
+    def test_store_png_dedups(self):
+        png = render_qr_png(generate_token()[0])
+        name = store_png(png)
+        self.assertEqual(store_png(png), name)
+        self.assertEqual(len(default_storage.listdir(str(Path(name).parent))[1]), 1)
+        with default_storage.open(name, 'rb') as f:
+            self.assertEqual(f.read(), png)
+
+    def test_create_stores_file(self):
+        event = make_event()
+        response = self.client.post('/api/registrations/', {
+            'event': str(event.id), 'name': 'N', 'student_id': '1', 'email': '1@example.com',
+        }, content_type='application/json')
+        registration = Registration.objects.get(pk=response.json()['id'])
+        self.assertTrue(default_storage.exists(registration.qr_code_file.name))
+        self.assertEqual(response.json()['qr_code_url'], registration.qr_code_file.url)
+        self.assertTrue(response.json()['qr_code_image'].startswith('data:image/png;base64,'))
+
+    def test_missing_file_regenerated(self):
+        registration = make_registration(make_event(), qr_code_file='qr_codes/missing.png')
+        png = qr_png_for(registration)
+        self.assertEqual(png, render_qr_png(registration.qr_code_data))
+        stored = Registration.objects.get(pk=registration.pk).qr_code_file.name
+        self.assertEqual(stored, registration.qr_code_file.name)
+        self.assertTrue(default_storage.exists(stored))
+
+
+class CheckInRaceTests(TestCase):
+    """Only one of several gates scanning the same ticket checks it in"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='x', is_staff=True)
+        cls.event = make_event()
+        cls.registration = make_registration(cls.event)
+
+    def test_stale_instances(self):
+        gates = [Registration.objects.get(pk=self.registration.pk) for _ in range(3)]
+        self.assertEqual([gate.mark_as_scanned() for gate in gates], [True, False, False])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.present_total, 1)
+
+    def test_verify_qr_loses_race(self):
+        mark_as_scanned = Registration.mark_as_scanned
+
+        def other_gate_first(registration):
+            # Another gate checks the ticket in between this request's read and update
+            mark_as_scanned(Registration.objects.get(pk=registration.pk))
+            return mark_as_scanned(registration)
+
+        self.client.force_login(self.user)
+        with mock.patch.object(Registration, 'mark_as_scanned', autospec=True, side_effect=other_gate_first):
+            response = self.client.post(
+                '/api/registrations/verify_qr/', {'qr_data': self.registration.qr_code_data},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['scan_result'], 'already_used')
+        self.assertTrue(response.json()['registration']['has_attended'])
+        self.assertEqual(
+            list(AttendanceLog.objects.values_list('scan_result', flat=True)), ['already_used']
+        )
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.present_total, 1)
+
+
+class SparseFieldsetTests(TestCase):
+    """?fields= trims the output and the columns loaded for it"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='x', is_staff=True)
+        cls.event = make_event()
+        make_registration(cls.event, qr_code_file='qr_codes/x.png')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def page_query(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.client.get(url).json()['results']
+        return rows, queries[-1]['sql']
+
+    def test_columns_pruned(self):
+        rows, sql = self.page_query('/api/registrations/?fields=id,name')
+        self.assertEqual(set(rows[0]), {'id', 'name'})
+        self.assertNotIn('"qr_code_data"', sql)
+        self.assertNotIn('"email"', sql)
+        self.assertNotIn('JOIN', sql)
+
+    def test_related_and_computed_fields(self):
+        rows, sql = self.page_query('/api/registrations/?fields=event_name,qr_code_url')
+        self.assertEqual(rows[0]['event_name'], 'Event')
+        self.assertTrue(rows[0]['qr_code_url'].endswith('qr_codes/x.png'))
+        self.assertIn('JOIN "events_event"', sql)
+        self.assertIn('"qr_code_file"', sql)
+        self.assertNotIn('"qr_code_data"', sql)
+
+    def test_event_counts(self):
+        rows, sql = self.page_query('/api/events/?fields=name,registered_count')
+        self.assertEqual(rows, [{'name': 'Event', 'registered_count': 1}])
+        self.assertNotIn('"description"', sql)
+
+
+class AttendancePdfTests(TestCase):
+    """The attendance PDF is laid out from page-sized chunks pulled on demand"""
+
+    def rows(self, count):
+        return ([str(i), f'S{i}', f'Student {i}', f'{i}@example.com', 'PRESENT' if i % 3 else 'ABSENT']
+                for i in range(1, count + 1))
+
+    def test_rows_from_queryset(self):
+        event = make_event()
+        for number in range(3):
+            make_registration(event, number)
+        Registration.objects.filter(student_id='S1').update(has_attended=True)
+        rows = list(attendance_rows(Registration.objects.order_by('student_id')))
+        self.assertEqual([row[0] for row in rows], ['1', '2', '3'])
+        self.assertEqual([row[4] for row in rows], ['ABSENT', 'PRESENT', 'ABSENT'])
+
+    def test_chunks(self):
+        tables = list(attendance_tables(self.rows(60), rows_per_chunk=28))
+        # Only the first chunk carries the header row
+        self.assertEqual([len(table._cellvalues) for table in tables], [29, 28, 4])
+
+    def test_flowables_pulled_on_demand(self):
+        pulled = []
+        source = (pulled.append(i) or i for i in range(100))
+        flowables = LazyFlowables(source)
+        self.assertEqual(len(flowables), 1)
+        self.assertEqual(pulled, [0])
+        self.assertEqual(flowables.pop(0), 0)
+        self.assertEqual(len(flowables), 1)
+        self.assertEqual(pulled, [0, 1])
+
+    def test_large_report(self):
+        output = io.BytesIO()
+        build_attendance_pdf(output, 'Big Event', 'January 1, 2026', self.rows(1000))
+        pdf = output.getvalue()
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertGreaterEqual(len(re.findall(rb'/Type /Page\b', pdf)), 1000 // 28)
+
+
+class ReportAssetsTests(SimpleTestCase):
+    """Report logos are decoded once and reloaded when the file changes"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.images = Path(directory.name) / 'static' / 'images'
+        self.images.mkdir(parents=True)
+        self.enterContext(override_settings(BASE_DIR=Path(directory.name)))
+        self.enterContext(mock.patch.object(report_assets, 'RECHECK_INTERVAL', 0))
+        report_assets.reset()
+        self.addCleanup(report_assets.reset)
+
+    def save_logo(self, size, format='PNG'):
+        Image.new('RGB', size, 'red').save(self.images / 'logo.img', format=format)
+
+    def test_decoded_once(self):
+        self.save_logo((4, 4))
+        reader = report_assets.image_reader('logo.img')
+        with mock.patch.object(Image, 'open') as image_open:
+            self.assertIs(report_assets.image_reader('logo.img'), reader)
+        image_open.assert_not_called()
+        self.assertEqual(reader.getSize(), (4, 4))
+
+    def test_reloaded_on_change(self):
+        self.save_logo((4, 4))
+        first = report_assets.image_reader('logo.img')
+        self.save_logo((8, 8))
+        self.assertEqual(report_assets.image_reader('logo.img').getSize(), (8, 8))
+        self.assertIsNot(report_assets.image_reader('logo.img'), first)
+
+    def test_missing_and_jpeg(self):
+        self.assertIsNone(report_assets.image_reader('logo.img'))
+        self.save_logo((4, 4), 'JPEG')
+        readers = [report_assets.image_reader('logo.img') for _ in range(2)]
+        self.assertIsNot(readers[0], readers[1])
+        self.assertEqual(readers[1].getSize(), (4, 4))
+
+    def test_styles_shared(self):
+        self.assertIs(report_assets.styles(), report_assets.styles())
+        self.assertTrue(report_assets.attendance_header('Event', 'Today'))
+
+
+class ExportTests(TestCase):
+    """CSV exports stream in row blocks and honour their filters"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='x', is_staff=True)
+        cls.event = make_event('Export')
+        cls.registrations = [make_registration(cls.event, i) for i in range(5)]
+        cls.registrations[0].mark_as_scanned()
+        AttendanceLog.objects.create(registration=cls.registrations[0], scan_result='success')
+        AttendanceLog.objects.create(registration=cls.registrations[0], scan_result='already_used')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        blocks = [block.decode() for block in response.streaming_content]
+        return blocks, list(csv.reader(io.StringIO(''.join(blocks))))
+
+    @mock.patch('events.exports.ROWS_PER_WRITE', 2)
+    def test_registrations_streamed_in_blocks(self):
+        blocks, rows = self.export('/exports/registrations/')
+        self.assertEqual(rows[0][:3], ['Registration ID', 'Event', 'Name'])
+        self.assertEqual([row[3] for row in rows[1:]], [f'S{i}' for i in range(5)])
+        # Header, then blocks of two rows
+        self.assertEqual(len(blocks), 4)
+
+    def test_filters(self):
+        _, rows = self.export('/exports/registrations/', event=str(self.event.id), attended='true')
+        self.assertEqual([row[3] for row in rows[1:]], ['S0'])
+        _, rows = self.export('/exports/logs/', scan_result='already_used')
+        self.assertEqual([(row[1], row[4]) for row in rows[1:]], [('Export', 'already_used')])
+        _, rows = self.export('/exports/logs/', to='2000-01-01')
+        self.assertEqual(len(rows), 1)
+
+    def test_invalid_requests(self):
+        for params in [{'attended': 'maybe'}, {'event': 'x'}, {'from': 'soon'}, {'format': 'pdf'}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/exports/registrations/', params).status_code, 400)
+        self.client.force_login(User.objects.create_user('student', password='x'))
+        self.assertEqual(self.client.get('/exports/logs/').status_code, 403)
+
+    @unittest.skipIf(XLSX_AVAILABLE, 'openpyxl is installed')
+    def test_xlsx_needs_openpyxl(self):
+        self.assertEqual(self.client.get('/exports/logs/', {'format': 'xlsx'}).status_code, 501)
+
+    @unittest.skipUnless(XLSX_AVAILABLE, 'XLSX export needs openpyxl')
+    def test_xlsx(self):
+        import openpyxl
+
+        response = self.client.get('/exports/registrations/', {'format': 'xlsx'})
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(workbook.active.values)
+        self.assertEqual(rows[0][0], 'Registration ID')
+        self.assertEqual(len(rows), 6)
+
+
+class AttendanceDocxTests(TestCase):
+    """The DOCX report fills the department template with one row per registration"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='x', is_staff=True)
+        cls.event = make_event('Hackathon')
+        cls.registrations = [make_registration(cls.event, i) for i in range(4)]
+
+    def build(self, rows):
+        output = io.BytesIO()
+        build_attendance_docx(rows, {'event_name': 'Hackathon', 'date': 'January 1, 2026'}, output)
+        return Document(io.BytesIO(output.getvalue()))
+
+    def texts(self, document):
+        paragraphs = [p.text for p in document.paragraphs]
+        cells = [cell.text for table in document.tables for row in table.rows for cell in row.cells]
+        return paragraphs + cells
+
+    def test_rows_and_placeholders(self):
+        rows = [{'sno': i, 'student_id': f'S{i}', 'name': f'N{i}', 'email': 'e', 'reg_id': 'R'} for i in range(1, 4)]
+        for _ in range(2):
+            # The parsed template is shared; each report starts from a clean copy
+            texts = self.texts(self.build(rows))
+            self.assertEqual([text for text in texts if text in ('S1', 'S2', 'S3')], ['S1', 'S2', 'S3'])
+            self.assertFalse([text for text in texts if '{{' in text or '{%' in text])
+            self.assertTrue(any('Hackathon' in text for text in texts))
+
+    def test_endpoint(self):
+        url = f'/attendance/download/docx/?event_id={self.event.id}'
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        texts = self.texts(Document(io.BytesIO(b''.join(response.streaming_content))))
+        self.assertEqual(
+            sorted(text for text in texts if re.fullmatch(r'S\d', text)),
+            sorted(r.student_id for r in self.registrations),
+        )
+        self.assertEqual(self.client.get('/attendance/download/docx/?event_id=' + str(make_event().id)).status_code, 404)
+
+
+class DashboardStatisticsTests(TestCase):
+    """Dashboard totals come from one cached query and are dropped after writes commit"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='x', is_staff=True)
+        cls.event = make_event(status='ongoing')
+        make_event('Later', start_date=timezone.now() + timedelta(days=3), end_date=timezone.now() + timedelta(days=4))
+        cls.registrations = [make_registration(cls.event, i) for i in range(4)]
+        cls.registrations[0].mark_as_scanned()
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client.force_login(self.user)
+
+    def statistics(self):
+        return self.client.get('/api/dashboard/statistics/').json()
+
+    def test_totals(self):
+        self.assertEqual(self.statistics(), {
+            'total_events': 2, 'active_events': 1, 'total_registrations': 4,
+            'total_present': 1, 'total_absent': 3, 'attendance_rate': 25.0,
+        })
+
+    def test_cached(self):
+        with self.assertNumQueries(1):
+            Event.statistics()
+        with self.assertNumQueries(0):
+            Event.statistics()
+
+    def test_invalidated_on_commit(self):
+        self.statistics()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.registrations[1].mark_as_scanned()
+        self.assertEqual(self.statistics()['total_present'], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_event('New')
+        self.assertEqual(self.statistics()['total_events'], 3)
+
+    def test_cache_kept_until_commit(self):
+        Event.statistics()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Event.adjust_totals(self.event.id, present=1)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(Event.statistics()['total_present'], 1)
+
+
+class LiveFeedTests(TestCase):
+    """Scan results fan out from memory to every matching SSE connection"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = make_event('Live')
+        cls.registration = make_registration(cls.event)
+
+    def setUp(self):
+        self.feed = live_feed.LiveFeed()
+        self.enterContext(mock.patch.object(live_feed, 'feed', self.feed))
+
+    async def next_message(self, subscriber):
+        return await asyncio.wait_for(subscriber.queue.get(), 1)
+
+    async def test_fan_out_from_other_threads(self):
+        everything, _ = self.feed.subscribe()
+        this_event, _ = self.feed.subscribe(str(self.event.id))
+        other = threading.Thread(target=self.feed.dispatch, args=[{'type': 'scan', 'event_id': 'other'}])
+        other.start()
+        other.join()
+        self.feed.dispatch({'type': 'scan', 'event_id': str(self.event.id)})
+        self.assertEqual((await self.next_message(everything))[1]['event_id'], 'other')
+        self.assertEqual((await self.next_message(everything))[1]['event_id'], str(self.event.id))
+        self.assertEqual((await self.next_message(this_event))[1]['event_id'], str(self.event.id))
+        self.assertTrue(this_event.queue.empty())
+
+    async def test_slow_client_drops_oldest(self):
+        with mock.patch.object(live_feed, 'QUEUE_SIZE', 2):
+            subscriber, _ = self.feed.subscribe()
+        for number in range(3):
+            self.feed.dispatch({'type': 'scan', 'number': number})
+        await asyncio.sleep(0)
+        self.assertEqual([(await self.next_message(subscriber))[1]['number'] for _ in range(2)], [1, 2])
+
+    async def test_replay_after_last_event_id(self):
+        for number in range(3):
+            self.feed.dispatch({'type': 'scan', 'number': number})
+        _, replay = self.feed.subscribe(last_event_id=f'{self.feed.boot_id}-1')
+        self.assertEqual([message['number'] for _, message in replay], [1, 2])
+        _, replay = self.feed.subscribe(last_event_id='otherboot-1')
+        self.assertEqual(replay, [])
+
+    @override_settings(LIVE_FEED_KEEPALIVE=0.01, LIVE_FEED_MAX_AGE=1)
+    async def test_sse_stream(self):
+        stream = live_feed.sse_stream()
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+        self.assertEqual(await anext(stream), ': keepalive\n\n')
+        self.feed.dispatch({'type': 'scan', 'message': 'hi'})
+        frame = await anext(stream)
+        while frame.startswith(':'):
+            frame = await anext(stream)
+        self.assertRegex(frame, r'^id: \w+-1\nevent: scan\ndata: \{.*"hi".*\}\n\n$')
+        await stream.aclose()
+        self.assertFalse(self.feed.active)
+
+    def test_publish_without_listeners_runs_no_query(self):
+        with self.assertNumQueries(0):
+            live_feed.publish_scan('success', 'ok', self.registration)
+
+    def publish_and_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            live_feed.publish_scan('success', 'ok', self.registration)
+        # Nothing goes out before the scan's transaction commits
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+
+    async def test_publish_scan_carries_counters(self):
+        subscriber, _ = self.feed.subscribe()
+        await sync_to_async(self.publish_and_commit)()
+        message = (await self.next_message(subscriber))[1]
+        self.assertEqual(message['event_name'], 'Live')
+        self.assertEqual(message['counters'], {'registered': 1, 'present': 0, 'absent': 1})
+
+    @override_settings(LIVE_FEED_BROKER='127.0.0.1:9')
+    def test_unreachable_broker_does_not_block(self):
+        publisher = live_feed._BrokerPublisher()
+        attempted = threading.Event()
+
+        def slow_connect(*args, **kwargs):
+            attempted.set()
+            time.sleep(0.2)
+            raise OSError('unreachable')
+
+        with mock.patch('socket.create_connection', side_effect=slow_connect) as connect, \
+                self.assertLogs('events.live_feed', 'WARNING'):
+            started = time.monotonic()
+            self.assertTrue(publisher.send({'type': 'scan'}))
+            self.assertTrue(attempted.wait(1))
+            self.assertTrue(publisher.send({'type': 'scan'}))
+            self.assertLess(time.monotonic() - started, 0.2)
+            time.sleep(0.3)
+            # Backing off: the second message is dropped without another attempt
+            self.assertEqual(connect.call_count, 1)
 
-# Create your tests here.
@@ -5,11 +5,16 @@ from . import views
 router = DefaultRouter()
 router.register(r'events', views.EventViewSet, basename='event')
 router.register(r'registrations', views.RegistrationViewSet, basename='registration')
+router.register(r'logs', views.AttendanceLogViewSet, basename='attendancelog')
 
 urlpatterns = [
     # API endpoints
     path('api/', include(router.urls)),
     path('api/dashboard/statistics/', views.dashboard_statistics, name='dashboard-statistics'),
+    path('api/live/scans/', views.live_scans, name='live-scans'),
+    path('api/analytics/events/<uuid:event_id>/', views.event_analytics, name='event-analytics'),
+    path('api/dashboard/email-outbox/', views.email_outbox_status, name='email-outbox-status'),
+    path('api/dashboard/query-stats/', views.query_stats, name='query-stats'),
     path('api/admin/login/', views.admin_login_view, name='admin-login'),
     path('api/admin/logout/', views.admin_logout_view, name='admin-logout'),
     
@@ -29,5 +34,9 @@ urlpatterns = [
     path('admin-panel/registrations/<uuid:registration_id>/delete/', views.admin_delete_registration, name='admin-delete-registration'),
     path('admin-panel/logs/', views.admin_logs_view, name='admin-logs'),
     path('attendance/download/', views.generate_attendance_pdf, name='attendance-pdf'),
+    path('attendance/download/docx/', views.generate_attendance_docx, name='attendance-docx'),
+    path('exports/registrations/', views.export_registrations, name='export-registrations'),
+    path('exports/logs/', views.export_attendance_logs, name='export-logs'),
     path('id-card/<uuid:registration_id>/download/', views.generate_id_card_pdf, name='id-card-pdf'),
+    path('id-cards/<uuid:event_id>/download/', views.generate_event_id_cards_pdf, name='event-id-cards-pdf'),
 ]
@@ -1,104 +1,78 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, FileResponse
-from django.views.decorators.csrf import csrf_exempt
+from django.http import JsonResponse, FileResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.utils import timezone
-from django.db.models import Count, Q
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.utils.dateparse import parse_datetime
+from django.db import IntegrityError, transaction
 from django.conf import settings
-from email.mime.image import MIMEImage
-import os
+from collections import Counter
 from datetime import datetime
-from docx import Document
-from docx.shared import Inches, Pt, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from rest_framework import viewsets, status
+from rest_framework import serializers, viewsets, status
 from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
-import qrcode
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from asgiref.sync import sync_to_async
+from eventpass_backend.sqlite_backend.base import lock_stats
+import csv
 import io
-import base64
-import json
-import uuid
-from reportlab.lib.pagesizes import A7, A4, letter
-from reportlab.lib.units import mm, inch
+from reportlab.lib.pagesizes import A7
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as RLImage, HRFlowable
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from PIL import Image
-from .models import Event, Registration, AttendanceLog
+from .attendance_pdf import attendance_rows, build_attendance_pdf, spooled_buffer
+from .bulk_import import import_registrations, parse_rows
+from .checkin import verify_batch
+from .live_feed import publish_batch, publish_scan, sse_stream
+from .id_cards import card_cache_key, card_directory, draw_id_card, render_event_cards
+from .exports import XLSX_AVAILABLE, ExportError, log_export, parse_bound, registration_export, stream_csv, write_xlsx
+from .docx_report import build_attendance_docx, docx_rows
+from .emails import enqueue_registration_email
+from .manifest import build_manifest
+from .middleware import endpoint_stats
+from .models import Event, Registration, AttendanceLog, OutboundEmail
+from .qr_images import data_uri, qr_png_for, render_qr_png, store_png
+from .qr_tokens import generate_token, lookup_for_payload
+from . import rollups
+from .report_cache import open_cached_report, report_validators, set_validators, store_report
+from .scan_log_buffer import record_scan
 from .serializers import (
     EventSerializer, RegistrationSerializer, RegistrationCreateSerializer,
     AttendanceLogSerializer, EventStatisticsSerializer
 )
 
 
-def send_registration_email(registration, qr_code_image_base64):
-    """Send registration confirmation email with QR code"""
-    try:
-        event = registration.event
-        
-        # Prepare email context
-        context = {
-            'name': registration.name,
-            'event_name': event.name,
-            'event_venue': event.venue,
-            'event_date': event.start_date.strftime('%B %d, %Y at %I:%M %p'),
-            'student_id': registration.student_id,
-            'registration_id': str(registration.id)[:8].upper(),
-        }
-        
-        # Render HTML email
-        html_content = render_to_string('emails/registration_email.html', context)
-        
-        # Create email message
-        subject = f'Event Registration Confirmation - {event.name}'
-        from_email = settings.DEFAULT_FROM_EMAIL
-        to_email = [registration.email]
-        
-        # Create message
-        msg = EmailMultiAlternatives(subject, '', from_email, to_email)
-        msg.attach_alternative(html_content, "text/html")
-        
-        # Attach college logo
-        logo_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'cmrtc.png')
-        if os.path.exists(logo_path):
-            with open(logo_path, 'rb') as f:
-                logo_img = MIMEImage(f.read())
-                logo_img.add_header('Content-ID', '<college_logo>')
-                logo_img.add_header('Content-Disposition', 'inline', filename='logo.png')
-                msg.attach(logo_img)
-        
-        # Attach QR code
-        # Convert base64 to bytes
-        qr_code_data = qr_code_image_base64.split(',')[1]  # Remove data:image/png;base64, prefix
-        qr_code_bytes = base64.b64decode(qr_code_data)
-        qr_img = MIMEImage(qr_code_bytes)
-        qr_img.add_header('Content-ID', '<qr_code>')
-        qr_img.add_header('Content-Disposition', 'inline', filename='qr_code.png')
-        msg.attach(qr_img)
-        
-        # Send email
-        msg.send()
-        return True
-        
-    except Exception as e:
-        print(f"Error sending email: {str(e)}")
-        return False
+def get_client_ip(request):
+    """Get client IP, honouring X-Forwarded-For"""
+    return request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')[0] or \
+        request.META.get('REMOTE_ADDR')
+
+
+class SparseFieldsetViewMixin:
+    """Load only the columns the (possibly ?fields= trimmed) serializer renders"""
+    sparse_actions = ('list', 'retrieve')
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in self.sparse_actions:
+            return queryset
+        columns = self.get_serializer().model_columns()
+        # Cursor pagination reads the ordering columns of the last row
+        columns.update(field.lstrip('-') for field in getattr(self, 'cursor_ordering', ()))
+        if not any('__' in column for column in columns):
+            # No related column is rendered, so skip the join
+            queryset = queryset.select_related(None)
+        return queryset.only(*columns)
 
 
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet for managing events"""
-    queryset = Event.objects.all()
+    # Counts are annotated so list/retrieve/statistics cost a single query
+    queryset = Event.objects.with_counts()
     serializer_class = EventSerializer
+    cursor_ordering = ('-start_date', '-id')
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -109,7 +83,7 @@ class EventViewSet(viewsets.ModelViewSet):
     def active_events(self, request):
         """Get all currently active/ongoing events"""
         now = timezone.now()
-        active = Event.objects.filter(
+        active = self.get_queryset().filter(
             start_date__lte=now,
             end_date__gte=now,
             status='ongoing'
@@ -121,20 +95,34 @@ class EventViewSet(viewsets.ModelViewSet):
     def statistics(self, request, pk=None):
         """Get statistics for a specific event"""
         event = self.get_object()
+        registered = event.registered_total
+        present = event.present_total
         data = {
             'event_name': event.name,
-            'registered': event.registered_count,
-            'present': event.present_count,
-            'absent': event.absent_count,
-            'attendance_rate': (event.present_count / event.registered_count * 100) if event.registered_count > 0 else 0
+            'registered': registered,
+            'present': present,
+            'absent': registered - present,
+            'attendance_rate': (present / registered * 100) if registered > 0 else 0
         }
         return Response(data)
-
-
-class RegistrationViewSet(viewsets.ModelViewSet):
+    
+    @action(detail=True, methods=['get'])
+    def scan_manifest(self, request, pk=None):
+        """Ticket fingerprints and attendance state for offline scanners (?since=<version> for a delta)"""
+        event = get_object_or_404(Event.objects.only('id'), pk=pk)
+        since = None
+        if request.query_params.get('since'):
+            since = parse_datetime(request.query_params['since'])
+            if since is None:
+                return Response({'error': 'Invalid since cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(build_manifest(event, since))
+
+
+class RegistrationViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet for managing registrations"""
-    queryset = Registration.objects.all()
+    queryset = Registration.objects.select_related('event')
     serializer_class = RegistrationSerializer
+    cursor_ordering = ('-registered_at', '-id')
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -144,6 +132,8 @@ class RegistrationViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action == 'create':
             return [AllowAny()]
+        if self.action == 'bulk_import':
+            return [IsAdminUser()]
         return [IsAuthenticated()]
     
     def create(self, request, *args, **kwargs):
@@ -151,47 +141,59 @@ class RegistrationViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        # Generate unique QR code data
-        qr_uuid = str(uuid.uuid4())
-        qr_data_dict = {
-            'registration_id': qr_uuid,
-            'event_id': str(serializer.validated_data['event'].id),
-            'name': serializer.validated_data['name'],
-            'student_id': serializer.validated_data['student_id'],
-            'email': serializer.validated_data['email'],
-            'timestamp': timezone.now().isoformat()
-        }
-        qr_data = json.dumps(qr_data_dict)
-        
-        # Generate QR code image
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
+        # Generate a compact signed token for the QR code
+        qr_data, qr_token = generate_token()
         
-        # Convert to base64
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        img_str = base64.b64encode(buffer.getvalue()).decode()
-        qr_code_image = f"data:image/png;base64,{img_str}"
+        # Generate QR code image and store it by content hash
+        qr_png = render_qr_png(qr_data)
+        qr_code_file = store_png(qr_png)
         
-        # Save registration
-        registration = serializer.save(
-            qr_code_data=qr_data,
-            qr_code_image=qr_code_image
-        )
-        
-        # Send confirmation email
-        email_sent = send_registration_email(registration, qr_code_image)
+        # Save registration (counted by the post_save signal) and queue the
+        # confirmation email (sent later by `send_outbox`) together
+        with transaction.atomic():
+            registration = serializer.save(
+                qr_code_data=qr_data,
+                qr_token=qr_token,
+                qr_code_file=qr_code_file
+            )
+            enqueue_registration_email(registration)
         
         # Return registration data with QR code
         response_serializer = RegistrationSerializer(registration)
         return Response({
             **response_serializer.data,
-            'qr_code_image': qr_code_image,
-            'email_sent': email_sent
+            'qr_code_image': data_uri(qr_png),
+            'email_queued': True
         }, status=status.HTTP_201_CREATED)
     
+    @action(detail=False, methods=['post'], url_path='bulk-import')
+    def bulk_import(self, request):
+        """Import many registrations for one event from a CSV/JSON upload or a JSON rows list"""
+        try:
+            event_id = serializers.UUIDField().run_validation(request.data.get('event'))
+        except serializers.ValidationError:
+            return Response({'error': 'A valid event id is required'}, status=status.HTTP_400_BAD_REQUEST)
+        event = get_object_or_404(Event, id=event_id)
+        
+        try:
+            upload = request.FILES.get('file')
+            if upload:
+                fmt = 'json' if upload.name.lower().endswith('.json') else 'csv'
+                rows = parse_rows(upload.read(), fmt)
+            else:
+                rows = parse_rows(request.data.get('rows') or [], 'json')
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            return Response({'error': f'Could not parse import: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        send_emails = str(request.data.get('send_emails', 'true')).lower() != 'false'
+        try:
+            report = import_registrations(event, rows, send_emails=send_emails)
+        except IntegrityError:
+            return Response({
+                'error': 'Registrations for these emails were created during the import, please retry'
+            }, status=status.HTTP_409_CONFLICT)
+        return Response(report, status=status.HTTP_200_OK)
+    
     @action(detail=False, methods=['post'])
     def verify_qr(self, request):
         """Verify and mark QR code as scanned"""
@@ -199,84 +201,115 @@ class RegistrationViewSet(viewsets.ModelViewSet):
         if not qr_data:
             return Response({'error': 'QR data is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            # Parse QR data
-            qr_dict = json.loads(qr_data)
-            
-            # Find registration by QR code data
-            registration = Registration.objects.filter(qr_code_data=qr_data).first()
-            
-            if not registration:
-                return Response({
-                    'valid': False,
-                    'message': 'Invalid QR code',
-                    'scan_result': 'invalid'
-                }, status=status.HTTP_404_NOT_FOUND)
-            
-            # Get client IP
-            ip_address = request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')[0] or \
-                        request.META.get('REMOTE_ADDR')
-            
-            # Check if already scanned
-            if not registration.is_valid:
-                # Log failed attempt
-                AttendanceLog.objects.create(
-                    registration=registration,
-                    scan_result='already_used',
-                    ip_address=ip_address
-                )
-                return Response({
-                    'valid': False,
-                    'message': 'QR code already used',
-                    'scan_result': 'already_used',
-                    'registration': RegistrationSerializer(registration).data
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Mark as scanned
-            registration.mark_as_scanned()
-            
-            # Log successful scan
-            AttendanceLog.objects.create(
-                registration=registration,
-                scan_result='success',
-                ip_address=ip_address
-            )
-            
-            return Response({
-                'valid': True,
-                'message': 'Attendance marked successfully',
-                'scan_result': 'success',
-                'registration': RegistrationSerializer(registration).data
-            }, status=status.HTTP_200_OK)
-            
-        except json.JSONDecodeError:
+        # Signature/format checks happen before any database query
+        lookup = lookup_for_payload(qr_data)
+        if lookup is None:
+            publish_scan('invalid', 'Invalid QR code format')
             return Response({
                 'valid': False,
                 'message': 'Invalid QR code format',
                 'scan_result': 'invalid'
             }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Find registration by its indexed token (or legacy JSON payload)
+        field, value = lookup
+        registration = Registration.objects.select_related('event').filter(**{field: value}).first()
+        
+        if not registration:
+            publish_scan('invalid', 'Invalid QR code')
+            return Response({
+                'valid': False,
+                'message': 'Invalid QR code',
+                'scan_result': 'invalid'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        ip_address = get_client_ip(request)
+        
+        # Check in with a conditional UPDATE; zero affected rows means already used
+        if not (registration.is_valid and registration.mark_as_scanned()):
+            if registration.is_valid:
+                # Another gate checked this ticket in between our read and update
+                registration.refresh_from_db(fields=['is_valid', 'has_attended', 'scanned_at'])
+            
+            # Log failed attempt
+            record_scan(registration, 'already_used', ip_address)
+            publish_scan('already_used', 'QR code already used', registration)
+            return Response({
+                'valid': False,
+                'message': 'QR code already used',
+                'scan_result': 'already_used',
+                'registration': RegistrationSerializer(registration).data
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Log successful scan
+        record_scan(registration, 'success', ip_address)
+        publish_scan('success', 'Attendance marked successfully', registration)
+        
+        return Response({
+            'valid': True,
+            'message': 'Attendance marked successfully',
+            'scan_result': 'success',
+            'registration': RegistrationSerializer(registration).data
+        }, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['post'])
+    def verify_qr_batch(self, request):
+        """Verify queued scans ({"scans": [{"qr_data", "scanned_at", "id"}]}) in one request"""
+        scans = request.data.get('scans')
+        if not isinstance(scans, list) or not scans:
+            return Response({'error': 'scans must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(scans) > settings.SCAN_BATCH_MAX_SIZE:
+            return Response({
+                'error': f'At most {settings.SCAN_BATCH_MAX_SIZE} scans per batch'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = verify_batch(scans, ip_address=get_client_ip(request))
+        publish_batch(results)
+        for result in results:
+            if result['registration'] is not None:
+                result['registration'] = RegistrationSerializer(result['registration']).data
+        
+        summary = Counter(result['scan_result'] for result in results)
+        return Response({
+            'processed': len(results),
+            'success': summary['success'],
+            'already_used': summary['already_used'],
+            'invalid': summary['invalid'],
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+
+class AttendanceLogViewSet(viewsets.ReadOnlyModelViewSet):
+    """Read-only scan log API (?event=<id>, ?registration=<id>, ?scan_result=)"""
+    serializer_class = AttendanceLogSerializer
+    permission_classes = [IsAdminUser]
+    cursor_ordering = ('-scan_time', '-id')
+    
+    def get_queryset(self):
+        logs = AttendanceLog.objects.select_related('registration')
+        params = self.request.query_params
+        if params.get('event'):
+            logs = logs.filter(registration__event_id=params['event'])
+        if params.get('registration'):
+            logs = logs.filter(registration_id=params['registration'])
+        if params.get('scan_result'):
+            logs = logs.filter(scan_result=params['scan_result'])
+        return logs
 
 
 @api_view(['GET'])
 @login_required
 def dashboard_statistics(request):
     """Get overall dashboard statistics"""
-    total_events = Event.objects.count()
-    now = timezone.now()
-    active_events = Event.objects.filter(
-        start_date__lte=now,
-        end_date__gte=now,
-        status='ongoing'
-    ).count()
-    
-    total_registrations = Registration.objects.count()
-    total_present = Registration.objects.filter(has_attended=True).count()
+    stats = Event.statistics()
+    total_registrations = stats['total_registrations']
+    total_present = stats['total_present']
     total_absent = total_registrations - total_present
     attendance_rate = (total_present / total_registrations * 100) if total_registrations > 0 else 0
     
     data = {
-        'total_events': total_events,
-        'active_events': active_events,
+        'total_events': stats['total_events'],
+        'active_events': stats['active_events'],
         'total_registrations': total_registrations,
         'total_present': total_present,
         'total_absent': total_absent,
@@ -287,6 +320,61 @@ def dashboard_statistics(request):
     return Response(serializer.data)
 
 
+@api_view(['GET'])
+@login_required
+def event_analytics(request, event_id):
+    """Arrival curve, registration trend and peak throughput of an event (?granularity=minute|hour&from=&to=)"""
+    if not request.user.is_staff:
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    get_object_or_404(Event.objects.only('id'), id=event_id)
+    
+    granularity = request.GET.get('granularity', 'hour')
+    if granularity not in rollups.GRANULARITIES:
+        return Response({'error': "granularity must be 'minute' or 'hour'"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        start = parse_bound(request.GET['from'], 'from') if request.GET.get('from') else None
+        end = parse_bound(request.GET['to'], 'to', end=True) if request.GET.get('to') else None
+    except ExportError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(rollups.event_analytics(event_id, granularity, start, end))
+
+
+async def live_scans(request):
+    """Server-Sent Events feed of scan results and event counters (?event=<id> to filter)"""
+    if not await sync_to_async(lambda: request.user.is_staff)():
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'The live feed needs an ASGI server'}, status=501)
+    
+    response = StreamingHttpResponse(
+        sse_stream(request.GET.get('event') or None, request.headers.get('Last-Event-ID')),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['GET'])
+@login_required
+def email_outbox_status(request):
+    """Get email outbox queue depth"""
+    return Response(OutboundEmail.queue_depth())
+
+
+@api_view(['GET'])
+@login_required
+def query_stats(request):
+    """Per-endpoint query counts and DB time recorded by QueryBudgetMiddleware in this process"""
+    if not request.user.is_staff:
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    data = {'endpoints': endpoint_stats.snapshot()}
+    if settings.DATABASES['default']['ENGINE'] == 'eventpass_backend.sqlite_backend':
+        data['sqlite_lock_retries'] = lock_stats()
+    return Response(data)
+
+
 @api_view(['POST'])
 def admin_login_view(request):
     """Admin login endpoint"""
@@ -418,16 +506,15 @@ def admin_panel_view(request):
         return redirect('admin-login-page')
     
     # Get summary statistics
-    total_events = Event.objects.count()
-    total_registrations = Registration.objects.count()
-    total_present = Registration.objects.filter(has_attended=True).count()
-    recent_events = Event.objects.all()[:5]
-    all_events = Event.objects.all()
+    stats = Event.statistics()
+    # One query for both the recent list and the event selector
+    all_events = list(Event.objects.only('id', 'name', 'venue', 'start_date', 'status'))
+    recent_events = all_events[:5]
     
     context = {
-        'total_events': total_events,
-        'total_registrations': total_registrations,
-        'total_present': total_present,
+        'total_events': stats['total_events'],
+        'total_registrations': stats['total_registrations'],
+        'total_present': stats['total_present'],
         'recent_events': recent_events,
         'all_events': all_events,
     }
@@ -520,7 +607,9 @@ def admin_registrations_view(request):
     if not request.user.is_staff:
         return redirect('admin-login-page')
     
-    registrations = Registration.objects.select_related('event').all()
+    registrations = Registration.objects.select_related('event').only(
+        'id', 'name', 'student_id', 'email', 'registered_at', 'is_valid', 'has_attended', 'event__name'
+    )
     context = {'registrations': registrations}
     return render(request, 'admin_registrations.html', context)
 
@@ -536,7 +625,9 @@ def admin_delete_registration(request, registration_id):
     
     try:
         registration = get_object_or_404(Registration, id=registration_id)
-        registration.delete()
+        # post_delete signal decrements the event counters in the same transaction
+        with transaction.atomic():
+            registration.delete()
         return JsonResponse({'success': True, 'message': 'Registration deleted successfully'})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -548,11 +639,55 @@ def admin_logs_view(request):
     if not request.user.is_staff:
         return redirect('admin-login-page')
     
-    logs = AttendanceLog.objects.select_related('registration', 'registration__event').all()[:100]
+    logs = AttendanceLog.objects.select_related('registration', 'registration__event').only(
+        'scan_time', 'scan_result', 'ip_address',
+        'registration__name', 'registration__email', 'registration__event__name'
+    )[:100]
     context = {'logs': logs}
     return render(request, 'admin_logs.html', context)
 
 
+def _export(request, build, name):
+    """Stream a CSV (default) or XLSX export built by one of the exports helpers"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in ('csv', 'xlsx'):
+        return JsonResponse({'error': "format must be 'csv' or 'xlsx'"}, status=400)
+    try:
+        queryset, columns = build(request.GET)
+    except ExportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    filename = f'{name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{fmt}'
+    if fmt == 'xlsx':
+        if not XLSX_AVAILABLE:
+            return JsonResponse({'error': 'XLSX export requires openpyxl'}, status=501)
+        return FileResponse(
+            write_xlsx(queryset, columns, name),
+            as_attachment=True,
+            filename=filename,
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    
+    response = StreamingHttpResponse(stream_csv(queryset, columns), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def export_registrations(request):
+    """Registrations as CSV/XLSX, filtered by event, from/to and attended"""
+    return _export(request, registration_export, 'registrations')
+
+
+@login_required
+def export_attendance_logs(request):
+    """Attendance logs as CSV/XLSX, filtered by event, from/to and scan_result"""
+    return _export(request, log_export, 'attendance_logs')
+
+
 @login_required
 def generate_attendance_pdf(request):
     """Generate attendance PDF directly using reportlab (works in cloud environments)"""
@@ -563,8 +698,8 @@ def generate_attendance_pdf(request):
         # Get event_id from query params if provided
         event_id = request.GET.get('event_id')
         
-        # Fetch registrations from database, ordered by id (ascending)
-        registrations = Registration.objects.select_related('event').order_by('id')
+        # Registrations in id order; rows are streamed with values_list()
+        registrations = Registration.objects.order_by('id')
         
         # Filter by event if specified
         if event_id:
@@ -575,347 +710,113 @@ def generate_attendance_pdf(request):
             except Event.DoesNotExist:
                 return JsonResponse({'error': 'Event not found'}, status=404)
         else:
+            selected_event = None
             event_name = "All Events"
         
-        if not registrations.exists():
-            return JsonResponse({'error': 'No registrations found'}, status=404)
-        
-        # Create PDF in memory
-        buffer = io.BytesIO()
-        
-        # Create PDF with custom page template
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=40,
-            leftMargin=40,
-            topMargin=15,
-            bottomMargin=40
-        )
-        
-        # Container for PDF elements
-        elements = []
+        # Repeat downloads: answer 304, or serve the stored copy of this version
+        scope, etag, last_modified = report_validators(selected_event)
+        not_modified = get_conditional_response(request, etag=quote_etag(etag), last_modified=int(last_modified.timestamp()))
+        if not_modified is not None:
+            return set_validators(not_modified, etag, last_modified)
         
-        # Styles
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        estd_style = ParagraphStyle(
-            'ESTD',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.black,
-            alignment=TA_RIGHT,
-            fontName='Helvetica-Bold'
-        )
-        
-        title_style = ParagraphStyle(
-            'Title',
-            parent=styles['Normal'],
-            fontSize=18,
-            textColor=colors.HexColor('#1a237e'),
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold',
-            spaceAfter=3,
-            spaceBefore=0,
-            leading=20
-        )
-        
-        subtitle_style = ParagraphStyle(
-            'Subtitle',
-            parent=styles['Normal'],
-            fontSize=11,
-            textColor=colors.HexColor('#d32f2f'),
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold',
-            spaceAfter=3,
-            leading=13
-        )
+        safe_event_name = "".join(c if c.isalnum() or c in (' ', '_') else '_' for c in event_name).replace(' ', '_')
+        filename = f'Attendance_{safe_event_name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+        cached = open_cached_report(scope, etag)
+        if cached is not None:
+            response = FileResponse(cached, content_type='application/pdf', as_attachment=True, filename=filename)
+            return set_validators(response, etag, last_modified)
         
-        accredited_style = ParagraphStyle(
-            'Accredited',
-            parent=styles['Normal'],
-            fontSize=9,
-            textColor=colors.HexColor('#006400'),
-            alignment=TA_CENTER,
-            fontName='Helvetica',
-            spaceAfter=2,
-            leading=11
-        )
+        if not registrations.exists():
+            return JsonResponse({'error': 'No registrations found'}, status=404)
         
-        approved_style = ParagraphStyle(
-            'Approved',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.HexColor('#006400'),
-            alignment=TA_CENTER,
-            fontName='Helvetica',
-            spaceAfter=8,
-            leading=10
-        )
+        # Render into a spooled file that moves to disk for large reports
+        buffer = spooled_buffer()
         
-        dept_style = ParagraphStyle(
-            'Department',
-            parent=styles['Normal'],
-            fontSize=11,
-            textColor=colors.black,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold',
-            spaceAfter=0,
-            spaceBefore=0
-        )
+        # Build PDF, pulling table chunks from the database as pages are laid out
+        build_attendance_pdf(buffer, event_name, datetime.now().strftime('%B %d, %Y'), attendance_rows(registrations))
         
-        event_style = ParagraphStyle(
-            'Event',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.black,
-            alignment=TA_LEFT,
-            fontName='Helvetica'
-        )
+        # Keep this version for repeat downloads and stream it from storage
+        try:
+            report = store_report(scope, etag, buffer)
+        except OSError:
+            buffer.seek(0)
+            report = buffer
         
-        heading_style = ParagraphStyle(
-            'Heading',
-            parent=styles['Normal'],
-            fontSize=13,
-            textColor=colors.black,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold',
-            spaceAfter=12,
-            spaceBefore=8
+        # Return PDF as file response
+        response = FileResponse(
+            report,
+            content_type='application/pdf',
+            as_attachment=True,
+            filename=filename
         )
+        set_validators(response, etag, last_modified)
         
-        # Header Section with Logo and NAAC badge
-        logo_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'cmrtc.png')
-        naac_logo_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'NAAC.jpg')
-        
-        # Create header with logos - CMR logo on left, NAAC badge on right with ESTD
-        header_left = ''
-        header_center = ''
-        header_right_content = []
-        
-        # Left: CMR Logo
-        if os.path.exists(logo_path):
-            try:
-                header_left = RLImage(logo_path, width=1*inch, height=1*inch)
-            except:
-                header_left = ''
-        
-        # Center: Title
-        header_center = Paragraph("<b>CMR TECHNICAL CAMPUS</b>", title_style)
-        
-        # Right: ESTD text on top, NAAC Badge below (if available)
-        estd_text = Paragraph("<b>ESTD: 2009</b>", estd_style)
-        
-        if os.path.exists(naac_logo_path):
+        return response
+    
+    except Exception as e:
+        return JsonResponse({'error': f'Error: {str(e)}'}, status=500)
+
+
+@login_required
+def generate_attendance_docx(request):
+    """Attendance report as DOCX, filled from the department template"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    try:
+        event_id = request.GET.get('event_id')
+        registrations = Registration.objects.order_by('id')
+        if event_id:
+            registrations = registrations.filter(event_id=event_id)
             try:
-                naac_badge = RLImage(naac_logo_path, width=0.7*inch, height=0.7*inch)
-                # Create a nested table for right side: ESTD on top, NAAC logo below
-                right_table = Table([[estd_text], [naac_badge]], colWidths=[1.3*inch], rowHeights=[0.3*inch, 0.7*inch])
-                right_table.setStyle(TableStyle([
-                    ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-                    ('ALIGN', (0, 1), (0, 1), 'RIGHT'),
-                    ('VALIGN', (0, 0), (0, 0), 'TOP'),
-                    ('VALIGN', (0, 1), (0, 1), 'MIDDLE'),
-                ]))
-                header_right = right_table
-            except:
-                header_right = estd_text
+                event_name = Event.objects.get(id=event_id).name
+            except Event.DoesNotExist:
+                return JsonResponse({'error': 'Event not found'}, status=404)
         else:
-            header_right = estd_text
-        
-        # Create header table: Logo | Title | (ESTD + NAAC Badge)
-        header_table = Table(
-            [[header_left, header_center, header_right]],
-            colWidths=[1.2*inch, 5*inch, 1.3*inch]
-        )
-        header_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-            ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
-            ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),
-            ('VALIGN', (1, 0), (1, 0), 'MIDDLE'),
-            ('VALIGN', (2, 0), (2, 0), 'TOP'),
-        ]))
-        elements.append(header_table)
-        elements.append(Spacer(1, 3))
-        
-        # Title and accreditation info (without repeating title as it's in header)
-        elements.append(Paragraph("<b>UGC AUTONOMOUS</b>", subtitle_style))
-        elements.append(Paragraph("<b>Accredited by <font color='#d32f2f'>NBA</font> & NAAC with 'A' Grade</b>", accredited_style))
-        elements.append(Paragraph("Approved by <b>AICTE, New Delhi</b> and <b>JNTU Hyderabad</b>", approved_style))
-        
-        # Department name with horizontal lines (underlined effect)
-        elements.append(HRFlowable(width="100%", thickness=1, color=colors.black, spaceBefore=0, spaceAfter=5))
-        elements.append(Paragraph("<b>Department of CSE [Artificial Intelligence & Machine Learning]</b>", dept_style))
-        elements.append(HRFlowable(width="100%", thickness=1, color=colors.black, spaceBefore=5, spaceAfter=10))
-        
-        # Event name and date row
-        current_date = datetime.now().strftime('%B %d, %Y')
-        event_date_table = Table(
-            [[Paragraph(f"<b>Event Name:</b> {event_name}", event_style), 
-              Paragraph(f"<b>Date:</b> {current_date}", event_style)]],
-            colWidths=[4.2*inch, 3.3*inch]
-        )
-        event_date_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        elements.append(event_date_table)
-        elements.append(Spacer(1, 12))
-        
-        # Attendance Report heading
-        elements.append(Paragraph("ATTENDANCE REPORT", heading_style))
-        elements.append(Spacer(1, 8))
-        
-        # Prepare table data with Status column
-        table_data = [['S.No', 'Student ID', 'Name', 'Email', 'Status']]
-        
-        # Track row indices for present and absent students
-        present_rows = []
-        absent_rows = []
-        
-        for idx, reg in enumerate(registrations, start=1):
-            # Determine status
-            if reg.has_attended:
-                status = 'PRESENT'
-                present_rows.append(idx)  # idx is the row number (1-based, +1 for header)
-            else:
-                status = 'ABSENT'
-                absent_rows.append(idx)
-            
-            table_data.append([
-                str(idx),
-                reg.student_id,
-                reg.name,
-                reg.email,
-                status
-            ])
-        
-        # Create table with professional styling - adjusted column widths
-        table = Table(table_data, colWidths=[0.5*inch, 1*inch, 2.2*inch, 2.3*inch, 1*inch])
-        
-        # Base table style
-        base_style = [
-            # Header row styling
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#5b7fbf')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('TOPPADDING', (0, 0), (-1, 0), 10),
-            
-            # Data rows styling
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-            ('ALIGN', (1, 1), (1, -1), 'CENTER'),
-            ('ALIGN', (2, 1), (2, -1), 'LEFT'),
-            ('ALIGN', (3, 1), (3, -1), 'LEFT'),
-            ('ALIGN', (4, 1), (4, -1), 'CENTER'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('FONTNAME', (4, 1), (4, -1), 'Helvetica-Bold'),  # Bold for Status column
-            
-            # Borders
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BOX', (0, 0), (-1, -1), 1.5, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            
-            # Padding
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 1), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ]
-        
-        # Add color coding for Present rows (green background)
-        for row_idx in present_rows:
-            base_style.append(('BACKGROUND', (4, row_idx), (4, row_idx), colors.HexColor('#d4edda')))
-            base_style.append(('TEXTCOLOR', (4, row_idx), (4, row_idx), colors.HexColor('#155724')))
-        
-        # Add color coding for Absent rows (red background)
-        for row_idx in absent_rows:
-            base_style.append(('BACKGROUND', (4, row_idx), (4, row_idx), colors.HexColor('#f8d7da')))
-            base_style.append(('TEXTCOLOR', (4, row_idx), (4, row_idx), colors.HexColor('#721c24')))
-        
-        # Apply the complete style
-        table.setStyle(TableStyle(base_style))
-        
-        elements.append(table)
-        elements.append(Spacer(1, 30))
-        
-        # Footer with HOD and COORDINATOR
-        footer_style = ParagraphStyle(
-            'Footer',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.black,
-            fontName='Helvetica-Bold'
-        )
-        
-        footer_table = Table(
-            [[Paragraph("HOD", footer_style), '', Paragraph("COORDINATOR", footer_style)]],
-            colWidths=[2*inch, 3.5*inch, 2*inch]
-        )
-        footer_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-            ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        elements.append(footer_table)
-        elements.append(Spacer(1, 30))
-        
-        # Address footer
-        address_style = ParagraphStyle(
-            'Address',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.black,
-            alignment=TA_CENTER,
-            fontName='Helvetica'
-        )
-        
-        phone_style = ParagraphStyle(
-            'Phone',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.HexColor('#d32f2f'),
-            alignment=TA_CENTER,
-            fontName='Helvetica'
-        )
-        
-        # Add horizontal line
-        elements.append(HRFlowable(width="100%", thickness=1, color=colors.black, spaceBefore=1, spaceAfter=8))
-        
-        elements.append(Paragraph("Kandlakoya (V), Medchal Road, Hyderabad, Telangana – 501401", address_style))
-        elements.append(Paragraph("Ph.No: 9247033440/41: www.cmrtc.ac.in", phone_style))
+            event_name = "All Events"
         
-        # Build PDF
-        doc.build(elements)
+        if not registrations.exists():
+            return JsonResponse({'error': 'No registrations found'}, status=404)
         
-        # Get PDF data
+        buffer = spooled_buffer()
+        context = {'event_name': event_name, 'date': datetime.now().strftime('%B %d, %Y')}
+        build_attendance_docx(docx_rows(registrations), context, buffer)
         buffer.seek(0)
         
-        # Create filename with event name
         safe_event_name = "".join(c if c.isalnum() or c in (' ', '_') else '_' for c in event_name).replace(' ', '_')
-        
-        # Return PDF as file response
-        response = FileResponse(
+        return FileResponse(
             buffer,
-            content_type='application/pdf',
+            content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
             as_attachment=True,
-            filename=f'Attendance_{safe_event_name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+            filename=f'Attendance_{safe_event_name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.docx'
         )
-        
-        return response
     
     except Exception as e:
         return JsonResponse({'error': f'Error: {str(e)}'}, status=500)
 
 
+@login_required
+def generate_event_id_cards_pdf(request, event_id):
+    """All ID cards of an event, 8-up on A4 sheets with crop marks, for printing"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    event = get_object_or_404(Event, id=event_id)
+    try:
+        if not event.registrations.exists():
+            return JsonResponse({'error': 'No registrations found'}, status=404)
+        
+        buffer = spooled_buffer()
+        render_event_cards(event, buffer)
+        buffer.seek(0)
+        
+        filename = f"ID_Cards_{event.name[:20].replace(' ', '_')}.pdf"
+        return FileResponse(buffer, content_type='application/pdf', as_attachment=True, filename=filename)
+    
+    except Exception as e:
+        return JsonResponse({'error': f'Error generating ID cards: {str(e)}'}, status=500)
+
+
 @api_view(['GET'])
 def generate_id_card_pdf(request, registration_id):
     """
@@ -924,159 +825,50 @@ def generate_id_card_pdf(request, registration_id):
     """
     try:
         # Get registration details
-        registration = get_object_or_404(Registration, id=registration_id)
+        registration = Registration.objects.select_related('event').get(id=registration_id)
         event = registration.event
         
-        # Create in-memory buffer for PDF
-        buffer = io.BytesIO()
-        
-        # A7 size: 74mm x 105mm (portrait)
-        width, height = A7
+        # Repeat downloads: answer 304, or serve the card rendered for these details
+        etag = card_cache_key(registration)
+        not_modified = get_conditional_response(request, etag=quote_etag(etag))
+        if not_modified is not None:
+            return set_validators(not_modified, etag)
         
-        # Create PDF canvas
-        c = canvas.Canvas(buffer, pagesize=A7)
-        
-        # Draw card border (5mm margin)
-        margin = 5 * mm
-        c.setStrokeColorRGB(0.2, 0.3, 0.5)  # Dark blue
-        c.setLineWidth(2)
-        c.rect(margin, margin, width - 2*margin, height - 2*margin, stroke=1, fill=0)
-        
-        # Current Y position (starting from top)
-        y_pos = height - 15 * mm
-        
-        # Add College Logo at top
-        try:
-            logo_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'cmrtc.png')
-            if os.path.exists(logo_path):
-                logo = ImageReader(logo_path)
-                logo_size = 20 * mm
-                logo_x = (width - logo_size) / 2
-                c.drawImage(logo, logo_x, y_pos - logo_size, width=logo_size, height=logo_size, preserveAspectRatio=True, mask='auto')
-                y_pos -= logo_size + 5 * mm
-        except Exception as e:
-            print(f"Logo error: {e}")
-            y_pos -= 5 * mm
-        
-        # Title "EVENT ID CARD"
-        c.setFont("Helvetica-Bold", 8)
-        c.setFillColorRGB(0.2, 0.3, 0.5)
-        title_text = "EVENT ID CARD"
-        title_width = c.stringWidth(title_text, "Helvetica-Bold", 8)
-        c.drawString((width - title_width) / 2, y_pos, title_text)
-        y_pos -= 8 * mm
-        
-        # Student Name (Bold)
-        c.setFont("Helvetica-Bold", 10)
-        c.setFillColorRGB(0, 0, 0)
-        name_lines = []
-        if len(registration.name) > 20:
-            # Split long names into multiple lines
-            words = registration.name.split()
-            line = ""
-            for word in words:
-                test_line = line + word + " "
-                if c.stringWidth(test_line, "Helvetica-Bold", 10) < width - 2*margin - 10*mm:
-                    line = test_line
-                else:
-                    name_lines.append(line.strip())
-                    line = word + " "
-            if line:
-                name_lines.append(line.strip())
-        else:
-            name_lines = [registration.name]
-        
-        for name_line in name_lines:
-            name_width = c.stringWidth(name_line, "Helvetica-Bold", 10)
-            c.drawString((width - name_width) / 2, y_pos, name_line)
-            y_pos -= 5 * mm
-        
-        y_pos -= 2 * mm
-        
-        # Student ID
-        c.setFont("Helvetica", 8)
-        c.setFillColorRGB(0.3, 0.3, 0.3)
-        student_id_text = f"ID: {registration.student_id}"
-        student_id_width = c.stringWidth(student_id_text, "Helvetica", 8)
-        c.drawString((width - student_id_width) / 2, y_pos, student_id_text)
-        y_pos -= 6 * mm
-        
-        # Event Name
-        c.setFont("Helvetica-Bold", 7)
-        c.setFillColorRGB(0.2, 0.3, 0.5)
-        event_lines = []
-        if len(event.name) > 25:
-            # Split long event names
-            words = event.name.split()
-            line = ""
-            for word in words:
-                test_line = line + word + " "
-                if c.stringWidth(test_line, "Helvetica-Bold", 7) < width - 2*margin - 10*mm:
-                    line = test_line
-                else:
-                    event_lines.append(line.strip())
-                    line = word + " "
-            if line:
-                event_lines.append(line.strip())
-        else:
-            event_lines = [event.name]
-        
-        for event_line in event_lines:
-            event_width = c.stringWidth(event_line, "Helvetica-Bold", 7)
-            c.drawString((width - event_width) / 2, y_pos, event_line)
-            y_pos -= 4 * mm
-        
-        y_pos -= 2 * mm
-        
-        # Generate QR Code
-        try:
-            # Decode base64 QR code image
-            qr_data = registration.qr_code_image.split(',')[1] if ',' in registration.qr_code_image else registration.qr_code_image
-            qr_image_data = base64.b64decode(qr_data)
-            qr_image = Image.open(io.BytesIO(qr_image_data))
+        filename = f"ID_Card_{registration.student_id}_{event.name[:20].replace(' ', '_')}.pdf"
+        directory = card_directory(registration.id)
+        card = open_cached_report('card', etag, directory=directory)
+        if card is None:
+            # Create in-memory buffer for PDF
+            buffer = io.BytesIO()
             
-            # Convert to ImageReader for reportlab
-            qr_buffer = io.BytesIO()
-            qr_image.save(qr_buffer, format='PNG')
-            qr_buffer.seek(0)
-            qr_reader = ImageReader(qr_buffer)
+            # A7 size: 74mm x 105mm (portrait)
+            c = canvas.Canvas(buffer, pagesize=A7)
             
-            # Draw QR code (centered)
-            qr_size = 25 * mm
-            qr_x = (width - qr_size) / 2
-            c.drawImage(qr_reader, qr_x, y_pos - qr_size, width=qr_size, height=qr_size)
-            y_pos -= qr_size + 3 * mm
-        except Exception as e:
-            print(f"QR code error: {e}")
-            c.setFont("Helvetica", 6)
-            c.setFillColorRGB(1, 0, 0)
-            error_text = "QR Code Error"
-            error_width = c.stringWidth(error_text, "Helvetica", 6)
-            c.drawString((width - error_width) / 2, y_pos, error_text)
-            y_pos -= 10 * mm
-        
-        # Registration ID (small text at bottom)
-        c.setFont("Helvetica", 5)
-        c.setFillColorRGB(0.5, 0.5, 0.5)
-        reg_id_text = f"Reg ID: {str(registration.id)[:8].upper()}"
-        reg_id_width = c.stringWidth(reg_id_text, "Helvetica", 5)
-        c.drawString((width - reg_id_width) / 2, 8 * mm, reg_id_text)
-        
-        # Save PDF
-        c.showPage()
-        c.save()
-        
-        # Get PDF data
-        buffer.seek(0)
+            # QR code from the stored PNG
+            def draw_qr(c, x, y, size):
+                qr_reader = ImageReader(io.BytesIO(qr_png_for(registration)))
+                c.drawImage(qr_reader, x, y, width=size, height=size)
+            
+            draw_id_card(c, registration.id, registration.name, registration.student_id, event.name, draw_qr)
+            
+            # Save PDF
+            c.showPage()
+            c.save()
+            
+            try:
+                card = store_report('card', etag, buffer, directory=directory)
+            except OSError:
+                buffer.seek(0)
+                card = buffer
         
         # Return as downloadable file
-        filename = f"ID_Card_{registration.student_id}_{event.name[:20].replace(' ', '_')}.pdf"
         response = FileResponse(
-            buffer,
+            card,
             content_type='application/pdf',
             as_attachment=True,
             filename=filename
         )
+        set_validators(response, etag)
         
         return response
         
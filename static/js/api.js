@@ -0,0 +1,20 @@
+// Shared API helpers
+
+// Fetch every page of a cursor-paginated list endpoint
+async function fetchAllPages(url) {
+    const results = [];
+    let next = url;
+    while (next) {
+        const response = await fetch(next);
+        if (!response.ok) {
+            throw new Error(`Request failed with status ${response.status}`);
+        }
+        const data = await response.json();
+        if (Array.isArray(data)) {
+            return data;
+        }
+        results.push(...data.results);
+        next = data.next;
+    }
+    return results;
+}
@@ -1,10 +1,12 @@
 // API base URL
 const API_BASE = '';
 let attendanceChart = null;
+let dashboardData = null;
 
 document.addEventListener('DOMContentLoaded', function() {
     loadDashboardData();
     loadEventsList();
+    subscribeLiveScans();
 });
 
 async function loadDashboardData() {
@@ -21,16 +23,8 @@ async function loadDashboardData() {
             throw new Error('Failed to load statistics');
         }
         
-        const data = await response.json();
-        
-        // Update stat cards
-        document.getElementById('totalEvents').textContent = data.total_events;
-        document.getElementById('totalRegistrations').textContent = data.total_registrations;
-        document.getElementById('totalPresent').textContent = data.total_present;
-        document.getElementById('totalAbsent').textContent = data.total_absent;
-        
-        // Create pie chart
-        createAttendanceChart(data);
+        dashboardData = await response.json();
+        renderDashboardData(dashboardData);
         
     } catch (error) {
         console.error('Error loading dashboard data:', error);
@@ -38,6 +32,51 @@ async function loadDashboardData() {
     }
 }
 
+function renderDashboardData(data) {
+    // Update stat cards
+    document.getElementById('totalEvents').textContent = data.total_events;
+    document.getElementById('totalRegistrations').textContent = data.total_registrations;
+    document.getElementById('totalPresent').textContent = data.total_present;
+    document.getElementById('totalAbsent').textContent = data.total_absent;
+    
+    // Create pie chart
+    createAttendanceChart(data);
+}
+
+function subscribeLiveScans() {
+    // Live check-ins over Server-Sent Events (needs the ASGI server; otherwise the page stays static)
+    if (!window.EventSource) {
+        return;
+    }
+    const source = new EventSource(`${API_BASE}/api/live/scans/`, { withCredentials: true });
+    source.addEventListener('scan', function(e) {
+        const scan = JSON.parse(e.data);
+        if (!scan.counters) {
+            return;
+        }
+        
+        const stats = document.querySelector(`.event-stats[data-event-id="${scan.event_id}"]`);
+        if (stats) {
+            const rate = scan.counters.registered > 0
+                ? ((scan.counters.present / scan.counters.registered) * 100).toFixed(1)
+                : 0;
+            stats.querySelector('.registered').textContent = scan.counters.registered;
+            stats.querySelector('.present').textContent = scan.counters.present;
+            stats.querySelector('.absent').textContent = scan.counters.absent;
+            stats.querySelector('.rate').textContent = `${rate}%`;
+        }
+        
+        if (dashboardData && scan.scan_result === 'success') {
+            dashboardData.total_present += 1;
+            dashboardData.total_absent -= 1;
+            dashboardData.attendance_rate = dashboardData.total_registrations > 0
+                ? Math.round(dashboardData.total_present / dashboardData.total_registrations * 10000) / 100
+                : 0;
+            renderDashboardData(dashboardData);
+        }
+    });
+}
+
 function createAttendanceChart(data) {
     const ctx = document.getElementById('attendanceChart').getContext('2d');
     
@@ -107,8 +146,7 @@ function createAttendanceChart(data) {
 
 async function loadEventsList() {
     try {
-        const response = await fetch(`${API_BASE}/api/events/`);
-        const events = await response.json();
+        const events = await fetchAllPages(`${API_BASE}/api/events/`);
         
         const eventsList = document.getElementById('eventsList');
         
@@ -142,11 +180,11 @@ async function loadEventsList() {
                     </div>
                     <div style="text-align: right;">
                         ${statusBadge}
-                        <div class="event-stats" style="margin-top: 0.5rem;">
-                            <span title="Registered"><i class="fas fa-users"></i> ${event.registered_count}</span>
-                            <span title="Present"><i class="fas fa-user-check" style="color: #4facfe;"></i> ${event.present_count}</span>
-                            <span title="Absent"><i class="fas fa-user-times" style="color: #fa709a;"></i> ${event.absent_count}</span>
-                            <span title="Attendance Rate"><i class="fas fa-percentage"></i> ${attendanceRate}%</span>
+                        <div class="event-stats" data-event-id="${event.id}" style="margin-top: 0.5rem;">
+                            <span title="Registered"><i class="fas fa-users"></i> <span class="registered">${event.registered_count}</span></span>
+                            <span title="Present"><i class="fas fa-user-check" style="color: #4facfe;"></i> <span class="present">${event.present_count}</span></span>
+                            <span title="Absent"><i class="fas fa-user-times" style="color: #fa709a;"></i> <span class="absent">${event.absent_count}</span></span>
+                            <span title="Attendance Rate"><i class="fas fa-percentage"></i> <span class="rate">${attendanceRate}%</span></span>
                         </div>
                     </div>
                 </div>
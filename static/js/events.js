@@ -1,8 +1,7 @@
 // Load all events for the events page
 async function loadAllEvents() {
     try {
-        const response = await fetch('/api/events/');
-        const events = await response.json();
+        const events = await fetchAllPages('/api/events/');
         
         const container = document.getElementById('allEventsContainer');
         
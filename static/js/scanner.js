@@ -2,11 +2,26 @@
 let html5QrCode;
 let scanCount = 0;
 const API_BASE = '';
+const SCAN_QUEUE_KEY = 'eventpass_scan_queue';
+const SCAN_SYNC_INTERVAL = 15000;
+const MANIFEST_EVENT_KEY = 'eventpass_manifest_event';
+const MANIFEST_KEY_PREFIX = 'eventpass_manifest_';
+const MANIFEST_SYNC_INTERVAL = 30000;
+
+// Local ticket manifest: { event, version, tickets: { fingerprint: [registrationId, attended] } }
+let manifest = null;
 
 document.addEventListener('DOMContentLoaded', function() {
     initializeScanner();
+    syncQueuedScans();
+    setInterval(syncQueuedScans, SCAN_SYNC_INTERVAL);
+    initializeManifest();
+    setInterval(syncManifest, MANIFEST_SYNC_INTERVAL);
 });
 
+// Retry queued scans as soon as the network comes back
+window.addEventListener('online', syncQueuedScans);
+
 function initializeScanner() {
     html5QrCode = new Html5Qrcode("reader");
     
@@ -33,6 +48,15 @@ async function onScanSuccess(decodedText, decodedResult) {
     // Pause scanning to prevent multiple scans
     html5QrCode.pause();
     
+    // Validate against the local manifest first; unknown tickets fall through to the server
+    if (manifest && await verifyLocally(decodedText)) {
+        setTimeout(() => {
+            html5QrCode.resume();
+            document.getElementById('scanResult').style.display = 'none';
+        }, 3000);
+        return;
+    }
+    
     // Verify QR code with backend
     try {
         const response = await fetch(`${API_BASE}/api/registrations/verify_qr/`, {
@@ -63,13 +87,193 @@ async function onScanSuccess(decodedText, decodedResult) {
         
     } catch (error) {
         console.error('Error verifying QR code:', error);
-        showError('Failed to verify QR code. Please try again.');
+        // Network failure: keep the scan with its original time and sync it later
+        queueScan(decodedText);
+        showError('Offline - scan saved and will be synced automatically.');
         setTimeout(() => {
             html5QrCode.resume();
         }, 2000);
     }
 }
 
+async function initializeManifest() {
+    const select = document.getElementById('manifestEvent');
+    const savedEvent = localStorage.getItem(MANIFEST_EVENT_KEY);
+    
+    try {
+        const events = await fetchAllPages(`${API_BASE}/api/events/`);
+        events
+            .filter(event => event.status === 'ongoing' || event.status === 'upcoming')
+            .forEach(event => {
+                const option = document.createElement('option');
+                option.value = event.id;
+                option.textContent = event.name;
+                select.appendChild(option);
+            });
+    } catch (error) {
+        console.warn('Could not load events for offline mode:', error);
+    }
+    
+    if (savedEvent) {
+        select.value = savedEvent;
+        manifest = JSON.parse(localStorage.getItem(MANIFEST_KEY_PREFIX + savedEvent) || 'null');
+        updateManifestStatus();
+        syncManifest();
+    }
+    
+    select.addEventListener('change', function() {
+        const eventId = select.value;
+        if (eventId) {
+            localStorage.setItem(MANIFEST_EVENT_KEY, eventId);
+            manifest = JSON.parse(localStorage.getItem(MANIFEST_KEY_PREFIX + eventId) || 'null');
+            syncManifest();
+        } else {
+            localStorage.removeItem(MANIFEST_EVENT_KEY);
+            manifest = null;
+        }
+        updateManifestStatus();
+    });
+}
+
+async function syncManifest() {
+    const eventId = localStorage.getItem(MANIFEST_EVENT_KEY);
+    if (!eventId || !navigator.onLine) return;
+    
+    // Ask only for changes since the last version we have
+    const since = manifest && manifest.event === eventId ? manifest.version : null;
+    const query = since ? `?since=${encodeURIComponent(since)}` : '';
+    
+    try {
+        const response = await fetch(`${API_BASE}/api/events/${eventId}/scan_manifest/${query}`);
+        if (!response.ok) return;
+        const data = await response.json();
+        
+        const tickets = data.full || !manifest ? {} : manifest.tickets;
+        data.tickets.forEach(([fingerprint, registrationId, attended]) => {
+            // A local check-in that has not synced yet must not be undone
+            const localAttended = tickets[fingerprint] ? tickets[fingerprint][1] : false;
+            tickets[fingerprint] = [registrationId, attended || localAttended];
+        });
+        
+        manifest = { event: data.event, version: data.version, tickets: tickets };
+        saveManifest();
+        updateManifestStatus();
+    } catch (error) {
+        console.warn('Manifest not synced:', error);
+    }
+}
+
+function saveManifest() {
+    localStorage.setItem(MANIFEST_KEY_PREFIX + manifest.event, JSON.stringify(manifest));
+}
+
+function updateManifestStatus() {
+    const status = document.getElementById('manifestStatus');
+    if (!manifest) {
+        status.textContent = '';
+        return;
+    }
+    const count = Object.keys(manifest.tickets).length;
+    status.textContent = `${count} tickets cached, updated ${new Date(manifest.version).toLocaleTimeString()}`;
+}
+
+async function ticketFingerprint(text) {
+    const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(text));
+    return Array.from(new Uint8Array(digest).slice(0, 8))
+        .map(byte => byte.toString(16).padStart(2, '0'))
+        .join('');
+}
+
+async function verifyLocally(decodedText) {
+    const fingerprint = await ticketFingerprint(decodedText);
+    const ticket = manifest.tickets[fingerprint];
+    if (!ticket) return false;
+    
+    const [registrationId, attended] = ticket;
+    if (attended) {
+        displayScanResult({
+            valid: false,
+            message: 'QR code already used',
+            scan_result: 'already_used',
+            registration: null
+        });
+        // Still report the attempt so the server log stays complete
+        queueScan(decodedText);
+        return true;
+    }
+    
+    ticket[1] = true;
+    saveManifest();
+    queueScan(decodedText, true);
+    syncQueuedScans();
+    
+    scanCount++;
+    document.getElementById('scanCount').textContent = scanCount;
+    
+    const resultDiv = document.getElementById('scanResult');
+    resultDiv.style.display = 'block';
+    resultDiv.className = 'scan-result success';
+    document.getElementById('resultTitle').innerHTML = '<i class="fas fa-check-circle"></i>';
+    document.getElementById('resultText').textContent = 'Attendance marked successfully';
+    document.getElementById('attendeeInfo').innerHTML = `
+        <p><strong>Registration:</strong> ${registrationId.slice(0, 8).toUpperCase()}</p>
+        <p><strong>Scan Time:</strong> ${new Date().toLocaleString()}</p>
+    `;
+    return true;
+}
+
+function getQueuedScans() {
+    try {
+        return JSON.parse(localStorage.getItem(SCAN_QUEUE_KEY)) || [];
+    } catch (e) {
+        return [];
+    }
+}
+
+function queueScan(decodedText, counted = false) {
+    const queue = getQueuedScans();
+    queue.push({
+        id: `${Date.now()}-${queue.length}`,
+        qr_data: decodedText,
+        scanned_at: new Date().toISOString(),
+        counted: counted
+    });
+    localStorage.setItem(SCAN_QUEUE_KEY, JSON.stringify(queue));
+}
+
+async function syncQueuedScans() {
+    const queue = getQueuedScans();
+    if (queue.length === 0 || !navigator.onLine) return;
+    
+    const batch = queue.slice(0, 500);
+    try {
+        const response = await fetch(`${API_BASE}/api/registrations/verify_qr_batch/`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCookie('csrftoken')
+            },
+            body: JSON.stringify({ scans: batch })
+        });
+        if (!response.ok) return;
+        
+        const data = await response.json();
+        const synced = new Set(batch.map(scan => scan.id));
+        localStorage.setItem(
+            SCAN_QUEUE_KEY,
+            JSON.stringify(getQueuedScans().filter(scan => !synced.has(scan.id)))
+        );
+        
+        // Scans validated against the manifest were already counted locally
+        const counted = new Set(batch.filter(scan => scan.counted).map(scan => scan.id));
+        scanCount += data.results.filter(result => result.valid && !counted.has(result.id)).length;
+        document.getElementById('scanCount').textContent = scanCount;
+        console.log(`Synced ${data.processed} queued scans (${data.success} new check-ins)`);
+    } catch (error) {
+        console.warn('Queued scans not synced yet:', error);
+    }
+}
+
 function onScanError(errorMessage) {
     // Ignore scan errors (they're frequent when no QR code is in view)
     // console.warn(`Scan error: ${errorMessage}`);
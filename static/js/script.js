@@ -102,8 +102,7 @@ function startAutoSlide() {
 // Load running events in compact format for homepage
 async function loadQuickRunningEvents() {
     try {
-        const response = await fetch(`${API_BASE}/api/events/`);
-        const events = await response.json();
+        const events = await fetchAllPages(`${API_BASE}/api/events/`);
         
         const eventsContainer = document.getElementById('runningEventsQuick');
         
@@ -207,8 +206,7 @@ function createQuickEventCard(event) {
 // Load events for dropdown
 async function loadEventOptions() {
     try {
-        const response = await fetch(`${API_BASE}/api/events/`);
-        const events = await response.json();
+        const events = await fetchAllPages(`${API_BASE}/api/events/`);
         
         const eventSelect = document.getElementById('event');
         eventSelect.innerHTML = '<option value="">Choose an event...</option>' +